@@ -1,14 +1,31 @@
 # analysis/analyzer.py
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
 import re
 import os
 
+from analysis import metrics, scoring
+from analysis.listing_ids import listing_ids, lookup_positions, content_hashes
+from analysis.scaling import ScoreScaler
+from analysis.signals import get_default_extractor
+from analysis.dataset import dataset_cache, ANALYZED_LISTINGS_PATH, STORAGE
+from analysis.storage import storage_for_path, new_snapshot_path, CsvStorage, ParquetStorage
+
+# Time per stage of an analysis run (ratio, signals, raw_score, difficulty, scaling, keys,
+# write, publish)
+STAGE_SECONDS = metrics.histogram('analysis_stage_seconds', 'Time spent in each stage of analyzing listings',
+                                  ['stage'])
+ANALYZED_ROWS = metrics.counter('analysis_rows_total', 'Listings whose features were computed')
+# Signals are detected in one shared scan, so they are counted per signal rather than timed
+SIGNAL_LISTINGS = metrics.counter('analysis_signal_listings_total', 'Analyzed listings flagged with each signal',
+                                  ['signal'])
+
 class BusinessAnalyzer:
-    def __init__(self):
+    def __init__(self, signal_extractor=None):
         # Create data directory if it doesn't exist
         os.makedirs('data', exist_ok=True)
+        self.signals = signal_extractor or get_default_extractor()
+        self.scaler = ScoreScaler()
     
     def analyze_turnaround_potential(self, df):
         """
@@ -17,62 +34,288 @@ class BusinessAnalyzer:
         """
         # Make a copy to avoid modifying the original
         analysis_df = df.copy()
+        self._compute_features(analysis_df)
+        return self._finalize(analysis_df, df.columns)
+    
+    def analyze_parallel(self, df, workers=None, partition_size=None):
+        """
+        Analyze businesses across a process pool.
+        Partitions are scored in worker processes that read their input and
+        write their features through memory-mapped files; the global 0-100
+        normalization is applied once afterwards. Gives the same result as
+        analyze_turnaround_potential.
+        """
+        # Imported here so the serial paths don't pay for multiprocessing setup
+        from analysis.parallel import compute_features_parallel
         
-        # Calculate basic financial metrics
-        analysis_df['price_to_revenue_ratio'] = analysis_df.apply(
-            lambda row: row['price'] / max(row['revenue'], 1), axis=1
-        )
+        analysis_df = df.copy()
+        # Worker processes have their own metrics; the pool is timed as one stage
+        with STAGE_SECONDS.time('parallel_features'):
+            features = compute_features_parallel(
+                analysis_df, self.signals.rules, workers=workers, partition_size=partition_size
+            )
+        for column in self._feature_columns():
+            analysis_df[column] = features[column]
+        return self._finalize(analysis_df, df.columns)
+    
+    def _finalize(self, analysis_df, input_columns):
+        """Normalize raw scores, add listing keys, then save and return the dataset"""
+        # Normalize scores to 0-100 scale
+        with STAGE_SECONDS.time('scaling'):
+            if len(analysis_df) > 0:  # Check if dataframe is not empty
+                analysis_df['turnaround_score'] = self.scaler.fit_transform(analysis_df['raw_score'].values)
+            else:
+                analysis_df['turnaround_score'] = []
         
-        # Identify distressed signals from description
-        analysis_df['price_drop'] = analysis_df['description'].str.contains(
-            'reduced|price drop|discount|motivated seller', case=False).astype(int)
+        # Stable keys so later refreshes can run incrementally
+        with STAGE_SECONDS.time('keys'):
+            analysis_df['listing_id'] = listing_ids(analysis_df['url'].values)
+            analysis_df['content_hash'] = content_hashes(analysis_df, salt=self.signals.rules)
+        analysis_df = analysis_df[self._output_columns(input_columns)]
         
-        analysis_df['urgency_signal'] = analysis_df['description'].str.contains(
-            'urgent|quick sale|must sell', case=False).astype(int)
+        # Save analyzed data
+        self._save(analysis_df)
         
-        # Calculate historical performance indicators
-        analysis_df['declining_revenue'] = analysis_df['description'].str.contains(
-            'declining|decreasing|reduced revenue|downturn', case=False).astype(int)
+        return analysis_df
+    
+    def analyze_incremental(self, df):
+        """
+        Analyze only listings that are new or changed since the last run.
+        Listings are keyed by a hash of their URL; unchanged listings reuse
+        the features stored in the analyzed dataset, and only the global
+        0-100 normalization is re-applied to the stored raw scores.
+        File formats still write a complete new snapshot; databases only
+        write the rows whose values or positions changed.
+        Returns (analyzed dataframe, number of listings recomputed)
+        """
+        feature_columns = self._feature_columns()
+        stored_columns = ['url', 'listing_id', 'content_hash', 'turnaround_score'] + feature_columns
+        try:
+            available = dataset_cache.columns()
+        except FileNotFoundError:
+            available = []
+        previous = None
+        if set(stored_columns) <= set(available):
+            signature = STORAGE.signature(ANALYZED_LISTINGS_PATH) if STORAGE.queryable else None
+            # Stored values are copied into the new result, so read them at full precision
+            previous = dataset_cache.read_exact(columns=stored_columns)
+        if previous is None or len(previous) == 0:
+            analysis_df = self.analyze_turnaround_potential(df)
+            return analysis_df, len(analysis_df)
         
-        analysis_df['management_issues'] = analysis_df['description'].str.contains(
-            'management issues|poorly managed|understaffed|absentee', case=False).astype(int)
+        # Match against the stored listings; IDs are derived from URLs, so one lookup serves both
+        analysis_df = df.copy()
+        with STAGE_SECONDS.time('keys'):
+            positions = lookup_positions(previous['url'].values, analysis_df['url'].values)
+            analysis_df['listing_id'] = listing_ids(
+                analysis_df['url'].values, known_ids=previous['listing_id'].values, positions=positions
+            )
+            latest = ~analysis_df['listing_id'].duplicated(keep='last').values
+            analysis_df = analysis_df[latest].reset_index(drop=True)
+            positions = positions[latest]
+            analysis_df['content_hash'] = content_hashes(analysis_df, salt=self.signals.rules)
         
-        # Calculate location value
-        analysis_df['prime_location'] = analysis_df['description'].str.contains(
-            'prime location|high traffic|busy area|popular', case=False).astype(int)
+        stored_hashes = previous['content_hash'].values.astype(np.uint64)
+        known = positions >= 0
+        unchanged = known.copy()
+        unchanged[known] = stored_hashes[positions[known]] == analysis_df['content_hash'].values[known]
+        changed = ~unchanged
         
-        # Simple turnaround score calculation
-        # Higher score = better turnaround opportunity
-        analysis_df['raw_score'] = (
-            (1 - np.clip(analysis_df['price_to_revenue_ratio'] / 2, 0, 1)) * 30 + 
-            analysis_df['price_drop'] * 15 +
-            analysis_df['urgency_signal'] * 10 +
-            analysis_df['declining_revenue'] * 15 +
-            analysis_df['management_issues'] * 20 +
-            analysis_df['prime_location'] * 10
-        )
+        # Reuse stored features for unchanged listings, compute the rest
+        fresh = analysis_df.loc[changed, df.columns].copy()
+        self._compute_features(fresh)
+        for column in feature_columns:
+            values = np.empty(len(analysis_df), dtype=fresh[column].dtype)
+            values[unchanged] = previous[column].values[positions[unchanged]]
+            values[changed] = fresh[column].values
+            analysis_df[column] = values
         
-        # Normalize scores to 0-100 scale
-        if len(analysis_df) > 0:  # Check if dataframe is not empty
-            scaler = MinMaxScaler(feature_range=(0, 100))
-            analysis_df['turnaround_score'] = scaler.fit_transform(
-                analysis_df['raw_score'].values.reshape(-1, 1)
-            ).flatten()
+        # Re-apply the global normalization from the stored raw scores
+        with STAGE_SECONDS.time('scaling'):
+            self.scaler.fit(analysis_df['raw_score'].values)
+            analysis_df['turnaround_score'] = self.scaler.transform(analysis_df['raw_score'].values)
+        
+        analysis_df = analysis_df[self._output_columns(df.columns)]
+        
+        changes = None
+        if STORAGE.queryable:
+            # Rows to write: recomputed, rescored by the new normalization, or moved
+            dirty = changed.copy()
+            dirty[unchanged] |= positions[unchanged] != np.flatnonzero(unchanged)
+            dirty[unchanged] |= (analysis_df['turnaround_score'].values[unchanged] !=
+                                 previous['turnaround_score'].values[positions[unchanged]])
+            kept = np.zeros(len(previous), dtype=bool)
+            kept[positions[known]] = True
+            removed = previous['listing_id'].values[~kept]
+            changes = (np.flatnonzero(dirty), removed, signature)
+        
+        self._save(analysis_df, changes)
+        return analysis_df, int(changed.sum())
+    
+    def analyze_streaming(self, input_path, output_path=ANALYZED_LISTINGS_PATH, chunksize=50000):
+        """
+        Analyze a listings file too large to hold in memory.
+        Pass 1 reads the raw listings in chunks, computes features and
+        tracks the raw score min/max while writing to a temporary file.
+        Pass 2 re-reads that file chunk by chunk, applies the global
+        0-100 normalization and writes the final dataset.
+        Peak memory is bounded by `chunksize`, not by the file size.
+        Returns a summary dict.
+        """
+        input_storage = storage_for_path(input_path)
+        output_storage = storage_for_path(output_path)
+        partial_path = new_snapshot_path(output_path)
+        # Intermediate features go to a plain file even when the output is a database
+        feature_storage = output_storage if not output_storage.queryable else (
+            ParquetStorage() if ParquetStorage.available() else CsvStorage())
+        features_path = partial_path + '.features.tmp'
+        
+        # Pass 1: features and raw score range
+        self.scaler.reset()
+        rows = 0
+        chunks = 0
+        input_columns = None
+        writer = feature_storage.open_writer(features_path)
+        try:
+            for chunk in input_storage.iter_chunks(input_path, chunksize):
+                if input_columns is None:
+                    input_columns = list(chunk.columns)
+                self._compute_features(chunk)
+                with STAGE_SECONDS.time('keys'):
+                    chunk['listing_id'] = listing_ids(chunk['url'].values)
+                    chunk['content_hash'] = content_hashes(chunk, salt=self.signals.rules)
+                self.scaler.partial_fit(chunk['raw_score'].values)
+                with STAGE_SECONDS.time('write'):
+                    writer.write(chunk)
+                rows += len(chunk)
+                chunks += 1
+        finally:
+            writer.close()
+        
+        # Pass 2: normalize and write the final dataset
+        try:
+            if rows == 0:
+                # Nothing to normalize; the output is still replaced, by an empty dataset
+                if os.path.exists(features_path):
+                    os.remove(features_path)
+                with STAGE_SECONDS.time('write'):
+                    output_storage.write(self._empty_result(input_storage.read(input_path)), partial_path)
+            else:
+                columns = self._output_columns(input_columns)
+                writer = output_storage.open_writer(partial_path)
+                try:
+                    for chunk in feature_storage.iter_chunks(features_path, chunksize):
+                        with STAGE_SECONDS.time('scaling'):
+                            chunk['turnaround_score'] = self.scaler.transform(chunk['raw_score'].values)
+                        with STAGE_SECONDS.time('write'):
+                            writer.write(chunk[columns])
+                finally:
+                    writer.close()
+                    os.remove(features_path)
+        except BaseException:
+            _remove_partial(partial_path)
+            raise
+        
+        # Publish the finished snapshot in one step; too large to preload
+        if os.path.abspath(output_path) == os.path.abspath(dataset_cache.path):
+            dataset_cache.publish(partial_path, preload=False)
         else:
-            analysis_df['turnaround_score'] = []
+            output_storage.publish(partial_path, output_path)
         
-        # Add difficulty rating (1-5, with 5 being most difficult)
-        analysis_df['turnaround_difficulty'] = analysis_df.apply(
-            self._calculate_difficulty, axis=1
-        )
+        return {
+            'rows': rows,
+            'chunks': chunks,
+            'raw_score_min': self.scaler.data_min,
+            'raw_score_max': self.scaler.data_max,
+        }
+    
+    def _empty_result(self, df):
+        """The analyzed dataset of an input with no listings: every output column, no rows"""
+        empty = df.iloc[:0].copy()
+        self._compute_features(empty)
+        empty['turnaround_score'] = np.zeros(0)
+        empty['listing_id'] = listing_ids(empty['url'].values)
+        empty['content_hash'] = content_hashes(empty, salt=self.signals.rules)
+        return empty[self._output_columns(df.columns)]
+    
+    def _feature_columns(self):
+        """Per-listing columns computed by _compute_features(), in output order"""
+        return (['price_to_revenue_ratio'] + self.signals.signals +
+                ['raw_score', 'turnaround_difficulty'])
+    
+    def _output_columns(self, input_columns):
+        """Column order of the analyzed dataset"""
+        computed = self._feature_columns()[:-1] + [
+            'turnaround_score', 'turnaround_difficulty', 'listing_id', 'content_hash'
+        ]
+        return [c for c in input_columns if c not in computed] + computed
+    
+    def _compute_features(self, analysis_df):
+        """Add ratio, signal flags, raw score and difficulty columns in place"""
+        # Calculate basic financial metrics
+        with STAGE_SECONDS.time('ratio'):
+            analysis_df['price_to_revenue_ratio'] = scoring.price_to_revenue_ratio(
+                analysis_df['price'].values, analysis_df['revenue'].values
+            )
         
-        # Save analyzed data
-        analysis_df.to_csv('data/analyzed_listings.csv', index=False)
+        # Identify distress, performance and location signals from the
+        # description in a single pass (rules live in signal_rules.json)
+        with STAGE_SECONDS.time('signals'):
+            flags = self.signals.extract(analysis_df['description'].values)
+            for signal, values in flags.items():
+                analysis_df[signal] = values
+        for signal, values in flags.items():
+            SIGNAL_LISTINGS.inc(signal, amount=int(values.sum()))
         
+        # Simple turnaround score calculation
+        # Higher score = better turnaround opportunity
+        with STAGE_SECONDS.time('raw_score'):
+            analysis_df['raw_score'] = scoring.raw_scores(
+                analysis_df['price_to_revenue_ratio'].values,
+                flags,
+                self.signals.weights
+            )
+        
+        # Add difficulty rating (1-5, with 5 being most difficult)
+        with STAGE_SECONDS.time('difficulty'):
+            analysis_df['turnaround_difficulty'] = scoring.difficulty(
+                analysis_df['price'].values,
+                analysis_df['declining_revenue'].values,
+                analysis_df['management_issues'].values,
+                analysis_df['price_drop'].values,
+                analysis_df['prime_location'].values
+            )
+        ANALYZED_ROWS.inc(amount=len(analysis_df))
         return analysis_df
     
+    def _save(self, analysis_df, changes=None):
+        """
+        Write the analyzed dataset as a new snapshot and publish it.
+        For databases, `changes` is (positions, removed IDs, signature read)
+        from an incremental run, and only those rows are written.
+        """
+        if STORAGE.queryable:
+            # Databases take the result as one bulk-upsert transaction
+            with STAGE_SECONDS.time('write'):
+                if changes is None or not STORAGE.update(analysis_df, ANALYZED_LISTINGS_PATH, *changes):
+                    STORAGE.write(analysis_df, ANALYZED_LISTINGS_PATH)
+            dataset_cache.invalidate()
+            return
+        snapshot = new_snapshot_path(ANALYZED_LISTINGS_PATH)
+        try:
+            with STAGE_SECONDS.time('write'):
+                STORAGE.write(analysis_df, snapshot)
+        except BaseException:
+            _remove_partial(snapshot)
+            raise
+        with STAGE_SECONDS.time('publish'):
+            dataset_cache.publish(snapshot, frame=analysis_df)
+    
     def _calculate_difficulty(self, row):
-        """Calculate turnaround difficulty on a scale of 1-5"""
+        """
+        Calculate turnaround difficulty on a scale of 1-5 for a single row.
+        Reference implementation for scoring.difficulty, which is used in bulk.
+        """
         difficulty = 3  # Default moderate difficulty
         
         # Factors that increase difficulty
@@ -93,4 +336,10 @@ class BusinessAnalyzer:
             difficulty -= 0.5
         
         # Ensure within range 1-5
-        return max(1, min(5, round(difficulty)))
\ No newline at end of file
+        return max(1, min(5, round(difficulty)))
+
+
+def _remove_partial(path):
+    """Delete an unfinished snapshot left by a failed write"""
+    if os.path.exists(path):
+        os.remove(path)
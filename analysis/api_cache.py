@@ -0,0 +1,226 @@
+# analysis/api_cache.py
+import functools
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import request, make_response
+
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip
+    brotli = None
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Payloads smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    # No timestamp in the header, so every worker produces the same bytes for an ETag
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def supported_encodings():
+    """Content-Encodings this server can produce, in order of preference"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+class ApiResponseCache:
+    """
+    Bounded LRU cache of serialized API responses.
+
+    Entries are keyed by route, query string and dataset version, so they
+    never need explicit invalidation: a refreshed dataset gets a new
+    version and old entries simply age out. Compressed variants are built
+    on first request and kept alongside the plain body.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> entry, least recently used first
+        self.total_bytes = 0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(path, args, version):
+        query = '&'.join(f"{name}={value}" for name, value in sorted(args.items(multi=True)))
+        return f"{path}?{query}#{version}"
+
+    @staticmethod
+    def make_etag(key):
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype):
+        entry = {'key': key, 'body': body, 'mimetype': mimetype,
+                 'etag': self.make_etag(key), 'encoded': {}}
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= self._size(previous)
+            self._entries[key] = entry
+            self.total_bytes += len(body)
+            self._evict()
+        return entry
+
+    def encoded(self, entry, encoding):
+        """Body of `entry` compressed with `encoding`, compressing it only once"""
+        body = entry['encoded'].get(encoding)
+        if body is None:
+            body = _compress(entry['body'], encoding)
+            with self._lock:
+                if encoding not in entry['encoded']:
+                    entry['encoded'][encoding] = body
+                    if self._entries.get(entry['key']) is entry:
+                        self.total_bytes += len(body)
+                        self._evict()
+        return body
+
+    @staticmethod
+    def _size(entry):
+        return len(entry['body']) + sum(len(body) for body in entry['encoded'].values())
+
+    def _evict(self):
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self.total_bytes -= self._size(entry)
+            self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'encodings': supported_encodings(),
+            }
+
+
+def _negotiate_encoding(body):
+    if len(body) < MIN_COMPRESS_BYTES:
+        return None
+    return request.accept_encodings.best_match(supported_encodings())
+
+
+def _variant_etag(etag, encoding):
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def _matching_etag(etag):
+    """The variant of `etag` named in If-None-Match, if any"""
+    for encoding in [None] + supported_encodings():
+        candidate = _variant_etag(etag, encoding)
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def _not_modified(cache, etag):
+    cache.record_not_modified()
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _respond(cache, entry):
+    encoding = _negotiate_encoding(entry['body'])
+    body = entry['body']
+    if entry['etag'] is None:
+        # Not cacheable (no dataset version yet): compress and send as is
+        response = make_response(_compress(body, encoding) if encoding else body)
+    else:
+        etag = _variant_etag(entry['etag'], encoding)
+        if request.if_none_match.contains(etag):
+            return _not_modified(cache, etag)
+        response = make_response(cache.encoded(entry, encoding) if encoding else body)
+        response.set_etag(etag)
+        # Let clients keep the body but revalidate on every poll
+        response.headers['Cache-Control'] = 'no-cache'
+
+    response.mimetype = entry['mimetype']
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def cached_response(cache, dataset_cache):
+    """
+    Decorator for JSON endpoints whose output depends only on the query
+    string and the analyzed dataset. Successful responses are memoized per
+    dataset version, tagged with an ETag (If-None-Match is answered with
+    304) and compressed with brotli/gzip when the client accepts it.
+    Versions depend only on the dataset file, so an ETag from one worker
+    process is honoured by every other, even one that has not loaded the
+    dataset yet.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version = dataset_cache.file_version()
+            if version is not None:
+                key = cache.make_key(request.path, request.args, version)
+                # Revalidations are answered without looking at the body
+                etag = _matching_etag(cache.make_etag(key))
+                if etag is not None:
+                    return _not_modified(cache, etag)
+                entry = cache.get(key)
+                if entry is not None:
+                    return _respond(cache, entry)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            body = response.get_data()
+            # The view may have loaded a newer dataset; store under the version it used
+            version = dataset_cache.current_version()
+            if version is None:
+                entry = {'body': body, 'mimetype': response.mimetype, 'etag': None}
+            else:
+                key = cache.make_key(request.path, request.args, version)
+                entry = cache.put(key, body, response.mimetype)
+            return _respond(cache, entry)
+        return wrapper
+    return decorator
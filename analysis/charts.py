@@ -0,0 +1,195 @@
+# analysis/charts.py
+import colorsys
+
+import numpy as np
+import pandas as pd
+
+from analysis.compact import python_values
+from analysis.opportunities import QueryError
+
+SCORE_BINS = [0, 20, 40, 60, 80, 100]
+SCORE_LABELS = ['0-20', '21-40', '41-60', '61-80', '81-100']
+
+# Scores are mapped onto this many colours (red -> green)
+PALETTE_SIZE = 16
+
+DOWNSAMPLE_MODES = ('grid', 'sample')
+DEFAULT_MAX_POINTS = 2000
+MAX_POINTS_LIMIT = 20000
+# Share of the sample reserved for outliers in 'sample' mode
+OUTLIER_SHARE = 0.25
+OUTLIER_QUANTILES = (0.005, 0.995)
+
+
+def score_palette(size=PALETTE_SIZE):
+    """rgba() colours for evenly spaced scores from 0 (red) to 100 (green)"""
+    palette = []
+    for level in range(size):
+        h = (120 * level / (size - 1)) / 360  # 0 = red, 120 = green in HSL
+        r, g, b = colorsys.hsv_to_rgb(h, 0.8, 0.8)
+        palette.append(f'rgba({int(r*255)}, {int(g*255)}, {int(b*255)}, 0.7)')
+    return palette
+
+
+def color_levels(scores, size=PALETTE_SIZE):
+    """Index into score_palette() for each score"""
+    fraction = np.clip(np.asarray(scores, dtype=np.float64) / 100, 0, 1)
+    return np.rint(fraction * (size - 1)).astype(np.int64)
+
+
+def _log_values(values):
+    # The scatter uses logarithmic axes, where values below 1 cannot be shown anyway
+    return np.log10(np.maximum(np.asarray(values, dtype=np.float64), 1))
+
+
+def sample_positions(price, revenue, max_points, seed=0):
+    """
+    Pick at most `max_points` rows: the most extreme points on either axis
+    (so outliers stay visible) plus a uniform sample of the rest.
+    """
+    count = len(price)
+    if count <= max_points:
+        return np.arange(count)
+
+    log_price, log_revenue = _log_values(price), _log_values(revenue)
+    low, high = OUTLIER_QUANTILES
+    outside = np.zeros(count, dtype=bool)
+    distance = np.zeros(count)
+    for values in (log_price, log_revenue):
+        lower, median, upper = np.quantile(values, [low, 0.5, high])
+        outside |= (values < lower) | (values > upper)
+        distance = np.maximum(distance, np.abs(values - median))
+
+    outliers = np.flatnonzero(outside)
+    outlier_budget = int(max_points * OUTLIER_SHARE)
+    if len(outliers) > outlier_budget:
+        # Keep the points furthest from the centre
+        order = np.argsort(-distance[outliers], kind='stable')
+        outliers = outliers[order[:outlier_budget]]
+
+    rest = np.setdiff1d(np.arange(count), outliers, assume_unique=True)
+    rng = np.random.default_rng(seed)
+    sampled = rng.choice(rest, size=max_points - len(outliers), replace=False)
+    return np.sort(np.concatenate([outliers, sampled]))
+
+
+def _points(titles, price, revenue, scores, difficulty, counts=None):
+    fields = ['x', 'y', 'title', 'score', 'difficulty']
+    columns = [price.tolist(), revenue.tolist(), titles, python_values(scores), difficulty.tolist()]
+    if counts is not None:
+        fields.append('count')
+        columns.append(counts.tolist())
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+def grid_cells(df, bins):
+    """
+    Aggregate the scatter into a bins x bins grid over log price/revenue.
+    Returns one row per non-empty cell with its count, the mean log
+    price/revenue, mean score/difficulty and a member's title.
+    """
+    log_price = _log_values(df['price'].to_numpy())
+    log_revenue = _log_values(df['revenue'].to_numpy())
+
+    def cell_index(values):
+        low, high = values.min(), values.max()
+        span = high - low if high > low else 1.0
+        return np.minimum(((values - low) / span * bins).astype(np.int64), bins - 1)
+
+    cells = cell_index(log_price) * bins + cell_index(log_revenue)
+    occupied, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+
+    def cell_mean(values):
+        return np.bincount(inverse, weights=values, minlength=len(occupied)) / counts
+
+    member = np.empty(len(occupied), dtype=np.int64)
+    member[inverse] = np.arange(len(cells))
+    return pd.DataFrame({
+        'count': counts,
+        'log_price': cell_mean(log_price),
+        'log_revenue': cell_mean(log_revenue),
+        'score': cell_mean(df['turnaround_score'].to_numpy(dtype=np.float64)),
+        'difficulty': cell_mean(df['turnaround_difficulty'].to_numpy(dtype=np.float64)),
+        'title': df['title'].iloc[member].to_numpy(),
+    })
+
+
+def cell_points(cells):
+    """
+    Scatter points for grid_cells() rows: each sits at the geometric mean
+    of its members and carries their count and mean score/difficulty.
+    """
+    counts = cells['count'].to_numpy()
+    # A lone listing in its cell keeps its own title
+    titles = [str(title) if n == 1 else f"{n} listings"
+              for title, n in zip(cells['title'].tolist(), counts.tolist())]
+    mean_scores = np.round(cells['score'].to_numpy(dtype=np.float64), 1)
+    points = _points(
+        titles,
+        np.round(10 ** cells['log_price'].to_numpy(dtype=np.float64)),
+        np.round(10 ** cells['log_revenue'].to_numpy(dtype=np.float64)),
+        mean_scores,
+        np.round(cells['difficulty'].to_numpy(dtype=np.float64), 1),
+        counts,
+    )
+    return points, mean_scores
+
+
+def grid_bins(max_points):
+    """Grid side length so that at most max_points cells exist"""
+    return max(int(np.sqrt(max_points)), 1)
+
+
+def parse_downsample(mode, max_points):
+    """Validate the `downsample=` and `max_points=` parameters"""
+    if mode in (None, '', 'none'):
+        mode = None
+    elif mode not in DOWNSAMPLE_MODES:
+        raise QueryError(f"downsample must be one of: none, {', '.join(DOWNSAMPLE_MODES)}")
+    if max_points is None:
+        max_points = DEFAULT_MAX_POINTS
+    if max_points < 1:
+        raise QueryError("max_points must be positive")
+    return mode, min(max_points, MAX_POINTS_LIMIT)
+
+
+def chart_payload(df, downsample=None, max_points=DEFAULT_MAX_POINTS, score_counts=None):
+    """
+    Build the dashboard chart data: the score histogram plus the
+    price-vs-revenue scatter. Points are coloured through a small palette
+    (`palette` + per-point `color_index`) instead of one colour string per
+    point. With downsample='grid' the scatter is binned into at most
+    max_points cells; with 'sample' at most max_points listings are kept.
+    `score_counts` can be passed in when the histogram was computed elsewhere.
+    """
+    if score_counts is None:
+        scores = df['turnaround_score'].to_numpy(dtype=np.float64)
+        score_counts = np.histogram(scores, bins=SCORE_BINS)[0].tolist()
+
+    if downsample == 'grid':
+        points, point_scores = cell_points(grid_cells(df, grid_bins(max_points)))
+    else:
+        positions = np.arange(len(df))
+        if downsample == 'sample':
+            positions = sample_positions(df['price'].to_numpy(), df['revenue'].to_numpy(), max_points)
+        point_scores = df['turnaround_score'].to_numpy(dtype=np.float64)[positions]
+        points = _points(
+            df['title'].iloc[positions].tolist(),
+            df['price'].to_numpy()[positions],
+            df['revenue'].to_numpy()[positions],
+            df['turnaround_score'].to_numpy()[positions],
+            df['turnaround_difficulty'].to_numpy()[positions],
+        )
+    return payload(score_counts, points, point_scores, len(df), downsample)
+
+
+def payload(score_counts, points, point_scores, total_points, downsample=None):
+    return {
+        'score_labels': SCORE_LABELS,
+        'score_data': score_counts,
+        'price_revenue_data': points,
+        'palette': score_palette(),
+        'color_index': color_levels(point_scores).tolist(),
+        'total_points': total_points,
+        'downsample': downsample or 'none',
+    }
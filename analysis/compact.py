@@ -0,0 +1,107 @@
+# analysis/compact.py
+import sys
+
+import numpy as np
+
+from analysis.storage import ParquetStorage
+
+# In-memory dtypes of the analyzed listings; the stored files keep the
+# full-width dtypes of storage.COLUMN_DTYPES. turnaround_score stays float64:
+# min_score filters and sorts on it, and must see the values as stored.
+COMPACT_DTYPES = {
+    'price_drop': 'uint8',
+    'urgency_signal': 'uint8',
+    'declining_revenue': 'uint8',
+    'management_issues': 'uint8',
+    'prime_location': 'uint8',
+    'turnaround_difficulty': 'uint8',
+    'price_to_revenue_ratio': 'float32',
+    'raw_score': 'float32',
+    'location': 'category',
+}
+# float32 values are sent with this many significant digits (all float32 holds reliably)
+FLOAT32_DIGITS = 7
+
+
+def _compact_strings(series):
+    """
+    Python object strings as one Arrow string buffer when pyarrow is
+    installed; otherwise equal values are interned so they share one object.
+    """
+    if ParquetStorage.available():
+        return series.astype('str')
+    return series.map(lambda value: sys.intern(value) if isinstance(value, str) else value)
+
+
+def compact(df):
+    """
+    A copy of an analyzed listings frame using COMPACT_DTYPES: uint8 flags
+    and difficulty, float32 ratios and raw scores and a categorical location. Other
+    string columns held as Python objects (CSV loads) are packed as well.
+    Columns that are missing or hold values that don't fit are left as they are.
+    """
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        dtype = COMPACT_DTYPES.get(column)
+        if dtype is None:
+            if series.dtype == object:
+                columns[column] = _compact_strings(series)
+            continue
+        if str(series.dtype) == dtype:
+            continue
+        if dtype == 'uint8':
+            values = series.to_numpy()
+            if len(values) and (values.min() < 0 or values.max() > 255):
+                continue
+        columns[column] = series.astype(dtype)
+    if not columns:
+        return df
+    return df.assign(**columns)
+
+
+def python_values(values):
+    """
+    values.tolist(), except float32 values are rounded to FLOAT32_DIGITS
+    significant digits, so 0.4 goes out as 0.4 rather than 0.4000000059604645.
+    The API therefore sends compacted ratios and raw scores at that precision,
+    not the full float64 values in the files.
+    """
+    if getattr(values, 'dtype', None) != np.float32:
+        return values.tolist()
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    magnitude = np.floor(np.log10(np.abs(np.where(finite & (values != 0), values, 1))))
+    scale = 10.0 ** (FLOAT32_DIGITS - 1 - magnitude)
+    return np.where(finite, np.round(values * scale) / scale, values).tolist()
+
+
+def release_unused():
+    """
+    Hand memory that Arrow's allocator keeps after a file is decoded (and
+    after compact() drops the full-width columns) back to the OS
+    """
+    if ParquetStorage.available():
+        import pyarrow as pa
+        pa.default_memory_pool().release_unused()
+
+
+def memory_report(df):
+    """
+    Bytes held by each column (strings included), largest first, with the
+    dtype and bytes per row, plus the total.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    rows = max(len(df), 1)
+    columns = [{
+        'column': column,
+        'dtype': str(df[column].dtype),
+        'bytes': int(usage[column]),
+        'bytes_per_row': round(float(usage[column]) / rows, 2),
+    } for column in df.columns]
+    columns.sort(key=lambda entry: entry['bytes'], reverse=True)
+    return {
+        'rows': len(df),
+        'bytes': int(usage.sum()),
+        'columns': columns,
+    }
@@ -0,0 +1,397 @@
+# analysis/dataset.py
+import os
+import threading
+import time
+
+import numpy as np
+
+from analysis import metrics
+from analysis.compact import compact, memory_report, release_unused
+from analysis.storage import (ParquetStorage, apply_schema, get_storage, dataset_path,
+                              migrate_legacy_csv, backfill_listing_keys, read_warm_snapshot,
+                              write_warm_snapshot)
+
+STORAGE = get_storage()
+ANALYZED_LISTINGS_PATH = dataset_path(STORAGE)
+
+# Load the dataset when the app starts, from a warm Arrow snapshot kept next to it
+PREWARM_DATASET = os.environ.get('PREWARM_DATASET', '').lower() in ('1', 'true', 'yes')
+# Serve the full frame memory-mapped from the warm Arrow snapshot, so worker processes
+# share one read-only copy instead of each parsing a private one (needs pyarrow). Costs
+# an uncompressed copy of the dataset on disk, rewritten with every published version.
+SHARE_DATASET = os.environ.get(
+    'SHARE_DATASET', '1' if ParquetStorage.available() else '0').lower() in ('1', 'true', 'yes')
+# Hold the dataset in memory with compact dtypes (analysis.compact); the files keep full precision
+COMPACT_DATASET = os.environ.get('COMPACT_DATASET', '1').lower() in ('1', 'true', 'yes')
+
+# Reading and parsing the dataset: the whole frame, a column projection, a preloaded
+# snapshot, single records, or a prewarm at startup (from the warm snapshot or not)
+LOAD_SECONDS = metrics.histogram('dataset_load_seconds', 'Time to read and parse the analyzed dataset',
+                                 ['format', 'kind'])
+
+
+class DatasetCache:
+    """
+    Process-wide cache of the analyzed listings.
+    The file is parsed once and served from memory until its mtime/size
+    changes or the analyzer calls invalidate() after writing a new result.
+    With warm snapshots the full frame is memory-mapped from the snapshot,
+    so every worker process on the host shares one read-only copy.
+    """
+
+    def __init__(self, path=ANALYZED_LISTINGS_PATH, storage=STORAGE,
+                 warm_snapshots=SHARE_DATASET or PREWARM_DATASET,
+                 compact=COMPACT_DATASET):
+        self.path = path
+        self.storage = storage
+        # Keep a warm snapshot of every published version for prewarm()
+        self.warm_snapshots = warm_snapshots
+        # Convert loaded frames to the compact in-memory dtypes
+        self.compact = compact
+        self._lock = threading.RLock()
+        self._df = None
+        self._projections = {}
+        self._migrated = False
+        self._signature = None
+        self._derived = {}
+        # Values of updatable derived structures from the previous version
+        self._retired = {}
+        self._updatable = set()
+        # The full frame is backed by the memory-mapped warm snapshot
+        self._shared = False
+        self._memory = None
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.last_load_seconds = None
+        self.total_load_seconds = 0.0
+
+    def _file_signature(self):
+        """Return (mtime_ns, size) of the dataset file, or None if missing"""
+        if self.storage.queryable:
+            return self.storage.signature(self.path)
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _migrate(self):
+        """
+        One-time conversion of a CSV left over from older versions, and of
+        datasets written before listings had stable IDs
+        """
+        self._migrated = True
+        if self._file_signature() is None and self.path == ANALYZED_LISTINGS_PATH:
+            migrate_legacy_csv(self.storage)
+        backfill_listing_keys(self.storage, self.path)
+
+    def columns(self):
+        """
+        Column names of the dataset on disk, read without loading it.
+        Raises FileNotFoundError if no analyzed data exists yet.
+        """
+        if not self._migrated:
+            self._migrate()
+        with self._lock:
+            if self._df is not None and self._file_signature() == self._signature:
+                return list(self._df.columns)
+        if self._file_signature() is None:
+            raise FileNotFoundError(self.path)
+        return self.storage.columns(self.path)
+
+    def get(self, columns=None):
+        """
+        Return the analyzed listings DataFrame, or only the given columns.
+        The returned frame is shared between requests and must not be modified.
+        Raises FileNotFoundError if no analyzed data exists yet.
+        """
+        key = tuple(columns) if columns is not None else None
+        if not self._migrated:
+            self._migrate()
+        signature = self._file_signature()
+
+        with self._lock:
+            if signature != self._signature:
+                # Re-check under the lock in case a snapshot was just published
+                signature = self._file_signature()
+            if signature != self._signature:
+                self._clear()
+            if signature is None:
+                self.misses += 1
+                raise FileNotFoundError(self.path)
+
+            if key is None and self._df is not None:
+                self.hits += 1
+                return self._df
+            if key is not None:
+                if key in self._projections:
+                    self.hits += 1
+                    return self._projections[key]
+                if self._df is not None:
+                    # Serve projections from the full frame when it is already loaded
+                    self.hits += 1
+                    self._projections[key] = self._df[list(key)]
+                    return self._projections[key]
+
+            self.misses += 1
+            start = time.perf_counter()
+            if key is None and self.warm_snapshots and not self.storage.queryable:
+                df, _, shared = self._read_shared(signature)
+            else:
+                df = self._prepare(self.storage.read(self.path, columns=list(key) if key else None))
+                shared = False
+            elapsed = time.perf_counter() - start
+            LOAD_SECONDS.observe(self.storage.name, 'full' if key is None else 'columns', value=elapsed)
+
+            self._signature = signature
+            if key is None:
+                self._df = df
+                self._shared = shared
+            else:
+                self._projections[key] = df
+            self.loads += 1
+            self.last_load_seconds = elapsed
+            self.total_load_seconds += elapsed
+            return df
+
+    def invalidate(self):
+        """Drop the cached frame so the next get() reloads from disk"""
+        with self._lock:
+            self._clear()
+
+    def publish(self, snapshot, preload=True, frame=None):
+        """
+        Make a finished snapshot file the current dataset. With preload the
+        snapshot is read first while requests keep using the old frame, and
+        the file swap and the cache switch then happen together, so readers
+        are never blocked on a reload. A writer that still holds the data
+        it wrote passes it as `frame`, and it is used instead of reading
+        the snapshot back.
+        """
+        df = None
+        if preload and not self.storage.queryable:
+            start = time.perf_counter()
+            if frame is None:
+                df = self._prepare(self.storage.read(snapshot))
+            else:
+                df = self._prepare(apply_schema(frame))
+            elapsed = time.perf_counter() - start
+            LOAD_SECONDS.observe(self.storage.name, 'preload', value=elapsed)
+        with self._lock:
+            self.storage.publish(snapshot, self.path)
+            self._clear()
+            if df is not None:
+                self._install(df, self._file_signature(), elapsed)
+                signature = self._signature
+        if df is not None and self.warm_snapshots and write_warm_snapshot(df, self.path, signature):
+            # Switch to the mapped copy too, so this process holds no private one either
+            shared = read_warm_snapshot(self.path, signature)
+            with self._lock:
+                if shared is not None and self._df is df and self._signature == signature:
+                    self._df = shared
+                    self._shared = True
+                    self._memory = None
+
+    def prewarm(self):
+        """
+        Load the full dataset ahead of the first request. A warm snapshot
+        (uncompressed Arrow, memory-mapped) is used when it matches the
+        current file; otherwise the file is read normally and the warm
+        snapshot is written for the next process that starts.
+        Returns 'warm', 'cold', 'loaded' (already in memory) or None
+        (nothing to load, or the storage is queried in place).
+        """
+        if self.storage.queryable:
+            return None
+        signature = self._file_signature()
+        if signature is None:
+            return None
+        with self._lock:
+            if self._df is not None and signature == self._signature:
+                return 'loaded'
+        start = time.perf_counter()
+        df, source, shared = self._read_shared(signature)
+        elapsed = time.perf_counter() - start
+        LOAD_SECONDS.observe(self.storage.name, 'prewarm_' + source, value=elapsed)
+        with self._lock:
+            if self._file_signature() != signature:
+                # A new version was published meanwhile; leave it to get()
+                return None
+            self._clear()
+            self._install(df, signature, elapsed)
+            self._shared = shared
+        return source
+
+    def read_exact(self, columns=None):
+        """
+        The dataset (or the given columns) with the values as stored, for
+        code that writes them back. It comes from the cache; only the
+        columns compact() narrowed to float32 are read from disk again, at
+        full width. The result is not cached.
+        """
+        while True:
+            with self._lock:
+                df = self.get(columns=columns)
+                signature = self._signature
+            narrowed = [column for column in df.columns if df[column].dtype == np.float32]
+            if not narrowed:
+                return df
+            exact = self.storage.read(self.path, columns=narrowed)
+            # Retry if a new version was published while the columns were read
+            if self._file_signature() == signature and len(exact) == len(df):
+                return df.assign(**{column: exact[column].to_numpy() for column in narrowed})
+
+    def _read_shared(self, signature):
+        """
+        Read the full frame from the warm snapshot, memory-mapped so worker
+        processes share one read-only copy. Without a matching snapshot the
+        file is read and the snapshot written, then mapped back so this
+        process holds no private copy either.
+        Returns (frame, 'warm' or 'cold', whether the frame is mapped).
+        """
+        df = read_warm_snapshot(self.path, signature)
+        if df is not None:
+            return self._prepare(df), 'warm', True
+        df = self._prepare(self.storage.read(self.path))
+        if write_warm_snapshot(df, self.path, signature) is not None:
+            shared = read_warm_snapshot(self.path, signature)
+            if shared is not None:
+                return shared, 'cold', True
+        return df, 'cold', False
+
+    def _prepare(self, df):
+        """A freshly read frame, compacted, with the decode buffers released"""
+        if self.compact:
+            df = compact(df)
+        release_unused()
+        return df
+
+    def _install(self, df, signature, elapsed):
+        """Make an already loaded full frame the cached dataset (lock held)"""
+        self._signature = signature
+        self._df = df
+        self.loads += 1
+        self.last_load_seconds = elapsed
+        self.total_load_seconds += elapsed
+
+    def _clear(self):
+        retired = {name: value for name, value in self._derived.items() if name in self._updatable}
+        if retired:
+            self._retired = retired
+        self._df = None
+        self._projections = {}
+        self._signature = None
+        self._derived = {}
+        self._shared = False
+        self._memory = None
+
+    def _version_of(self, signature):
+        """
+        Version string of a file signature. It depends only on the file, so
+        every worker process serving the same file agrees on it and cursors
+        and ETags handed out by one are accepted by the others.
+        """
+        if signature is None:
+            return None
+        prefix = 'db-' if self.storage.queryable else ''
+        return f"{prefix}{signature[0]:x}-{signature[1]:x}"
+
+    @property
+    def version(self):
+        """Identifier of the currently cached dataset (None if nothing is loaded)"""
+        with self._lock:
+            return self._version_of(self._signature)
+
+    def file_version(self):
+        """Version of the dataset on disk, whether or not this process has loaded it"""
+        return self._version_of(self._file_signature())
+
+    def current_version(self):
+        """
+        Version of the cached dataset if it still matches the file on disk,
+        None if nothing is loaded or the file has changed since.
+        """
+        signature = self._file_signature()
+        if signature is not None and self.storage.queryable:
+            # Databases are queried in place; their own counter is the version
+            return self._version_of(signature)
+        with self._lock:
+            if signature is None or signature != self._signature:
+                return None
+            return self.version
+
+    def derived(self, name, builder, columns=None, update=None):
+        """
+        Return a value computed from the cached frame (or from a projection
+        of `columns`), building it with builder(df) at most once per dataset
+        version. With `update`, the value from the previous version is
+        carried over as update(previous, df) instead of rebuilt from scratch.
+        """
+        key = tuple(columns) if columns is not None else None
+        df = self.get(columns=columns)
+        with self._lock:
+            current = self._df if key is None else self._projections.get(key)
+            if df is current and name in self._derived:
+                return self._derived[name]
+            previous = None
+            if update is not None:
+                self._updatable.add(name)
+                previous = self._retired.get(name)
+            value = builder(df) if previous is None else update(previous, df)
+            if df is current:
+                self._derived[name] = value
+                self._retired.pop(name, None)
+            return value
+
+    def read_rows(self, positions, columns=None):
+        """
+        Rows at `positions` of the current dataset. Served from memory when
+        the full frame is loaded; otherwise only the records needed are
+        read from disk, using a row locator built once per version.
+        """
+        with self._lock:
+            if self._df is not None and self._file_signature() == self._signature:
+                self.hits += 1
+                df = self._df if columns is None else self._df[list(columns)]
+                return df.take(positions).reset_index(drop=True)
+        locator = self.derived('_row_locator', lambda _: self.storage.row_locator(self.path),
+                               columns=['listing_id'])
+        with LOAD_SECONDS.time(self.storage.name, 'rows'):
+            return self.storage.read_rows(self.path, positions, locator, columns=columns)
+
+    def memory_report(self):
+        """analysis.compact.memory_report() of the loaded full frame, or None"""
+        with self._lock:
+            if self._df is None:
+                return None
+            if self._memory is None:
+                self._memory = memory_report(self._df)
+            return self._memory
+
+    def stats(self):
+        """Return hit/miss counts and load timings"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'format': self.storage.name,
+                'loaded': self._df is not None,
+                'rows': len(self._df) if self._df is not None else 0,
+                'compact': self.compact,
+                'shared': self._shared,
+                'projections': [list(key) for key in self._projections],
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'loads': self.loads,
+                'last_load_seconds': self.last_load_seconds,
+                'total_load_seconds': self.total_load_seconds,
+            }
+
+
+# Shared by every Flask endpoint and invalidated by the analyzer
+dataset_cache = DatasetCache()
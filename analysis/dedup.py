@@ -0,0 +1,306 @@
+# analysis/dedup.py
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from analysis import metrics
+from analysis.listing_ids import listing_ids, lookup_positions
+from analysis.search import text_tokens
+from analysis.storage import DATA_DIR
+
+# Drop near-duplicate listings (relisted or cross-posted) before they are analyzed
+DEDUP_LISTINGS = os.environ.get('DEDUP_LISTINGS', '1').lower() in ('1', 'true', 'yes')
+# Which listing of a group of near-duplicates is kept
+KEEP_POLICIES = ('newest', 'cheapest')
+DEDUP_KEEP = os.environ.get('DEDUP_KEEP', 'newest').lower()
+
+SIGNATURES_PATH = os.path.join(DATA_DIR, 'listing_signatures.npz')
+# Listing text that is compared
+DEDUP_COLUMNS = ['title', 'description']
+# Words per shingle
+SHINGLE_SIZE = 3
+# MinHash signature length, split into BANDS bands of NUM_PERM // BANDS rows for LSH.
+# Listings with a Jaccard similarity of 0.7 share a band with 99.6% probability.
+NUM_PERM = 64
+BANDS = 16
+# Listings sharing a band are duplicates if at least this share of their signatures agree
+SIMILARITY_THRESHOLD = 0.7
+# LSH buckets up to this size have every pair compared; larger ones compare members with their first
+SMALL_BUCKET = 8
+# Listings MinHashed at a time (bounds the size of the shingle arrays)
+CHUNK_SIZE = 50_000
+SEED = 0x5EED
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+DEDUP_LISTINGS_SEEN = metrics.counter('dedup_listings_total', 'Listings passed through near-duplicate detection',
+                                      ['result'])
+
+
+def _mix(values):
+    """splitmix64 finalizer: a fast, well-spread uint64 -> uint64 hash"""
+    z = values + _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+# MinHash permutations are multiply-shift hashes (a * x + b) >> 32 of the shingle hashes, a odd
+_MULTIPLIERS = _mix(np.arange(NUM_PERM, dtype=np.uint64) + np.uint64(SEED)) | np.uint64(1)
+_INCREMENTS = _mix(np.arange(NUM_PERM, dtype=np.uint64) + np.uint64(SEED + NUM_PERM))
+
+
+def _texts(df):
+    text = df[DEDUP_COLUMNS[0]].fillna('').astype(str)
+    for column in DEDUP_COLUMNS[1:]:
+        text = text + ' ' + df[column].fillna('').astype(str)
+    return text.reset_index(drop=True)
+
+
+def shingles(texts):
+    """
+    Hashes of the overlapping SHINGLE_SIZE-word runs of each text, as
+    (text number, uint64 hash) sorted by text. A text shorter than that is
+    a single shingle of all its words; texts without words have none.
+    """
+    docs, codes, words = text_tokens(texts)
+    with np.errstate(over='ignore'):
+        word_hashes = pd.util.hash_array(np.asarray(words, dtype=object))[codes]
+        count = len(docs)
+        hashes = word_hashes.copy()
+        complete = np.ones(count, dtype=bool)
+        for offset in range(1, SHINGLE_SIZE):
+            same = np.zeros(count, dtype=bool)
+            same[:count - offset] = docs[offset:] == docs[:count - offset]
+            following = np.zeros(count, dtype=np.uint64)
+            following[same] = word_hashes[offset:][same[:count - offset]]
+            hashes = _mix(hashes) ^ following
+            complete &= same
+        first = np.ones(count, dtype=bool)
+        first[1:] = docs[1:] != docs[:-1]
+        lengths = np.bincount(docs, minlength=len(texts))
+        keep = complete | (first & (lengths[docs] < SHINGLE_SIZE))
+    return docs[keep], hashes[keep]
+
+
+def minhash(texts):
+    """uint32 MinHash signatures (len(texts) x NUM_PERM) of the texts' shingles"""
+    signatures = np.full((len(texts), NUM_PERM), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for start in range(0, len(texts), CHUNK_SIZE):
+        docs, hashes = shingles(texts.iloc[start:start + CHUNK_SIZE].reset_index(drop=True))
+        if not len(docs):
+            continue
+        starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+        rows = start + docs[starts]
+        with np.errstate(over='ignore'):
+            for permutation in range(NUM_PERM):
+                values = ((hashes * _MULTIPLIERS[permutation] + _INCREMENTS[permutation])
+                          >> np.uint64(32)).astype(np.uint32)
+                signatures[rows, permutation] = np.minimum.reduceat(values, starts)
+    return signatures
+
+
+def _components(count, left, right):
+    """Connected component label (its smallest member) of each of `count` nodes linked by the edges"""
+    labels = np.arange(count)
+    while len(left):
+        low = np.minimum(labels[left], labels[right])
+        np.minimum.at(labels, labels[left], low)
+        np.minimum.at(labels, labels[right], low)
+        # Point every node straight at its root
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        pending = labels[left] != labels[right]
+        left, right = left[pending], right[pending]
+    return labels
+
+
+def clusters(signatures, threshold=SIMILARITY_THRESHOLD, bands=BANDS):
+    """
+    Group near-duplicates by locality-sensitive hashing: listings whose
+    signatures agree on every row of some band fall in the same bucket of
+    that band, and bucket members that agree on at least `threshold` of
+    the whole signature are linked. Every pair of a bucket of up to
+    SMALL_BUCKET listings is compared; in larger buckets each member is
+    compared with the bucket's first member. Runs in O(n log n) per band,
+    never comparing all pairs. Returns the cluster label of each listing
+    (the position of its first member); a listing without near-duplicates
+    is its own cluster. Listings without any text are never grouped.
+    """
+    count = len(signatures)
+    rows = signatures.shape[1] // bands
+    has_text = signatures[:, 0] != np.iinfo(np.uint32).max
+    lefts, rights = [], []
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            keys = np.zeros(count, dtype=np.uint64)
+            for column in range(band * rows, (band + 1) * rows):
+                keys = _mix(keys ^ signatures[:, column].astype(np.uint64))
+            order = np.argsort(keys, kind='stable')
+            left, right = _bucket_pairs(keys[order])
+            left, right = order[left], order[right]
+            similar = (signatures[left] == signatures[right]).mean(axis=1) >= threshold
+            similar &= has_text[left]
+            lefts.append(left[similar])
+            rights.append(right[similar])
+    left = np.concatenate(lefts) if lefts else np.zeros(0, dtype=np.int64)
+    right = np.concatenate(rights) if rights else np.zeros(0, dtype=np.int64)
+    return _components(count, left, right)
+
+
+def _bucket_pairs(sorted_keys):
+    """
+    Positions (into `sorted_keys`) of the pairs to compare within each run
+    of equal keys: all pairs of a run of up to SMALL_BUCKET, otherwise each
+    member with the run's first
+    """
+    count = len(sorted_keys)
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sizes = np.diff(np.r_[starts, count])
+    bucket_start = np.repeat(starts, sizes)
+    small = np.repeat(sizes <= SMALL_BUCKET, sizes)
+
+    positions = np.arange(count)
+    large_members = np.flatnonzero(~small & (positions != bucket_start))
+    lefts, rights = [bucket_start[large_members]], [large_members]
+    for distance in range(1, min(SMALL_BUCKET, count)):
+        left = np.flatnonzero(small[:count - distance]
+                              & (bucket_start[:count - distance] == bucket_start[distance:]))
+        lefts.append(left)
+        rights.append(left + distance)
+    return np.concatenate(lefts), np.concatenate(rights)
+
+
+def representatives(labels, first_seen, price, keep=DEDUP_KEEP):
+    """
+    Boolean mask of the listing kept from each cluster: the one first seen
+    most recently ('newest') or the lowest asking price ('cheapest', where
+    an undisclosed price of 0 counts as most expensive). Ties go to the
+    newest, then to the later row.
+    """
+    positions = np.arange(len(labels))
+    if keep == 'cheapest':
+        price = np.asarray(price, dtype=np.float64)
+        price = np.where(price > 0, price, np.inf)
+        order = np.lexsort((-positions, -first_seen, price, labels))
+    else:
+        order = np.lexsort((-positions, -first_seen, labels))
+    first = np.r_[True, labels[order][1:] != labels[order][:-1]]
+    kept = np.zeros(len(labels), dtype=bool)
+    kept[order[first]] = True
+    return kept
+
+
+class ListingDeduplicator:
+    """
+    Near-duplicate detection between the scraper and the analyzer.
+    MinHash signatures of each listing's text are kept in `path`, keyed by
+    listing_id and a hash of the text, so a new scrape only hashes the
+    listings that are new or edited since the last one.
+    """
+
+    def __init__(self, path=SIGNATURES_PATH, keep=DEDUP_KEEP, threshold=SIMILARITY_THRESHOLD):
+        if keep not in KEEP_POLICIES:
+            raise ValueError(f"keep must be one of: {', '.join(KEEP_POLICIES)}")
+        self.path = path
+        self.keep = keep
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.last_run = None
+
+    def _load(self):
+        """Stored (listing ids, text hashes, first seen times, signatures), or None"""
+        try:
+            with np.load(self.path) as stored:
+                if stored['params'].tolist() != [NUM_PERM, SHINGLE_SIZE, SEED]:
+                    return None
+                return (stored['listing_id'], stored['text_hash'], stored['first_seen'],
+                        stored['signatures'])
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, ids, text_hashes, first_seen, signatures):
+        """Replace the stored signatures atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        partial_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(partial_path, 'wb') as f:
+                np.savez(f, listing_id=ids.astype('U'), text_hash=text_hashes, first_seen=first_seen,
+                         signatures=signatures, params=np.array([NUM_PERM, SHINGLE_SIZE, SEED]))
+            os.replace(partial_path, self.path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+    def signatures(self, df):
+        """
+        (listing ids, first seen times, MinHash signatures, number of
+        listings hashed) for the listings in `df`, reusing the stored
+        signatures of unchanged listings. The store is rewritten to hold
+        exactly these listings.
+        """
+        ids = listing_ids(df['url'].values)
+        texts = _texts(df)
+        text_hashes = pd.util.hash_pandas_object(texts, index=False).to_numpy(dtype=np.uint64)
+        first_seen = np.full(len(df), time.time())
+        signatures = np.empty((len(df), NUM_PERM), dtype=np.uint32)
+
+        stored = self._load()
+        reused = np.zeros(len(df), dtype=bool)
+        if stored is not None:
+            stored_ids, stored_hashes, stored_first_seen, stored_signatures = stored
+            positions = lookup_positions(stored_ids, ids)
+            known = positions >= 0
+            # A listing keeps its first-seen time when edited, but is hashed again
+            first_seen[known] = stored_first_seen[positions[known]]
+            reused[known] = stored_hashes[positions[known]] == text_hashes[known]
+            signatures[reused] = stored_signatures[positions[reused]]
+
+        hashed = ~reused
+        if hashed.any():
+            signatures[hashed] = minhash(texts[hashed].reset_index(drop=True))
+        self._save(ids, text_hashes, first_seen, signatures)
+        DEDUP_LISTINGS_SEEN.inc('reused', amount=int(reused.sum()))
+        DEDUP_LISTINGS_SEEN.inc('hashed', amount=int(hashed.sum()))
+        return ids, first_seen, signatures, int(hashed.sum())
+
+    def deduplicate(self, df):
+        """
+        Drop near-duplicate listings from a scrape, keeping one listing per
+        group. Returns (the remaining listings, summary dict).
+        """
+        with self._lock:
+            start = time.perf_counter()
+            df = df.reset_index(drop=True)
+            if len(df) == 0:
+                return df, {'listings': 0, 'hashed': 0, 'duplicates': 0, 'groups': 0}
+            ids, first_seen, signatures, hashed = self.signatures(df)
+            labels = clusters(signatures, self.threshold)
+            kept = representatives(labels, first_seen, pd.to_numeric(df['price'], errors='coerce').fillna(0),
+                                   self.keep)
+            sizes = np.bincount(labels, minlength=len(labels))
+            duplicates = int((~kept).sum())
+            DEDUP_LISTINGS_SEEN.inc('dropped', amount=duplicates)
+            self.last_run = {
+                'listings': len(df),
+                'hashed': hashed,
+                'duplicates': duplicates,
+                'groups': int((sizes > 1).sum()),
+                'keep': self.keep,
+                'seconds': time.perf_counter() - start,
+            }
+            return df[kept].reset_index(drop=True), dict(self.last_run)
+
+
+# Used by refreshes; holds the persisted signatures
+listing_deduplicator = ListingDeduplicator()
@@ -0,0 +1,120 @@
+# analysis/details.py
+import pandas as pd
+
+# Listings whose computed details are kept per dataset version
+MAX_CACHED_DETAILS = 10000
+
+
+class ListingIndex:
+    """
+    listing_id -> row position for one dataset version, built from the
+    listing_id column alone. If an ID occurs more than once the last row
+    wins, as in listing_ids.lookup_positions().
+    """
+
+    def __init__(self, ids):
+        index = pd.Index(ids)
+        positions = pd.RangeIndex(len(index))
+        if not index.is_unique:
+            keep = ~index.duplicated(keep='last')
+            index, positions = index[keep], positions[keep]
+        self._index = index
+        self._positions = positions.to_numpy()
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['listing_id'].to_numpy())
+
+    def __len__(self):
+        return len(self._index)
+
+    def position(self, listing_id):
+        """Row position of `listing_id`, or None if it is not in the dataset"""
+        try:
+            return int(self._positions[self._index.get_loc(listing_id)])
+        except KeyError:
+            return None
+
+
+def improvement_areas(business):
+    """Potential improvement areas suggested by a listing's signals"""
+    areas = []
+    if business.get('declining_revenue', 0) == 1:
+        areas.append({
+            'area': 'Revenue Growth',
+            'description': 'This business shows signs of declining revenue, which presents an opportunity for new marketing initiatives and sales strategies.',
+            'impact': 'High'
+        })
+
+    if business.get('management_issues', 0) == 1:
+        areas.append({
+            'area': 'Management Efficiency',
+            'description': 'There appear to be management issues that could be addressed with better operational processes and leadership.',
+            'impact': 'High'
+        })
+
+    if business.get('price_drop', 0) == 1:
+        areas.append({
+            'area': 'Valuation',
+            'description': 'The price has been reduced, suggesting potential for negotiation or value-based improvements.',
+            'impact': 'Medium'
+        })
+
+    if business.get('prime_location', 0) == 1:
+        areas.append({
+            'area': 'Location Leverage',
+            'description': 'The business is in a prime location that may not be fully utilized in the current operation.',
+            'impact': 'Medium'
+        })
+
+    # If no improvement areas identified, add a default one
+    if not areas:
+        areas.append({
+            'area': 'General Operations',
+            'description': 'Potential for operational improvements and efficiency gains under new management.',
+            'impact': 'Medium'
+        })
+    return areas
+
+
+def listing_details(business):
+    """Add the ROI estimate to a listing dict and return (business, improvement areas)"""
+    price = business.get('price') or 0
+    business['roi_estimate'] = f"{(business['revenue'] / price * 100):.1f}%" if price else "n/a"
+    return business, improvement_areas(business)
+
+
+class DetailCache:
+    """
+    Computed details of recently viewed listings. One instance is kept per
+    dataset version (see DatasetCache.derived), so a refresh discards it.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_DETAILS):
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def get(self, listing_id):
+        return self._entries.get(listing_id)
+
+    def put(self, listing_id, details):
+        if len(self._entries) >= self.max_entries:
+            # Drop the oldest entry (dicts keep insertion order)
+            self._entries.pop(next(iter(self._entries)), None)
+        self._entries[listing_id] = details
+        return details
+
+
+class VersionedDetailCache:
+    """Hands out the DetailCache for the current dataset version, starting a new one when it changes"""
+
+    def __init__(self, max_entries=MAX_CACHED_DETAILS):
+        self.max_entries = max_entries
+        self._version = None
+        self._cache = DetailCache(max_entries)
+
+    def for_version(self, version):
+        if version != self._version or version is None:
+            self._cache = DetailCache(self.max_entries)
+            self._version = version
+        return self._cache
@@ -0,0 +1,86 @@
+# analysis/export.py
+import csv
+import io
+import json
+import zlib
+
+from analysis.opportunities import QueryError, decode_cursor, records
+
+# format= value -> mimetype
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+DEFAULT_FORMAT = 'ndjson'
+# Rows serialized (and flushed to the client) at a time
+BATCH_SIZE = 5000
+GZIP_LEVEL = 6
+
+
+def parse_format(value):
+    name = (value or DEFAULT_FORMAT).lower()
+    if name not in FORMATS:
+        raise QueryError(f"format must be one of: {', '.join(FORMATS)}")
+    return name
+
+
+def start_offset(cursor, skip, version):
+    """
+    First match to export: the position in `cursor` (a next_cursor from
+    /api/opportunities or the X-Resume-Cursor of an earlier export) plus
+    `skip` rows already received from it.
+    """
+    if skip is not None and skip < 0:
+        raise QueryError("skip must not be negative")
+    return decode_cursor(cursor, version) + (skip or 0)
+
+
+def frame_batches(df, index, min_score, max_difficulty, fields, offset=0, batch_size=BATCH_SIZE):
+    """Records of every match in the in-memory dataset from `offset` on, a batch at a time"""
+    for positions in index.iter_positions(min_score, max_difficulty, offset=offset, batch_size=batch_size):
+        yield records(df, positions, fields)
+
+
+def store_batches(store, min_score, max_difficulty, fields, offset=0, batch_size=BATCH_SIZE):
+    """frame_batches() for a SQLite ListingStore, read from one query"""
+    for df in store.iter_query(min_score, max_difficulty, columns=fields, offset=offset, chunksize=batch_size):
+        yield records(df, slice(None), fields)
+
+
+def ndjson_chunks(batches):
+    """One JSON object per line, encoded a batch at a time"""
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    for batch in batches:
+        yield ''.join(dumps(row) + '\n' for row in batch).encode('utf-8')
+
+
+def csv_chunks(batches, fields):
+    """A header row, then the records as CSV, encoded a batch at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode('utf-8')
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([row[field] for field in fields] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=GZIP_LEVEL):
+    """
+    Compress a stream of byte chunks as one gzip member. Each chunk is
+    flushed, so the client can decompress rows as they arrive.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def serialize(batches, export_format, fields, encoding=None):
+    """Byte chunks of the export as 'ndjson' or 'csv', gzipped if encoding == 'gzip'"""
+    chunks = ndjson_chunks(batches) if export_format == 'ndjson' else csv_chunks(batches, fields)
+    return gzip_chunks(chunks) if encoding == 'gzip' else chunks
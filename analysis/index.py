@@ -0,0 +1,95 @@
+# analysis/index.py
+import numpy as np
+
+
+class ScoreIndex:
+    """
+    Rows pre-sorted by turnaround score (highest first) and bucketed by
+    difficulty, built once per dataset version.
+
+    Every row gets a rank: its position in the global score order (ties keep
+    row order). Each difficulty bucket stores its rows' ranks ascending,
+    i.e. already sorted by score. A min_score/max_difficulty query is then a
+    binary search per bucket plus a merge of the bucket prefixes, and only the
+    first offset + limit ranks of each bucket are ever touched.
+    """
+
+    def __init__(self, scores, difficulties):
+        scores = np.asarray(scores, dtype=np.float64)
+        difficulties = np.asarray(difficulties)
+
+        # rank -> row position
+        self.positions = np.argsort(-scores, kind='stable')
+        ranked_difficulty = difficulties[self.positions]
+        ranked_neg_scores = -scores[self.positions]
+
+        # difficulty -> (ranks ascending, negated scores ascending)
+        self.buckets = {}
+        for difficulty in np.unique(ranked_difficulty):
+            ranks = np.flatnonzero(ranked_difficulty == difficulty)
+            self.buckets[difficulty.item()] = (ranks, ranked_neg_scores[ranks])
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['turnaround_score'].to_numpy(), df['turnaround_difficulty'].to_numpy())
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _prefixes(self, min_score, max_difficulty):
+        """(bucket ranks, number matching) for every bucket with matches, and the total"""
+        prefixes = []
+        total = 0
+        for difficulty, (ranks, neg_scores) in self.buckets.items():
+            if difficulty > max_difficulty:
+                continue
+            # Bucket rows with score >= min_score form a prefix
+            count = int(np.searchsorted(neg_scores, -min_score, side='right'))
+            if count:
+                prefixes.append((ranks, count))
+                total += count
+        return prefixes, total
+
+    def query(self, min_score, max_difficulty, offset=0, limit=None):
+        """
+        Return (row positions of the requested page ordered by score, total matches)
+        """
+        prefixes, total = self._prefixes(min_score, max_difficulty)
+
+        end = total if limit is None else min(offset + limit, total)
+        if offset >= end:
+            return self.positions[:0], total
+
+        # The first `end` matches overall come from the first `end` of each bucket
+        merged = np.sort(np.concatenate([ranks[:min(count, end)] for ranks, count in prefixes]))
+        return self.positions[merged[offset:end]], total
+
+    def iter_positions(self, min_score, max_difficulty, offset=0, batch_size=5000):
+        """
+        Yield the row positions of every match from `offset` on, ordered by
+        score, in arrays of at most batch_size. Bucket prefixes are merged
+        batch by batch, so memory does not grow with the number of matches.
+        """
+        prefixes, total = self._prefixes(min_score, max_difficulty)
+        matches = [ranks[:count] for ranks, count in prefixes]
+        if offset >= total:
+            return
+
+        # Smallest rank with `offset` matches before it (ranks are unique across buckets)
+        low, high = 0, len(self.positions)
+        while low < high:
+            middle = (low + high) // 2
+            if sum(int(np.searchsorted(ranks, middle)) for ranks in matches) < offset:
+                low = middle + 1
+            else:
+                high = middle
+        starts = [int(np.searchsorted(ranks, low)) for ranks in matches]
+
+        while True:
+            heads = [ranks[start:start + batch_size] for ranks, start in zip(matches, starts)]
+            merged = np.sort(np.concatenate(heads))[:batch_size]
+            if not len(merged):
+                return
+            for i, head in enumerate(heads):
+                starts[i] += int(np.searchsorted(head, merged[-1], side='right'))
+            yield self.positions[merged]
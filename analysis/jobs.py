@@ -0,0 +1,354 @@
+# analysis/jobs.py
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis import metrics
+from analysis.storage import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # no file locks (Windows): jobs and locks are per process
+    fcntl = None
+
+DEFAULT_WORKERS = 2
+# Finished jobs kept around for status lookups
+DEFAULT_HISTORY = 200
+# Job states shared by the worker processes, so any of them can report any job
+JOB_STATE_DIR = os.path.join(DATA_DIR, 'jobs')
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+# How long to wait for a job started by another process to record its state
+FOREIGN_JOB_WAIT_SECONDS = 2.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+JOB_SECONDS = metrics.histogram('job_duration_seconds', 'Run time of background jobs', ['kind', 'status'])
+JOB_FAILURES = metrics.counter('job_failures_total', 'Background jobs that raised an exception', ['kind'])
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A unit of background work and its status, as reported by /api/jobs/<id>"""
+
+    def __init__(self, kind, description=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, state):
+        """A job as recorded by to_dict(), e.g. by another worker process"""
+        job = cls(state['kind'], state.get('description'))
+        for name in ('id', 'status', 'progress', 'message', 'result', 'error',
+                     'created_at', 'started_at', 'finished_at'):
+            setattr(job, name, state.get(name))
+        return job
+
+    def update(self, progress=None, message=None):
+        """Report progress (0-1) and/or a status message from inside the job"""
+        with self._lock:
+            if progress is not None:
+                self.progress = min(max(float(progress), 0.0), 1.0)
+            if message is not None:
+                self.message = message
+        self._changed()
+
+    def _changed(self):
+        """Hook called after every status or progress change (see JobQueue)"""
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'description': self.description,
+                'status': self.status,
+                'progress': self.progress,
+                'message': self.message,
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class FileLock:
+    """
+    Exclusive lock on a file (flock), shared by the processes on a host and
+    released when the holding process exits. acquire() never waits.
+    Without fcntl every acquire() succeeds, so the lock is per process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self, owner=None):
+        """Take the lock if it is free, recording `owner` in the file. Returns whether it is held."""
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        if owner is not None:
+            lock_file.truncate(0)
+            lock_file.write(owner)
+            lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def owner(self):
+        """What the current holder recorded, or None"""
+        try:
+            with open(self.path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def release(self):
+        if self._file is not None:
+            self._file.truncate(0)
+            self._file.close()
+            self._file = None
+
+
+class JobStore:
+    """
+    Job states as JSON files in a directory shared by the worker processes,
+    so a job submitted on one worker can be polled on any other. Each file
+    is replaced in one rename; the oldest finished jobs beyond `history`
+    are removed.
+    """
+
+    def __init__(self, directory=JOB_STATE_DIR, history=DEFAULT_HISTORY):
+        self.directory = directory
+        self.history = history
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, job_id + '.json')
+
+    def save(self, job):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(job.id)
+        partial_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(partial_path, 'w') as f:
+            json.dump(job.to_dict(), f, default=str)
+        os.replace(partial_path, path)
+
+    def load(self, job_id):
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return Job.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list(self, kind=None):
+        """Stored jobs, oldest first"""
+        jobs = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            job = self.load(os.path.basename(path)[:-len('.json')])
+            if job is not None and (kind is None or job.kind == kind):
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def prune(self):
+        jobs = self.list()
+        finished = [job for job in jobs if job.finished]
+        for job in finished[:max(len(jobs) - self.history, 0)]:
+            try:
+                os.remove(self._path(job.id))
+            except FileNotFoundError:
+                pass
+
+
+class JobQueue:
+    """
+    Runs jobs on a small thread pool so request handlers can return
+    immediately with a job ID. Each job function is called as
+    func(job, *args, **kwargs) and its return value becomes the job result.
+
+    With a `store` (JobStore), every status and progress change is saved
+    there too, and jobs run by other worker processes can be looked up.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, history=DEFAULT_HISTORY, store=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self.history = history
+        self.store = store
+
+    def submit(self, kind, func, *args, description=None, **kwargs):
+        job = Job(kind, description)
+        with self._lock:
+            self._add(job)
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def submit_unique(self, kind, func, *args, description=None, lock_path=None, **kwargs):
+        """
+        Like submit(), but if a job of this kind is already queued or
+        running, return it instead of starting another. With `lock_path`
+        the job holds a FileLock on that file until it finishes, so a
+        job of this kind started by another process on the host is
+        returned as well (looked up in the store).
+        Returns (job, created).
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and not job.finished:
+                    return job, False
+            job = Job(kind, description)
+            lock = None
+            if lock_path is not None:
+                lock = FileLock(lock_path)
+                if not lock.acquire(owner=job.id):
+                    return self._foreign_job(lock, kind), False
+            self._add(job)
+        self._executor.submit(self._run, job, func, args, kwargs, lock)
+        return job, True
+
+    def _add(self, job):
+        """Track a new job (lock held)"""
+        self._jobs[job.id] = job
+        self._prune()
+        if self.store is not None:
+            job._changed = lambda: self.store.save(job)
+            job._changed()
+            self.store.prune()
+
+    def _foreign_job(self, lock, kind):
+        """The job another process holds `lock` for, once it has recorded its state"""
+        deadline = time.monotonic() + FOREIGN_JOB_WAIT_SECONDS
+        while True:
+            owner = lock.owner()
+            job = self.store.load(owner) if owner and self.store is not None else None
+            if job is not None:
+                return job
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"A {kind} job is already running in another process")
+            time.sleep(0.01)
+
+    def _run(self, job, func, args, kwargs, lock=None):
+        error = None
+        try:
+            with job._lock:
+                job.status = RUNNING
+                job.started_at = time.time()
+            job._changed()
+            try:
+                result = func(job, *args, **kwargs)
+            except Exception as e:
+                logger.exception("Background job %s (%s) failed", job.id, job.kind)
+                error = e
+        finally:
+            # Released before the job reads as finished, so whoever sees it
+            # finish can start the next one straight away
+            if lock is not None:
+                lock.release()
+
+        if error is not None:
+            JOB_FAILURES.inc(job.kind)
+            with job._lock:
+                job.status = FAILED
+                job.error = str(error)
+                job.finished_at = time.time()
+            job._changed()
+            JOB_SECONDS.observe(job.kind, FAILED, value=job.finished_at - job.started_at)
+            return
+        with job._lock:
+            job.status = DONE
+            job.progress = 1.0
+            job.result = result
+            job.finished_at = time.time()
+        job._changed()
+        JOB_SECONDS.observe(job.kind, DONE, value=job.finished_at - job.started_at)
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(self._jobs) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            return self.store.load(job_id)
+        return job
+
+    def list(self, kind=None):
+        """Jobs of this process and, with a store, of the other workers, oldest first"""
+        with self._lock:
+            local = [job for job in self._jobs.values() if kind is None or job.kind == kind]
+        if self.store is None:
+            return local
+        jobs = {job.id: job for job in self.store.list(kind)}
+        jobs.update((job.id, job) for job in local)
+        return sorted(jobs.values(), key=lambda job: job.created_at)
+
+    def active_counts(self):
+        """Number of queued and running jobs per (kind, status)"""
+        counts = {}
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.finished:
+                    counts[(job.kind, job.status)] = counts.get((job.kind, job.status), 0) + 1
+        return counts
+
+    def latest(self, kind):
+        """Most recently submitted job of a kind, or None"""
+        jobs = self.list(kind)
+        return jobs[-1] if jobs else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job has finished (mainly for scripts and tests)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and not job.finished:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        return job
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,32 @@
+# analysis/lazy.py
+import threading
+
+
+class LazyInstance:
+    """
+    Stands in for an object that is built on first use by factory(), so
+    modules only needed by that object (the scraper's HTTP and HTML
+    stack, for instance) are not imported when the app starts. Attribute
+    access is forwarded to the instance.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        return self._instance is not None
+
+    def get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,78 @@
+# analysis/listing_ids.py
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# Scraped fields that identify a version of a listing
+CONTENT_COLUMNS = ['title', 'price', 'revenue', 'description', 'location', 'url']
+
+
+def make_listing_id(url):
+    """Stable 16-hex-digit ID for a listing, derived from its URL"""
+    return hashlib.blake2b(str(url).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def listing_ids(urls, known_urls=None, known_ids=None, positions=None):
+    """
+    Vector form of make_listing_id().
+    IDs already computed for `known_urls` are looked up instead of rehashed;
+    pass `positions` (lookup_positions(known_urls, urls)) if already known.
+    """
+    urls = np.asarray(urls, dtype=object)
+    if known_ids is None:
+        return np.array([make_listing_id(url) for url in urls], dtype=object)
+    if positions is None:
+        positions = lookup_positions(known_urls, urls)
+    ids = np.asarray(known_ids, dtype=object)[positions]
+    missing = np.flatnonzero(positions < 0)
+    ids[missing] = [make_listing_id(url) for url in urls[missing]]
+    return ids
+
+
+def lookup_positions(keys, query):
+    """
+    Position of each query value in `keys` (-1 if absent).
+    When a key occurs more than once, its last occurrence is used.
+    """
+    keys = pd.Index(keys)
+    if keys.is_unique:
+        return keys.get_indexer(query)
+    last = np.flatnonzero(~keys.duplicated(keep='last'))
+    positions = keys[last].get_indexer(query)
+    return np.where(positions >= 0, last[positions], -1)
+
+
+def add_listing_keys(df):
+    """
+    `df` with the listing_id and content_hash columns it lacks, for data
+    written before they existed. The content hashes are unsalted, so they
+    match no analyzer's and the next refresh re-scores those rows.
+    """
+    keys = {}
+    if 'listing_id' not in df.columns:
+        keys['listing_id'] = listing_ids(df['url'].to_numpy())
+    if 'content_hash' not in df.columns:
+        keys['content_hash'] = content_hashes(df)
+    return df.assign(**keys) if keys else df
+
+
+def content_hashes(df, salt=None):
+    """
+    uint64 hash of each row's scraped fields. Any edit to a listing changes it.
+    `salt` (e.g. the signal rules) is mixed in so rule changes invalidate every row.
+    """
+    content = {}
+    for column in CONTENT_COLUMNS:
+        if column in ('price', 'revenue'):
+            content[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+        else:
+            content[column] = df[column].fillna('')
+    content = pd.DataFrame(content, index=df.index)
+    hashes = pd.util.hash_pandas_object(content, index=False, categorize=False).values
+    if salt is not None:
+        salt_bytes = json.dumps(salt, sort_keys=True).encode('utf-8')
+        salt_hash = np.uint64(int(hashlib.blake2b(salt_bytes, digest_size=8).hexdigest(), 16))
+        hashes = hashes ^ salt_hash
+    return hashes.astype(np.uint64)
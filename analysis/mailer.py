@@ -0,0 +1,199 @@
+# analysis/mailer.py
+import os
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from analysis.report import render_report
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_BATCH_SIZE = 50
+# Idle connections older than this are checked with NOOP before reuse
+IDLE_CHECK_SECONDS = 30
+
+
+class SmtpSettings:
+    """
+    SMTP connection settings, read from the environment by default:
+    SMTP_HOST, SMTP_PORT, SMTP_SECURITY (ssl, starttls or none),
+    SMTP_USER, SMTP_PASSWORD and SMTP_SENDER.
+
+    For local testing point it at a stand-in server, e.g.
+    `python -m aiosmtpd -n -l localhost:8025` with SMTP_HOST=localhost
+    SMTP_PORT=8025 SMTP_SECURITY=none.
+    """
+
+    def __init__(self, host=None, port=None, security=None, user=None, password=None,
+                 sender=None, timeout=30):
+        self.host = host or os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+        self.security = (security or os.environ.get('SMTP_SECURITY', 'ssl')).lower()
+        if self.security not in ('ssl', 'starttls', 'none'):
+            raise ValueError(f"Unknown SMTP security mode: {self.security}")
+        default_port = {'ssl': 465, 'starttls': 587, 'none': 25}[self.security]
+        self.port = int(port or os.environ.get('SMTP_PORT', default_port))
+        self.user = user if user is not None else os.environ.get('SMTP_USER', '')
+        self.password = password if password is not None else os.environ.get('SMTP_PASSWORD', '')
+        self.sender = sender or os.environ.get('SMTP_SENDER') or self.user
+        self.timeout = timeout
+
+    def connect(self):
+        if self.security == 'ssl':
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == 'starttls':
+                server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        return server
+
+
+class SmtpPool:
+    """
+    Keeps up to `size` logged-in SMTP connections open between jobs so
+    that sending does not pay for a TCP/TLS handshake and login each time.
+    Connections that fail are closed and replaced on the next use.
+    """
+
+    def __init__(self, settings=None, size=DEFAULT_POOL_SIZE):
+        self.settings = settings or SmtpSettings()
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def _open(self):
+        server = self.settings.connect()
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    def _checkout(self):
+        while True:
+            try:
+                server, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if time.monotonic() - idle_since < IDLE_CHECK_SECONDS:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._discard(server)
+
+    def _checkin(self, server):
+        if self._idle.qsize() < self.size:
+            self._idle.put((server, time.monotonic()))
+        else:
+            self._discard(server)
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool unless an error occurred"""
+        server = self._checkout()
+        try:
+            yield server
+        except BaseException:
+            self._discard(server)
+            raise
+        self._checkin(server)
+
+    def send(self, messages, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        """
+        Send email.message.Message objects, up to `batch_size` per
+        connection checkout. A connection dropped mid-batch is reopened
+        once and the rest of the batch retried. `progress(sent, total)` is
+        called after each batch. Returns the number of messages sent.
+        """
+        total = len(messages)
+        sent = 0
+        for start in range(0, total, batch_size):
+            batch = messages[start:start + batch_size]
+            for attempt in (1, 2):
+                try:
+                    with self.connection() as server:
+                        while batch:
+                            server.send_message(batch[0])
+                            batch = batch[1:]
+                            sent += 1
+                            with self._lock:
+                                self.messages_sent += 1
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    if attempt == 2:
+                        raise
+            if progress is not None:
+                progress(sent, total)
+        return sent
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'host': self.settings.host,
+                'port': self.settings.port,
+                'idle_connections': self._idle.qsize(),
+                'connections_opened': self.connections_opened,
+                'messages_sent': self.messages_sent,
+            }
+
+
+def build_messages(sender, recipients, subject, plain_text, html):
+    """
+    One message per recipient, each with its own text/html parts: a part
+    attached to several messages would be shared (and any header set on it
+    changed) across all of them
+    """
+    messages = []
+    for recipient in recipients:
+        message = MIMEMultipart('alternative')
+        message['From'] = sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.attach(MIMEText(plain_text, 'plain', 'utf-8'))
+        message.attach(MIMEText(html, 'html', 'utf-8'))
+        messages.append(message)
+    return messages
+
+
+def parse_recipients(value):
+    """Split a comma/semicolon separated list of addresses"""
+    if not value:
+        return []
+    recipients = [address.strip() for address in value.replace(';', ',').split(',')]
+    return list(dict.fromkeys(address for address in recipients if address))
+
+
+def send_report(job, pool, recipients, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Job function: render the report once and mail it to every recipient"""
+    job.update(message="Rendering report")
+    subject, plain_text, html = render_report(rows)
+    messages = build_messages(pool.settings.sender, recipients, subject, plain_text, html)
+
+    job.update(progress=0.1, message=f"Sending to {len(recipients)} recipient(s)")
+    sent = pool.send(messages, batch_size=batch_size,
+                     progress=lambda done, total: job.update(progress=0.1 + 0.9 * done / total))
+    return {'sent': sent, 'recipients': recipients, 'opportunities': len(rows)}
@@ -0,0 +1,88 @@
+# analysis/opportunities.py
+import base64
+import json
+
+from analysis.compact import python_values
+
+MAX_PAGE_SIZE = 1000
+
+# Bookkeeping columns that are only returned when asked for explicitly
+INTERNAL_FIELDS = {'content_hash'}
+
+
+class QueryError(ValueError):
+    """Invalid query parameters (bad field name, malformed or stale cursor)"""
+
+
+def parse_fields(value, columns):
+    """Turn a comma-separated `fields=` parameter into a list of column names"""
+    if not value:
+        return [column for column in columns if column not in INTERNAL_FIELDS]
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in columns]
+    if unknown:
+        raise QueryError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def encode_cursor(version, offset):
+    payload = json.dumps({'v': version, 'o': offset}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, version):
+    """Return the offset stored in `cursor`, checking it belongs to this dataset version"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        offset = int(payload['o'])
+    except (ValueError, KeyError, TypeError):
+        raise QueryError("Malformed cursor")
+    if payload.get('v') != version:
+        raise QueryError("Cursor is from an older dataset; start again from the first page")
+    if offset < 0:
+        raise QueryError("Malformed cursor")
+    return offset
+
+
+def parse_limit(value):
+    """Page size from the `limit=` parameter (None means no limit)"""
+    if value is None:
+        return None
+    if value < 1:
+        raise QueryError("limit must be positive")
+    return min(value, MAX_PAGE_SIZE)
+
+
+def records(df, positions, fields):
+    """
+    Build JSON-ready dicts for the given rows and fields only, without
+    going through DataFrame.to_dict('records') on the full result.
+    """
+    # Take the rows first so whole string columns are never converted
+    rows = df.iloc[positions]
+    columns = [python_values(rows[field]) for field in fields]
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+def page(df, index, min_score, max_difficulty, fields, version, limit=None, cursor=None):
+    """
+    Look up one page of matches in the score index.
+    Returns (records, total matches, next_cursor); next_cursor is None on the last page.
+    """
+    offset = decode_cursor(cursor, version)
+    positions, total = index.query(min_score, max_difficulty, offset=offset, limit=limit)
+    end = offset + len(positions)
+    next_cursor = encode_cursor(version, end) if end < total else None
+    return records(df, positions, fields), total, next_cursor
+
+
+def store_page(store, min_score, max_difficulty, fields, version, limit=None, cursor=None):
+    """page() for a SQLite ListingStore: filtering, sorting and paging run in SQL"""
+    offset = decode_cursor(cursor, version)
+    df, total = store.query(min_score, max_difficulty, columns=fields, offset=offset, limit=limit)
+    end = offset + len(df)
+    next_cursor = encode_cursor(version, end) if end < total else None
+    return records(df, slice(None), fields), total, next_cursor
@@ -0,0 +1,131 @@
+# analysis/parallel.py
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis import scoring
+from analysis.signals import SignalExtractor
+
+DEFAULT_PARTITION_SIZE = 50000
+# Where the memory-mapped inputs and outputs are laid out (the system temp dir by default)
+SCRATCH_DIR = os.environ.get('SCRATCH_DIR') or None
+
+# Set in each worker process by _init_worker
+_worker_extractor = None
+
+
+def _init_worker(rules):
+    global _worker_extractor
+    _worker_extractor = SignalExtractor(rules)
+
+
+def _open(directory, name, mode='r'):
+    return np.load(os.path.join(directory, name + '.npy'), mmap_mode=mode)
+
+
+def _score_partition(directory, start, stop):
+    """Compute features for rows [start, stop) and write them to the output memmaps"""
+    price = np.asarray(_open(directory, 'price')[start:stop])
+    revenue = np.asarray(_open(directory, 'revenue')[start:stop])
+    text = _open(directory, 'text')
+    offsets = _open(directory, 'offsets')
+    lo, hi = int(offsets[start]), int(offsets[stop])
+    blob = text[lo:hi].tobytes()
+    bounds = offsets[start:stop + 1] - lo
+    descriptions = [blob[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(stop - start)]
+
+    ratio = scoring.price_to_revenue_ratio(price, revenue)
+    flags = _worker_extractor.extract(descriptions)
+    raw = scoring.raw_scores(ratio, flags, _worker_extractor.weights)
+    difficulty = scoring.difficulty(
+        price,
+        flags['declining_revenue'],
+        flags['management_issues'],
+        flags['price_drop'],
+        flags['prime_location']
+    )
+
+    _open(directory, 'price_to_revenue_ratio', 'r+')[start:stop] = ratio
+    signal_out = _open(directory, 'signals', 'r+')
+    for index, signal in enumerate(_worker_extractor.signals):
+        signal_out[index, start:stop] = flags[signal]
+    _open(directory, 'raw_score', 'r+')[start:stop] = raw
+    _open(directory, 'turnaround_difficulty', 'r+')[start:stop] = difficulty
+    return stop - start
+
+
+def _write_inputs(directory, df):
+    """Lay the columns the workers need out as .npy files they can memory-map"""
+    np.save(os.path.join(directory, 'price.npy'), df['price'].to_numpy(dtype=np.float64))
+    np.save(os.path.join(directory, 'revenue.npy'), df['revenue'].to_numpy(dtype=np.float64))
+
+    encoded = [text.encode('utf-8') if isinstance(text, str) else b''
+               for text in df['description'].values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, 'text.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(directory, 'offsets.npy'), offsets)
+
+
+def _create_outputs(directory, rows, signals):
+    def create(name, dtype, shape):
+        np.lib.format.open_memmap(os.path.join(directory, name + '.npy'), mode='w+',
+                                  dtype=dtype, shape=shape).flush()
+    create('price_to_revenue_ratio', np.float64, (rows,))
+    create('signals', np.int64, (len(signals), rows))
+    create('raw_score', np.float64, (rows,))
+    create('turnaround_difficulty', np.int64, (rows,))
+
+
+def compute_features_parallel(df, rules, workers=None, partition_size=None):
+    """
+    Compute the per-listing features of `df` in a process pool.
+    Returns a dict of column name -> array, in the same order as the serial path.
+    Workers default to the ANALYZER_WORKERS environment variable or the CPU
+    count; partitions to ANALYZER_PARTITION_SIZE rows.
+    """
+    workers = workers or int(os.environ.get('ANALYZER_WORKERS', 0)) or os.cpu_count() or 1
+    partition_size = (partition_size or
+                      int(os.environ.get('ANALYZER_PARTITION_SIZE', 0)) or
+                      DEFAULT_PARTITION_SIZE)
+    signals = list(rules)
+    rows = len(df)
+
+    if SCRATCH_DIR:
+        os.makedirs(SCRATCH_DIR, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='turnaround-', dir=SCRATCH_DIR)
+    try:
+        _write_inputs(directory, df)
+        _create_outputs(directory, rows, signals)
+
+        partitions = [(start, min(start + partition_size, rows))
+                      for start in range(0, rows, partition_size)]
+        if partitions:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(partitions)),
+                                     mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(rules,)) as pool:
+                futures = [pool.submit(_score_partition, directory, start, stop)
+                           for start, stop in partitions]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    # Don't start the remaining partitions; the scratch files are removed below
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+
+        features = {'price_to_revenue_ratio': np.array(_open(directory, 'price_to_revenue_ratio'))}
+        signal_values = np.array(_open(directory, 'signals'))
+        for index, signal in enumerate(signals):
+            features[signal] = signal_values[index]
+        features['raw_score'] = np.array(_open(directory, 'raw_score'))
+        features['turnaround_difficulty'] = np.array(_open(directory, 'turnaround_difficulty'))
+        return features
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
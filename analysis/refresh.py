@@ -0,0 +1,153 @@
+# analysis/refresh.py
+import logging
+import os
+import threading
+import time
+
+from analysis import search
+from analysis.dataset import dataset_cache
+from analysis.dedup import DEDUP_LISTINGS, listing_deduplicator
+from analysis.jobs import FileLock, fcntl
+from analysis.storage import DATA_DIR
+
+REFRESH_JOB = 'refresh'
+# Where refreshes get listings: 'sample' (data/raw_listings.csv, or the built-in
+# sample) or 'crawl' (scrape up to CRAWL_MAX_PAGES result pages first)
+REFRESH_SOURCE = os.environ.get('REFRESH_SOURCE', 'sample').lower()
+CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 10))
+# Held by the one process on the host whose scheduler submits refreshes
+SCHEDULER_LOCK_PATH = os.path.join(DATA_DIR, 'refresh_scheduler.lock')
+# Held while a refresh job is queued or running, by whichever process started it
+REFRESH_LOCK_PATH = os.path.join(DATA_DIR, 'refresh.lock')
+
+logger = logging.getLogger(__name__)
+
+
+def run_refresh(job, scraper, analyzer, full=False):
+    """
+    Job function: load (or crawl, see REFRESH_SOURCE) listings, drop
+    near-duplicates (DEDUP_LISTINGS), analyze them and publish the result
+    as a new dataset snapshot. Readers keep the previous snapshot until then.
+    """
+    df = None
+    if REFRESH_SOURCE == 'crawl':
+        job.update(progress=0.05, message=f"Crawling up to {CRAWL_MAX_PAGES} result pages")
+        df = scraper.crawl(max_pages=CRAWL_MAX_PAGES)
+    if df is None or df.empty:
+        # A failed crawl leaves the last good listings file in place
+        job.update(progress=0.05, message="Loading listings")
+        df = scraper.load_sample_data()
+
+    duplicates = 0
+    if DEDUP_LISTINGS:
+        job.update(progress=0.2, message=f"Removing near-duplicates from {len(df)} listings")
+        df, summary = listing_deduplicator.deduplicate(df)
+        duplicates = summary['duplicates']
+
+    # Analyze the data (only new or changed listings unless full)
+    job.update(progress=0.3, message=f"Analyzing {len(df)} listings")
+    if full:
+        analyzed_df = analyzer.analyze_turnaround_potential(df)
+        recomputed = len(analyzed_df)
+    else:
+        analyzed_df, recomputed = analyzer.analyze_incremental(df)
+
+    if not dataset_cache.storage.queryable:
+        # Bring the search index up to date now rather than on the first search
+        job.update(progress=0.9, message="Updating search index")
+        search.dataset_index(dataset_cache)
+
+    return {
+        'message': f'Successfully refreshed data with {len(analyzed_df)} listings',
+        'count': len(analyzed_df),
+        'recomputed': recomputed,
+        'duplicates': duplicates,
+        'version': dataset_cache.version,
+    }
+
+
+def submit_refresh(queue, scraper, analyzer, full=False, lock_path=REFRESH_LOCK_PATH):
+    """
+    Queue a refresh unless one is already pending in any worker process on
+    the host. Returns (job, created).
+    """
+    return queue.submit_unique(REFRESH_JOB, run_refresh, scraper, analyzer, full=full,
+                               description="Full refresh" if full else "Incremental refresh",
+                               lock_path=lock_path)
+
+
+class RefreshScheduler:
+    """
+    Queues an incremental refresh every `interval` seconds on a daemon
+    thread. The interval defaults to REFRESH_INTERVAL_MINUTES; 0 or unset
+    disables periodic refreshes.
+
+    Every worker process may start its scheduler, but only the one holding
+    an exclusive lock on `lock_path` submits refreshes. The others try to
+    take the lock on each tick, so one of them carries on if the owner exits.
+    """
+
+    def __init__(self, queue, scraper, analyzer, interval=None, lock_path=SCHEDULER_LOCK_PATH):
+        if interval is None:
+            interval = float(os.environ.get('REFRESH_INTERVAL_MINUTES', 0)) * 60
+        self.interval = interval
+        self.queue = queue
+        self.scraper = scraper
+        self.analyzer = analyzer
+        self.lock = FileLock(lock_path)
+        self.next_run = None
+        self.runs = 0
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    @property
+    def owner(self):
+        """Whether this process submits the scheduled refreshes"""
+        return self.lock.held or (fcntl is None and self._thread is not None)
+
+    def start(self):
+        """Start the scheduler thread (once; later calls return straight away)"""
+        if not self.enabled or self._thread is not None:
+            return self
+        with self._start_lock:
+            if self._thread is None:
+                self._stop.clear()
+                self.lock.acquire()
+                self._thread = threading.Thread(target=self._loop, name='refresh-scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            self.next_run = time.time() + self.interval
+            if self._stop.wait(self.interval):
+                return
+            if self.lock.acquire():
+                try:
+                    submit_refresh(self.queue, self.scraper, self.analyzer)
+                except Exception:
+                    logger.exception("Could not submit the scheduled refresh")
+                    continue
+                self.runs += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.lock.release()
+        self.next_run = None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'owner': self.owner,
+            'interval_seconds': self.interval,
+            'next_run': self.next_run,
+            'runs': self.runs,
+        }
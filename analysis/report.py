@@ -0,0 +1,69 @@
+# analysis/report.py
+import os
+
+import numpy as np
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'email')
+
+SUBJECT = "Your Business Turnaround Opportunities"
+# Columns report_rows() reads
+REPORT_COLUMNS = ['title', 'location', 'price', 'revenue', 'turnaround_score',
+                  'turnaround_difficulty', 'url', 'description']
+DESCRIPTION_LENGTH = 150
+
+_environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    trim_blocks=True,
+)
+_environment.filters['thousands'] = lambda value: f"{value:,}"
+
+# Compiled once at import and reused for every report
+PLAIN_TEMPLATE = _environment.get_template('report.txt')
+HTML_TEMPLATE = _environment.get_template('report.html')
+
+
+def _column(df, name, default):
+    if name not in df.columns:
+        return [default] * len(df)
+    return df[name].tolist()
+
+
+def report_rows(df, positions):
+    """
+    Template values for the listings at `positions`, built column-wise
+    in a single pass (numbers truncated to int as in the original email).
+    """
+    selected = df.iloc[np.asarray(positions)]
+    difficulty = _column(selected, 'turnaround_difficulty', 0)
+    descriptions = _column(selected, 'description', '')
+
+    rows = []
+    for title, location, price, revenue, score, url, stars, description in zip(
+            _column(selected, 'title', 'Unnamed Business'),
+            _column(selected, 'location', 'Unknown Location'),
+            _column(selected, 'price', 0),
+            _column(selected, 'revenue', 0),
+            _column(selected, 'turnaround_score', 0),
+            _column(selected, 'url', '#'),
+            difficulty,
+            descriptions):
+        stars = int(stars)
+        description = str(description)[:DESCRIPTION_LENGTH] if description else ''
+        rows.append({
+            'title': str(title),
+            'location': str(location),
+            'price': int(price),
+            'revenue': int(revenue),
+            'score': int(score),
+            'url': str(url),
+            'difficulty_stars': "*" * stars + "-" * (5 - stars),
+            'description': description or "No description available",
+        })
+    return rows
+
+
+def render_report(rows):
+    """Return (subject, plain text, html) for a list of report_rows()"""
+    return SUBJECT, PLAIN_TEMPLATE.render(businesses=rows), HTML_TEMPLATE.render(businesses=rows)
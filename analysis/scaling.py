@@ -0,0 +1,54 @@
+# analysis/scaling.py
+import numpy as np
+
+
+class ScoreScaler:
+    """
+    Min/max normalization of raw scores to a fixed range.
+    Produces the same values as sklearn's MinMaxScaler(feature_range=(0, 100)),
+    but the tracked min/max can be updated incrementally with partial_fit()
+    and re-applied to stored raw scores without refitting everything.
+    """
+
+    def __init__(self, feature_range=(0, 100)):
+        self.feature_range = feature_range
+        self.data_min = None
+        self.data_max = None
+
+    def reset(self):
+        self.data_min = None
+        self.data_max = None
+        return self
+
+    def fit(self, raw):
+        return self.reset().partial_fit(raw)
+
+    def partial_fit(self, raw):
+        """Extend the tracked min/max with another batch of raw scores"""
+        raw = np.asarray(raw, dtype=np.float64)
+        if raw.size == 0 or np.isnan(raw).all():
+            return self
+        batch_min = float(np.nanmin(raw))
+        batch_max = float(np.nanmax(raw))
+        self.data_min = batch_min if self.data_min is None else min(self.data_min, batch_min)
+        self.data_max = batch_max if self.data_max is None else max(self.data_max, batch_max)
+        return self
+
+    def transform(self, raw):
+        raw = np.asarray(raw, dtype=np.float64)
+        if self.data_min is None:
+            return np.full(raw.shape, np.nan)
+        low, high = self.feature_range
+        data_range = self.data_max - self.data_min
+        # Same handling of a constant column as sklearn: treat the range as 1
+        if data_range < 10 * np.finfo(np.float64).eps:
+            data_range = 1.0
+        scale = (high - low) / data_range
+        offset = low - self.data_min * scale
+        return raw * scale + offset
+
+    def fit_transform(self, raw):
+        return self.fit(raw).transform(raw)
+
+    def to_dict(self):
+        return {'data_min': self.data_min, 'data_max': self.data_max}
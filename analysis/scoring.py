@@ -0,0 +1,41 @@
+# analysis/scoring.py
+import numpy as np
+
+# Weight of the price-to-revenue component (cheaper relative to revenue = higher)
+RATIO_WEIGHT = 30
+
+
+def price_to_revenue_ratio(price, revenue):
+    """Vectorized price / max(revenue, 1)"""
+    price = np.asarray(price, dtype=np.float64)
+    revenue = np.asarray(revenue, dtype=np.float64)
+    return price / np.maximum(revenue, 1)
+
+
+def raw_scores(ratio, flags, weights):
+    """
+    Compute the un-normalized turnaround score.
+    `flags` maps signal name -> 0/1 array and `weights` signal name -> points
+    (see signal_rules.json).
+    """
+    score = (1 - np.clip(np.asarray(ratio, dtype=np.float64) / 2, 0, 1)) * RATIO_WEIGHT
+    for signal, weight in weights.items():
+        score = score + np.asarray(flags[signal]) * weight
+    return score
+
+
+def difficulty(price, declining_revenue, management_issues, price_drop, prime_location):
+    """
+    Vectorized turnaround difficulty on a scale of 1-5.
+    Matches BusinessAnalyzer._calculate_difficulty exactly: all intermediate
+    values are multiples of 0.5, and np.round rounds halves to even like round().
+    """
+    value = (
+        3.0
+        + (np.asarray(declining_revenue) == 1)
+        + (np.asarray(price) > 500000)
+        - (np.asarray(management_issues) == 1)
+        - 0.5 * (np.asarray(price_drop) == 1)
+        - 0.5 * (np.asarray(prime_location) == 1)
+    )
+    return np.clip(np.round(value), 1, 5).astype(np.int64)
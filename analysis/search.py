@@ -0,0 +1,283 @@
+# analysis/search.py
+import re
+
+import numpy as np
+import pandas as pd
+
+from analysis.listing_ids import lookup_positions
+from analysis.opportunities import QueryError, decode_cursor, encode_cursor, parse_limit, records
+
+# Listing text that is searched
+SEARCH_COLUMNS = ['title', 'description']
+# Runs of letters and digits, lowercased (as SQLite's FTS5 unicode61 tokenizer splits them)
+TOKEN_PATTERN = r'[^\W_]+'
+# The same split as an RE2 pattern for pyarrow
+SEPARATOR_PATTERN = r'[^\p{L}\p{N}]+'
+MAX_QUERY_TERMS = 16
+DEFAULT_LIMIT = 20
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return re.findall(TOKEN_PATTERN, str(text).lower())
+
+
+def parse_query(value):
+    """Search terms from the `q=` parameter; every term has to match"""
+    terms = list(dict.fromkeys(tokenize(value or '')))
+    if not terms:
+        raise QueryError("q must contain at least one word")
+    if len(terms) > MAX_QUERY_TERMS:
+        raise QueryError(f"At most {MAX_QUERY_TERMS} search terms are supported")
+    return terms
+
+
+def _texts(df):
+    text = df[SEARCH_COLUMNS[0]].fillna('').astype(str)
+    for column in SEARCH_COLUMNS[1:]:
+        text = text + ' ' + df[column].fillna('').astype(str)
+    return text.reset_index(drop=True)
+
+
+def text_tokens(texts):
+    """
+    Every token of every text as (text number, token code) plus the words
+    the codes stand for. Uses pyarrow's string kernels when available.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        tokens = texts.str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+        codes, words = pd.factorize(tokens.to_numpy())
+        return tokens.index.to_numpy(dtype=np.int64), codes, words
+
+    lists = pc.split_pattern_regex(pc.utf8_lower(pa.array(texts, type=pa.large_string())),
+                                   SEPARATOR_PATTERN)
+    tokens = pc.list_flatten(lists)
+    keep = pc.not_equal(tokens, '')
+    docs = pc.list_parent_indices(lists).filter(keep).to_numpy()
+    encoded = pc.dictionary_encode(tokens.filter(keep))
+    if isinstance(encoded, pa.ChunkedArray):
+        encoded = encoded.combine_chunks()
+    return docs.astype(np.int64), encoded.indices.to_numpy().astype(np.int64), encoded.dictionary.to_pylist()
+
+
+def _stable_order(keys):
+    """
+    argsort(keys, kind='stable') for non-negative int32 keys, as two
+    16-bit passes (numpy radix-sorts 16-bit integers)
+    """
+    order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind='stable')
+    if keys.size and keys.max() > 0xFFFF:
+        order = order[np.argsort((keys[order] >> 16).astype(np.uint16), kind='stable')]
+    return order
+
+
+def _ranges(starts, lengths):
+    """Concatenation of arange(start, start + length) for each pair, vectorized"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total)
+
+
+class SearchIndex:
+    """
+    Inverted index over listing titles and descriptions for one dataset
+    version, ranked with BM25.
+
+    (document, term, frequency) pairs are kept twice: in document order,
+    so update() can carry the tokens of unchanged listings over to the
+    next version, and in term order as the posting lists searched.
+    Documents are identified across versions by a hash of their text.
+    """
+
+    def __init__(self, hashes, doc_length, pair_doc, pair_term, pair_tf, terms):
+        pair_doc = pair_doc.astype(np.int32)
+        pair_term = pair_term.astype(np.int32)
+        pair_tf = pair_tf.astype(np.int32)
+        self.hashes = hashes
+        self.doc_length = doc_length.astype(np.int32)
+        self.terms = terms  # term -> id
+        self.avg_length = float(doc_length.mean()) if len(doc_length) else 0.0
+
+        # Document order (pairs arrive sorted by document)
+        self.doc_offsets = np.concatenate(([0], np.cumsum(np.bincount(pair_doc, minlength=len(hashes)))))
+        self.pair_term = pair_term
+        self.pair_tf = pair_tf
+
+        # Term order: one posting list (documents ascending) per term
+        order = _stable_order(pair_term)
+        self.postings_doc = pair_doc[order]
+        self.postings_tf = pair_tf[order]
+        self.term_offsets = np.concatenate(([0], np.cumsum(np.bincount(pair_term, minlength=len(terms)))))
+
+    @classmethod
+    def from_frame(cls, df):
+        texts = _texts(df)
+        hashes = pd.util.hash_pandas_object(texts, index=False).to_numpy(dtype=np.uint64)
+        terms = {}
+        doc, term, tf, length = cls._tokenize(texts, terms)
+        return cls(hashes, length, doc, term, tf, terms)
+
+    @staticmethod
+    def _tokenize(texts, terms):
+        """
+        (doc, term id, frequency) pairs sorted by document, plus token counts
+        per document. New words are added to `terms`.
+        """
+        docs, codes, words = text_tokens(texts)
+        for word in words:
+            if word not in terms:
+                terms[word] = len(terms)
+        ids = np.fromiter((terms[word] for word in words), dtype=np.int64, count=len(words))
+
+        keys, tf = np.unique(docs * max(len(words), 1) + codes, return_counts=True)
+        pair_doc = keys // max(len(words), 1)
+        pair_term = ids[keys % max(len(words), 1)]
+        length = np.bincount(docs, minlength=len(texts))
+        return pair_doc, pair_term, tf, length
+
+    def update(self, df):
+        """
+        Index for a new version of the dataset. Listings whose text is
+        unchanged reuse their tokens; only new or edited ones are tokenized.
+        """
+        texts = _texts(df)
+        hashes = pd.util.hash_pandas_object(texts, index=False).to_numpy(dtype=np.uint64)
+        previous = lookup_positions(self.hashes, hashes)
+        kept = np.flatnonzero(previous >= 0)
+        changed = np.flatnonzero(previous < 0)
+
+        # Tokens of unchanged listings, gathered from the old document order
+        old_docs = previous[kept]
+        lengths = self.doc_offsets[old_docs + 1] - self.doc_offsets[old_docs]
+        gathered = _ranges(self.doc_offsets[old_docs], lengths)
+        kept_doc = np.repeat(kept, lengths)
+
+        terms = dict(self.terms)
+        doc, term, tf, length = self._tokenize(texts.iloc[changed].reset_index(drop=True), terms)
+        doc = changed[doc]
+
+        pair_doc = np.concatenate((kept_doc, doc))
+        pair_term = np.concatenate((self.pair_term[gathered], term))
+        pair_tf = np.concatenate((self.pair_tf[gathered], tf))
+        order = np.argsort(pair_doc, kind='stable')
+
+        doc_length = np.zeros(len(texts), dtype=np.int64)
+        doc_length[kept] = self.doc_length[old_docs]
+        doc_length[changed] = length
+        pair_doc, pair_term, pair_tf = pair_doc[order], pair_term[order], pair_tf[order]
+        terms, pair_term = self._compact(terms, pair_term)
+        return SearchIndex(hashes, doc_length, pair_doc, pair_term, pair_tf, terms)
+
+    @staticmethod
+    def _compact(terms, pair_term):
+        """Drop words no listing uses any more once they make up half the vocabulary"""
+        used = np.flatnonzero(np.bincount(pair_term, minlength=len(terms)))
+        if len(used) * 2 >= len(terms):
+            return terms, pair_term
+        words = np.empty(len(terms), dtype=object)
+        words[list(terms.values())] = list(terms.keys())
+        return ({word: i for i, word in enumerate(words[used])},
+                np.searchsorted(used, pair_term))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _postings(self, term):
+        term_id = self.terms.get(term)
+        if term_id is None:
+            return None
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        if start == end:
+            return None
+        return self.postings_doc[start:end], self.postings_tf[start:end]
+
+    def match(self, terms):
+        """(documents containing every term, their BM25 relevance)"""
+        postings = [self._postings(term) for term in terms]
+        if not postings or any(p is None for p in postings):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        postings.sort(key=lambda p: len(p[0]))
+
+        docs = postings[0][0]
+        for other, _ in postings[1:]:
+            found = np.searchsorted(other, docs)
+            found[found == len(other)] = 0
+            docs = docs[other[found] == docs]
+
+        norm = K1 * (1 - B + B * self.doc_length[docs] / (self.avg_length or 1.0))
+        relevance = np.zeros(len(docs))
+        for term_docs, term_tf in postings:
+            tf = term_tf[np.searchsorted(term_docs, docs)]
+            idf = np.log(1 + (len(self) - len(term_docs) + 0.5) / (len(term_docs) + 0.5))
+            relevance += idf * tf * (K1 + 1) / (tf + norm)
+        return docs, relevance
+
+    def search(self, terms, scores, difficulties, min_score, max_difficulty, offset=0, limit=None):
+        """
+        Matches passing the score/difficulty filters, most relevant first
+        (then by score, then dataset order).
+        Returns (row positions of the requested page, relevance, total matches).
+        """
+        docs, relevance = self.match(terms)
+        keep = (scores[docs] >= min_score) & (difficulties[docs] <= max_difficulty)
+        docs, relevance = docs[keep], relevance[keep]
+        total = len(docs)
+        end = total if limit is None else min(offset + limit, total)
+        if offset >= end:
+            return docs[:0], relevance[:0], total
+
+        if end < total:
+            # Only matches at least as relevant as the end-th best can be on the page
+            threshold = np.partition(relevance, total - end)[total - end]
+            candidates = np.flatnonzero(relevance >= threshold)
+            docs, relevance = docs[candidates], relevance[candidates]
+        order = np.lexsort((docs, -scores[docs], -relevance))[offset:end]
+        return docs[order], relevance[order], total
+
+
+def dataset_index(cache):
+    """The SearchIndex of the current dataset, updated incrementally after each refresh"""
+    return cache.derived('search_index', SearchIndex.from_frame, columns=SEARCH_COLUMNS,
+                         update=SearchIndex.update)
+
+
+def search_limit(value):
+    limit = parse_limit(value)
+    return DEFAULT_LIMIT if limit is None else limit
+
+
+def _with_relevance(rows, relevance):
+    for row, value in zip(rows, relevance):
+        row['relevance'] = round(float(value), 4)
+    return rows
+
+
+def page(df, index, terms, min_score, max_difficulty, fields, version, limit=None, cursor=None):
+    """
+    One page of search results from the in-memory index.
+    Returns (records with a `relevance` value, total matches, next_cursor).
+    """
+    offset = decode_cursor(cursor, version)
+    positions, relevance, total = index.search(
+        terms, df['turnaround_score'].to_numpy(), df['turnaround_difficulty'].to_numpy(),
+        min_score, max_difficulty, offset=offset, limit=limit)
+    end = offset + len(positions)
+    next_cursor = encode_cursor(version, end) if end < total else None
+    return _with_relevance(records(df, positions, fields), relevance), total, next_cursor
+
+
+def store_page(store, terms, min_score, max_difficulty, fields, version, limit=None, cursor=None):
+    """page() for a SQLite ListingStore, searched through its FTS5 index"""
+    offset = decode_cursor(cursor, version)
+    df, total = store.search(terms, min_score, max_difficulty, columns=fields, offset=offset, limit=limit)
+    end = offset + len(df)
+    next_cursor = encode_cursor(version, end) if end < total else None
+    return _with_relevance(records(df, slice(None), fields), df['relevance']), total, next_cursor
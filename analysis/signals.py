@@ -0,0 +1,182 @@
+# analysis/signals.py
+import json
+import os
+
+import numpy as np
+
+try:
+    import ahocorasick
+except ImportError:  # optional: KeywordAnchors is used instead
+    ahocorasick = None
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'signal_rules.json')
+# Descriptions scanned at a time (bounds the joined text and the arrays built from it)
+BATCH_SIZE = 20000
+# Characters per anchor in KeywordAnchors
+ANCHOR_LENGTH = 8
+# Multiplier of the polynomial hash anchors are keyed by
+_ANCHOR_MULTIPLIER = np.uint64(0x100000001B3)
+# Code points with their own slot in the first-character lookup table
+FIRST_CHAR_TABLE_SIZE = 0x10000
+
+
+def load_rules(path=None):
+    """
+    Load signal rules from a JSON file of the form
+    {"signal_name": {"keywords": ["phrase", ...], "weight": 10}, ...}
+    The SIGNAL_RULES_PATH environment variable overrides the default file.
+    """
+    path = path or os.environ.get('SIGNAL_RULES_PATH') or DEFAULT_RULES_PATH
+    with open(path) as f:
+        rules = json.load(f)
+    for signal, rule in rules.items():
+        if not rule.get('keywords'):
+            raise ValueError(f"Signal '{signal}' has no keywords")
+    return rules
+
+
+class SignalExtractor:
+    """
+    Detects every keyword signal in a batch of descriptions with one scan.
+
+    The descriptions are lowercased and joined with newlines, and every
+    occurrence of every keyword (overlapping ones included) is found in a
+    single pass whose cost does not depend on how many keywords there are:
+    an Aho-Corasick automaton when pyahocorasick is installed, otherwise
+    KeywordAnchors.matches(). This gives the same flags as one case-insensitive
+    `str.contains` per signal.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else load_rules()
+        self.signals = list(self.rules)
+        self.weights = {signal: rule.get('weight', 0) for signal, rule in self.rules.items()}
+
+        keyword_signals = {}
+        for index, signal in enumerate(self.signals):
+            for keyword in self.rules[signal]['keywords']:
+                if not keyword:
+                    raise ValueError(f"Signal '{signal}' has an empty keyword")
+                if '\n' in keyword:
+                    raise ValueError(f"Keyword for '{signal}' must not contain a newline")
+                keyword_signals.setdefault(keyword.lower(), set()).add(index)
+
+        self._keywords = list(keyword_signals)
+        # keyword id x signal -> whether the keyword raises that signal
+        self._keyword_flags = np.zeros((len(self._keywords), len(self.signals)), dtype=bool)
+        for keyword_id, keyword in enumerate(self._keywords):
+            self._keyword_flags[keyword_id, sorted(keyword_signals[keyword])] = True
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword_id, keyword in enumerate(self._keywords):
+                self._automaton.add_word(keyword, (keyword_id, len(keyword)))
+            self._automaton.make_automaton()
+            self._find = self._automaton_matches
+        else:
+            self._anchors = KeywordAnchors(self._keywords)
+            self._find = self._anchors.matches
+
+    def _automaton_matches(self, text):
+        """(start positions, keyword ids) of every keyword occurrence in `text`"""
+        found = [(end - length + 1, keyword_id) for end, (keyword_id, length) in self._automaton.iter(text)]
+        if not found:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        positions, keyword_ids = zip(*found)
+        return np.asarray(positions, dtype=np.int64), np.asarray(keyword_ids, dtype=np.int64)
+
+    def extract(self, descriptions):
+        """
+        Return a dict of signal name -> int64 0/1 array for an iterable of descriptions.
+        """
+        lowered = [text.lower() if isinstance(text, str) else '' for text in descriptions]
+        flags = np.zeros((len(self.signals), len(lowered)), dtype=np.int64)
+
+        for offset in range(0, len(lowered), BATCH_SIZE):
+            batch = lowered[offset:offset + BATCH_SIZE]
+            # Start offset of every description inside the joined text
+            lengths = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+            starts = np.zeros(len(batch), dtype=np.int64)
+            np.cumsum(lengths[:-1] + 1, out=starts[1:])
+
+            positions, keyword_ids = self._find('\n'.join(batch))
+            if len(positions):
+                rows = offset + np.searchsorted(starts, positions, side='right') - 1
+                matches, signals = np.nonzero(self._keyword_flags[keyword_ids])
+                flags[signals, rows[matches]] = 1
+
+        return {signal: flags[index] for index, signal in enumerate(self.signals)}
+
+
+class KeywordAnchors:
+    """
+    Multi-keyword search without pyahocorasick. Each keyword is filed under
+    its first ANCHOR_LENGTH characters (fewer for shorter keywords), keyed
+    by a hash of them; numpy finds every position of the text where some
+    anchor's hash starts, in one vectorized pass with a binary search over
+    the sorted keys, and only those candidates are compared with the
+    keywords filed under them. The
+    cost follows the text length and the number of candidates, not the
+    number of keywords.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = keywords
+        self.length = min(ANCHOR_LENGTH, min(map(len, keywords)))
+        by_anchor = {}
+        for keyword_id, keyword in enumerate(keywords):
+            by_anchor.setdefault(self._key(keyword[:self.length]), []).append((keyword_id, keyword))
+        self._by_anchor = by_anchor
+        self._anchor_keys = np.array(sorted(by_anchor), dtype=np.uint64)
+        # Characters some keyword starts with; code points past the table share its last slot
+        self._first_chars = np.zeros(FIRST_CHAR_TABLE_SIZE, dtype=bool)
+        for keyword in keywords:
+            self._first_chars[min(ord(keyword[0]), FIRST_CHAR_TABLE_SIZE - 1)] = True
+
+    @staticmethod
+    def _key(anchor):
+        codes = np.array([ord(char) for char in anchor], dtype=np.uint32)
+        return int(KeywordAnchors._keys(codes, np.zeros(1, dtype=np.int64), len(anchor))[0])
+
+    @staticmethod
+    def _keys(codes, positions, length):
+        """Polynomial hash of the `length` characters starting at each of `positions`"""
+        keys = codes[positions].astype(np.uint64)
+        with np.errstate(over='ignore'):
+            for shift in range(1, length):
+                keys = keys * _ANCHOR_MULTIPLIER + codes[positions + shift]
+        return keys
+
+    def matches(self, text):
+        """(start positions, keyword ids) of every keyword occurrence in `text`"""
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        count = len(codes) - self.length + 1
+        if count <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # Cheap first pass on the first character, then the anchor hash at the positions left
+        first = np.minimum(codes[:count], FIRST_CHAR_TABLE_SIZE - 1)
+        candidates = np.flatnonzero(self._first_chars[first])
+        keys = self._keys(codes, candidates, self.length)
+        slots = np.minimum(np.searchsorted(self._anchor_keys, keys), len(self._anchor_keys) - 1)
+        found = self._anchor_keys[slots] == keys
+        candidates, keys = candidates[found], keys[found]
+
+        positions, keyword_ids = [], []
+        startswith = text.startswith
+        for position, key in zip(candidates.tolist(), keys.tolist()):
+            for keyword_id, keyword in self._by_anchor[key]:
+                if startswith(keyword, position):
+                    positions.append(position)
+                    keyword_ids.append(keyword_id)
+        return np.asarray(positions, dtype=np.int64), np.asarray(keyword_ids, dtype=np.int64)
+
+
+_default_extractor = None
+
+
+def get_default_extractor():
+    """Return a shared extractor built from the default rules file"""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = SignalExtractor()
+    return _default_extractor
@@ -0,0 +1,509 @@
+# analysis/sqlite_store.py
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from analysis.storage import COLUMN_DTYPES, apply_schema
+
+TABLE = 'listings'
+DEFAULT_POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+UPSERT_BATCH_SIZE = 10000
+# Rows returned by ListingStore.grid_cells(), as charts.grid_cells() plus the cell number
+GRID_COLUMNS = ['cell', 'count', 'log_price', 'log_revenue', 'score', 'difficulty', 'title']
+
+SQL_TYPES = {'object': 'TEXT', 'int64': 'INTEGER', 'uint64': 'INTEGER', 'float64': 'REAL'}
+
+# Full-text index over these columns, kept in sync by triggers
+SEARCH_TABLE = 'listings_fts'
+SEARCH_COLUMNS = ['title', 'description']
+
+# WHERE clause of query(), count() and iter_query(): (min_score, max_difficulty)
+QUERY_FILTER = 'turnaround_score >= ? AND turnaround_difficulty <= ?'
+
+INDEXES = {
+    'idx_listings_score': '(turnaround_score DESC, position)',
+    'idx_listings_difficulty_score': '(turnaround_difficulty, turnaround_score DESC)',
+    'idx_listings_location': '(location)',
+    'idx_listings_position': '(position)',
+}
+
+
+class ConnectionPool:
+    """
+    SQLite connections shared by request threads. The database runs in
+    WAL mode, so readers never wait for the writer; writes are serialized
+    through a single lock.
+    """
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self.write_lock = threading.Lock()
+
+    def _open(self):
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                     check_same_thread=False, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._open()
+        try:
+            yield connection
+        except BaseException:
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+        finally:
+            if self._idle.qsize() < self.size:
+                self._idle.put(connection)
+            else:
+                connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """A write transaction (one writer at a time)"""
+        with self.write_lock, self.connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.rollback()
+                raise
+            connection.commit()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _has_fts5(connection):
+    try:
+        connection.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+    except sqlite3.OperationalError:
+        return False
+    connection.execute('DROP TABLE temp.fts5_probe')
+    return True
+
+
+def _search_triggers():
+    # FTS5 external-content table over the listings' implicit rowids,
+    # which upserts keep (the table is never VACUUMed)
+    columns = ', '.join(SEARCH_COLUMNS)
+    new = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    delete = (f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) "
+              f"VALUES ('delete', old.rowid, {old});")
+    insert = f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.rowid, {new});"
+    return {
+        'listings_search_insert': f'AFTER INSERT ON {TABLE} BEGIN {insert} END',
+        'listings_search_delete': f'AFTER DELETE ON {TABLE} BEGIN {delete} END',
+        'listings_search_update': f'AFTER UPDATE OF {columns} ON {TABLE} BEGIN {delete} {insert} END',
+    }
+
+
+def match_expression(terms):
+    """FTS5 MATCH string requiring every term (each quoted, so no query syntax leaks through)"""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _has_math_functions(connection):
+    try:
+        connection.execute('SELECT log10(10)').fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+class ListingStore:
+    """
+    Analyzed listings in an indexed SQLite table.
+
+    Rows keep their dataset order in a `position` column. A `meta` table
+    holds a version counter that every write bumps, which readers use as
+    the dataset version instead of the file's mtime (WAL writes do not
+    touch the main file).
+    """
+
+    def __init__(self, path, pool_size=DEFAULT_POOL_SIZE, searchable=True):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        self.searchable = searchable
+        self._columns = None
+        self._math = None
+        self._search = None
+
+    # Schema
+
+    def exists(self):
+        if not os.path.exists(self.path):
+            return False
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meta'").fetchone()
+        return row is not None
+
+    def columns(self):
+        """Data columns of the listings table, in dataset order"""
+        if self._columns is None:
+            with self.pool.connection() as connection:
+                info = connection.execute(f'PRAGMA table_info({TABLE})').fetchall()
+            self._columns = [row[1] for row in info if row[1] != 'position']
+        return self._columns
+
+    def _ensure_schema(self, connection, df):
+        """Create the tables (columns in dataset order) and add any new columns"""
+        def definition(column):
+            sql_type = SQL_TYPES.get(COLUMN_DTYPES.get(column, str(df[column].dtype)), 'TEXT')
+            return f'"{column}" {sql_type}' + (' PRIMARY KEY' if column == 'listing_id' else '')
+
+        connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)')
+        definitions = ', '.join(definition(column) for column in df.columns)
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLE} ({definitions}, position INTEGER NOT NULL)')
+        existing = {row[1] for row in connection.execute(f'PRAGMA table_info({TABLE})')}
+        for column in df.columns:
+            if column not in existing:
+                connection.execute(f'ALTER TABLE {TABLE} ADD COLUMN {definition(column)}')
+        for name, indexed in INDEXES.items():
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {TABLE} {indexed}')
+        if self.searchable and set(SEARCH_COLUMNS) <= existing | set(df.columns):
+            self._ensure_search(connection)
+        self._columns = None
+
+    def _ensure_search(self, connection):
+        """Create the full-text index (filled from existing rows the first time)"""
+        if connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)).fetchone():
+            return
+        if not _has_fts5(connection):
+            return
+        connection.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5({', '.join(SEARCH_COLUMNS)}, "
+            f"content='{TABLE}', content_rowid='rowid')")
+        for name, body in _search_triggers().items():
+            connection.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+        connection.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+    # Writes
+
+    @staticmethod
+    def _sql_values(df):
+        """Columns as plain Python values (uint64 hashes stored as signed 64-bit)"""
+        values = []
+        for column in df.columns:
+            array = df[column].to_numpy()
+            if array.dtype == np.uint64:
+                array = array.view(np.int64)
+            values.append(array.tolist())
+        return values
+
+    def replace_all(self, df):
+        """
+        Make the table hold exactly `df`, in one transaction: rows are bulk
+        upserted by listing_id (unchanged rows are left alone) and listings
+        that disappeared are deleted. Readers see the old or the new
+        dataset, never a mix.
+        """
+        df = apply_schema(df).drop_duplicates('listing_id', keep='last').reset_index(drop=True)
+        with self.pool.transaction() as connection:
+            self._ensure_schema(connection, df)
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS incoming (listing_id TEXT PRIMARY KEY)')
+            connection.execute('DELETE FROM incoming')
+            self._upsert(connection, df)
+            connection.executemany('INSERT INTO incoming VALUES (?)',
+                                   ((listing_id,) for listing_id in df['listing_id']))
+            connection.execute(
+                f'DELETE FROM {TABLE} WHERE listing_id NOT IN (SELECT listing_id FROM incoming)')
+            connection.execute('DELETE FROM incoming')
+            self._bump_version(connection, len(df))
+
+    def update(self, df, positions, removed, rows, version):
+        """
+        Apply an incremental refresh in one transaction: upsert the rows of
+        `df` at the given dataset positions and delete the listing IDs in
+        `removed`, leaving every other row alone. `rows` is the new row
+        count. Only done if the database is still at `version` (its
+        signature() when the refresh read it); returns False otherwise, and
+        the caller writes the full dataset instead.
+        """
+        df = apply_schema(df)
+        with self.pool.transaction() as connection:
+            meta = dict(connection.execute('SELECT key, value FROM meta').fetchall())
+            if (meta.get('version'), meta.get('rows', 0)) != tuple(version):
+                return False
+            self._ensure_schema(connection, df)
+            connection.executemany(f'DELETE FROM {TABLE} WHERE listing_id = ?',
+                                   ((listing_id,) for listing_id in removed))
+            self._upsert(connection, df, positions=positions)
+            self._bump_version(connection, rows)
+        return True
+
+    def _upsert(self, connection, df, position_offset=0, positions=None):
+        columns = list(df.columns) + ['position']
+        names = ', '.join(f'"{column}"' for column in columns)
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns
+                            if column != 'listing_id')
+        changed = ' OR '.join(f'{TABLE}."{column}" IS NOT excluded."{column}"' for column in columns
+                              if column != 'listing_id')
+        sql = (f'INSERT INTO {TABLE} ({names}) VALUES ({placeholders}) '
+               f'ON CONFLICT(listing_id) DO UPDATE SET {updates} WHERE {changed}')
+        for start in range(0, len(df), UPSERT_BATCH_SIZE):
+            batch = df.iloc[start:start + UPSERT_BATCH_SIZE]
+            values = self._sql_values(batch)
+            if positions is None:
+                values.append(list(range(position_offset + start, position_offset + start + len(batch))))
+            else:
+                values.append(np.asarray(positions[start:start + len(batch)], dtype=np.int64).tolist())
+            connection.executemany(sql, zip(*values))
+
+    def append(self, df, position_offset):
+        """Add rows to a database being built chunk by chunk (see finish())"""
+        df = apply_schema(df)
+        with self.pool.transaction() as connection:
+            self._ensure_schema(connection, df)
+            self._upsert(connection, df, position_offset)
+
+    def finish(self, rows):
+        """Mark a database built with append() as complete"""
+        if not os.path.exists(self.path):
+            return
+        with self.pool.transaction() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)')
+            self._bump_version(connection, rows)
+
+    def _bump_version(self, connection, rows):
+        connection.execute(
+            "INSERT INTO meta VALUES ('version', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+        connection.execute(
+            "INSERT INTO meta VALUES ('rows', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (rows,))
+
+    def replace_from(self, path):
+        """Load every row of another listings database (e.g. a finished snapshot) in one transaction"""
+        source = ListingStore(path, pool_size=1)
+        try:
+            with self.pool.transaction() as connection:
+                first = True
+                rows = 0
+                for chunk in source.iter_chunks(UPSERT_BATCH_SIZE):
+                    if first:
+                        self._ensure_schema(connection, chunk)
+                        connection.execute(
+                            'CREATE TEMP TABLE IF NOT EXISTS incoming (listing_id TEXT PRIMARY KEY)')
+                        connection.execute('DELETE FROM incoming')
+                        first = False
+                    self._upsert(connection, chunk, position_offset=rows)
+                    connection.executemany('INSERT OR REPLACE INTO incoming VALUES (?)',
+                                           ((listing_id,) for listing_id in chunk['listing_id']))
+                    rows += len(chunk)
+                if not first:
+                    connection.execute(
+                        f'DELETE FROM {TABLE} WHERE listing_id NOT IN (SELECT listing_id FROM incoming)')
+                    connection.execute('DELETE FROM incoming')
+                    self._bump_version(connection, rows)
+                elif self.exists():
+                    # An empty snapshot empties the table
+                    connection.execute(f'DELETE FROM {TABLE}')
+                    self._bump_version(connection, 0)
+        finally:
+            source.pool.close()
+
+    # Reads
+
+    def signature(self):
+        """(version counter, row count), or None if the database has no data yet"""
+        if not self.exists():
+            return None
+        with self.pool.connection() as connection:
+            meta = dict(connection.execute('SELECT key, value FROM meta').fetchall())
+        if 'version' not in meta:
+            return None
+        return (meta['version'], meta.get('rows', 0))
+
+    def _frame(self, sql, params=(), columns=None):
+        with self.pool.connection() as connection:
+            cursor = connection.execute(sql, params)
+            names = [description[0] for description in cursor.description]
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=names)
+        if 'content_hash' in df.columns:
+            df['content_hash'] = df['content_hash'].to_numpy(dtype=np.int64).view(np.uint64)
+        return apply_schema(df)
+
+    def _select(self, columns, table=None):
+        columns = self.columns() if columns is None else list(columns)
+        unknown = [column for column in columns if column not in self.columns()]
+        if unknown:
+            raise KeyError(f"Unknown column(s): {', '.join(unknown)}")
+        prefix = f'{table}.' if table else ''
+        return ', '.join(f'{prefix}"{column}"' for column in columns)
+
+    def read(self, columns=None):
+        return self._frame(f'SELECT {self._select(columns)} FROM {TABLE} ORDER BY position')
+
+    def iter_chunks(self, chunksize, columns=None):
+        select = self._select(columns)
+        with self.pool.connection() as connection:
+            cursor = connection.execute(f'SELECT {select} FROM {TABLE} ORDER BY position')
+            yield from self._fetch_chunks(cursor, chunksize)
+
+    @staticmethod
+    def _fetch_chunks(cursor, chunksize):
+        names = [description[0] for description in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                return
+            df = pd.DataFrame.from_records(rows, columns=names)
+            if 'content_hash' in df.columns:
+                df['content_hash'] = df['content_hash'].to_numpy(dtype=np.int64).view(np.uint64)
+            yield apply_schema(df)
+
+    def read_positions(self, positions, columns=None):
+        """Rows at the given dataset positions, in the requested order"""
+        positions = [int(position) for position in positions]
+        placeholders = ', '.join('?' for _ in positions)
+        df = self._frame(f'SELECT position AS _position, {self._select(columns)} FROM {TABLE} '
+                         f'WHERE position IN ({placeholders})', positions)
+        order = pd.Index(df.pop('_position')).get_indexer(positions)
+        return df.take(order[order >= 0]).reset_index(drop=True)
+
+    def get(self, listing_id):
+        """One listing as a dict, or None"""
+        df = self._frame(f'SELECT {self._select(None)} FROM {TABLE} WHERE listing_id = ?', (listing_id,))
+        return df.iloc[0].to_dict() if len(df) else None
+
+    def listing_id_at(self, position):
+        with self.pool.connection() as connection:
+            row = connection.execute(f'SELECT listing_id FROM {TABLE} WHERE position = ?',
+                                     (int(position),)).fetchone()
+        return row[0] if row else None
+
+    def query(self, min_score, max_difficulty, columns=None, offset=0, limit=None):
+        """
+        Listings with turnaround_score >= min_score and difficulty <=
+        max_difficulty, best score first (ties in dataset order).
+        Returns (DataFrame of the requested page, total matches).
+        """
+        total = self.count(min_score, max_difficulty)
+        sql = (f'SELECT {self._select(columns)} FROM {TABLE} WHERE {QUERY_FILTER} '
+               'ORDER BY turnaround_score DESC, position LIMIT ? OFFSET ?')
+        df = self._frame(sql, (min_score, max_difficulty, -1 if limit is None else limit, offset))
+        return df, total
+
+    def count(self, min_score, max_difficulty):
+        """Number of listings query() matches"""
+        with self.pool.connection() as connection:
+            return connection.execute(f'SELECT COUNT(*) FROM {TABLE} WHERE {QUERY_FILTER}',
+                                      (min_score, max_difficulty)).fetchone()[0]
+
+    def iter_query(self, min_score, max_difficulty, columns=None, offset=0, chunksize=5000):
+        """
+        Every query() match from `offset` on, as DataFrames of at most
+        `chunksize` rows. One statement is stepped through for the whole
+        iteration, so all chunks come from the same version of the data;
+        it holds a pooled connection until the iterator is exhausted or closed.
+        """
+        sql = (f'SELECT {self._select(columns)} FROM {TABLE} WHERE {QUERY_FILTER} '
+               'ORDER BY turnaround_score DESC, position LIMIT -1 OFFSET ?')
+        with self.pool.connection() as connection:
+            cursor = connection.execute(sql, (min_score, max_difficulty, offset))
+            yield from self._fetch_chunks(cursor, chunksize)
+
+    def has_search(self):
+        """Whether the full-text index exists (SQLite built with FTS5)"""
+        if not self._search:
+            with self.pool.connection() as connection:
+                self._search = connection.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)).fetchone() is not None
+        return self._search
+
+    def search(self, terms, min_score, max_difficulty, columns=None, offset=0, limit=None):
+        """
+        Listings containing every term in their title or description that
+        pass the score/difficulty filters, best BM25 match first (then by
+        score). Returns (DataFrame of the page with a `relevance` column,
+        total matches).
+        """
+        select = self._select(columns, table=TABLE)
+        join = (f'FROM {SEARCH_TABLE} JOIN {TABLE} ON {TABLE}.rowid = {SEARCH_TABLE}.rowid '
+                f'WHERE {SEARCH_TABLE} MATCH ? AND turnaround_score >= ? AND turnaround_difficulty <= ?')
+        params = (match_expression(terms), min_score, max_difficulty)
+        with self.pool.connection() as connection:
+            total = connection.execute(f'SELECT COUNT(*) {join}', params).fetchone()[0]
+        sql = (f'SELECT {select}, -bm25({SEARCH_TABLE}) AS relevance {join} '
+               f'ORDER BY bm25({SEARCH_TABLE}), turnaround_score DESC, position LIMIT ? OFFSET ?')
+        df = self._frame(sql, params + (-1 if limit is None else limit, offset))
+        return df, total
+
+    def score_histogram(self, bins):
+        """Counts per score bin, matching numpy.histogram (last bin closed)"""
+        edges = list(bins)
+        cases = ' '.join(f'WHEN turnaround_score < {upper} THEN {i}'
+                         for i, upper in enumerate(edges[1:-1]))
+        sql = (f'SELECT CASE {cases} ELSE {len(edges) - 2} END AS bin, COUNT(*) FROM {TABLE} '
+               f'WHERE turnaround_score >= ? AND turnaround_score <= ? GROUP BY bin')
+        counts = [0] * (len(edges) - 1)
+        with self.pool.connection() as connection:
+            for bin_number, count in connection.execute(sql, (edges[0], edges[-1])):
+                counts[bin_number] = count
+        return counts
+
+    def grid_cells(self, bins):
+        """
+        Scatter aggregated into a bins x bins grid over log10 price/revenue
+        (see charts.grid_cells), computed in SQL. Returns None when this
+        SQLite build lacks math functions.
+        """
+        with self.pool.connection() as connection:
+            if self._math is None:
+                self._math = _has_math_functions(connection)
+            if not self._math:
+                return None
+            log_price = 'log10(max(price, 1))'
+            log_revenue = 'log10(max(revenue, 1))'
+            low_p, high_p, low_r, high_r = connection.execute(
+                f'SELECT min({log_price}), max({log_price}), min({log_revenue}), max({log_revenue}) '
+                f'FROM {TABLE}').fetchone()
+            if low_p is None:
+                return pd.DataFrame(columns=GRID_COLUMNS)
+            span_p = (high_p - low_p) or 1.0
+            span_r = (high_r - low_r) or 1.0
+            cell = (f'min(CAST(({log_price} - :low_p) / :span_p * :bins AS INTEGER), :bins - 1) * :bins + '
+                    f'min(CAST(({log_revenue} - :low_r) / :span_r * :bins AS INTEGER), :bins - 1)')
+            sql = (f'SELECT {cell} AS cell, COUNT(*), avg({log_price}), avg({log_revenue}), '
+                   f'avg(turnaround_score), avg(turnaround_difficulty), min(title) '
+                   f'FROM {TABLE} GROUP BY cell ORDER BY cell')
+            rows = connection.execute(sql, {'low_p': low_p, 'span_p': span_p, 'low_r': low_r,
+                                            'span_r': span_r, 'bins': bins}).fetchall()
+        return pd.DataFrame(rows, columns=GRID_COLUMNS)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """Shared ListingStore (and connection pool) for a database file"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ListingStore(path)
+        return _stores[path]
@@ -0,0 +1,524 @@
+# analysis/storage.py
+import glob
+import io
+import os
+import shutil
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = 'data'
+DATASET_NAME = 'analyzed_listings'
+LEGACY_CSV_PATH = os.path.join(DATA_DIR, DATASET_NAME + '.csv')
+
+# Finished datasets are written here and published with an atomic swap
+SNAPSHOT_DIR_NAME = 'snapshots'
+KEEP_SNAPSHOTS = 3
+
+# Uncompressed Arrow copy of the current dataset, memory-mapped at boot (see write_warm_snapshot)
+WARM_SNAPSHOT_SUFFIX = '.warm.arrow'
+
+# Rows per Parquet row group; single-record reads decode one group
+ROW_GROUP_SIZE = 16384
+# Bytes scanned at a time when locating CSV records
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Explicit dtypes for the analyzed listings so readers never re-infer them
+COLUMN_DTYPES = {
+    'title': 'object',
+    'price': 'int64',
+    'revenue': 'int64',
+    'description': 'object',
+    'location': 'object',
+    'url': 'object',
+    'price_to_revenue_ratio': 'float64',
+    'price_drop': 'int64',
+    'urgency_signal': 'int64',
+    'declining_revenue': 'int64',
+    'management_issues': 'int64',
+    'prime_location': 'int64',
+    'raw_score': 'float64',
+    'turnaround_score': 'float64',
+    'turnaround_difficulty': 'int64',
+    'listing_id': 'object',
+    'content_hash': 'uint64',
+}
+
+
+def apply_schema(df):
+    """Cast known columns to their explicit dtypes (unknown columns are kept as-is)"""
+    dtypes = {
+        column: dtype for column, dtype in COLUMN_DTYPES.items()
+        if column in df.columns and str(df[column].dtype) != dtype
+    }
+    if not dtypes:
+        return df
+    df = df.copy()
+    for column, dtype in dtypes.items():
+        if dtype == 'object':
+            df[column] = df[column].fillna('').astype(str).astype(object)
+        else:
+            df[column] = df[column].fillna(0).astype(dtype)
+    return df
+
+
+class CsvStorage:
+    """Plain CSV files - kept for import/export and environments without pyarrow"""
+    name = 'csv'
+    extension = '.csv'
+    queryable = False
+
+    def publish(self, snapshot, path):
+        return publish_snapshot(snapshot, path)
+
+    def write(self, df, path):
+        df.to_csv(path, index=False)
+
+    def read(self, path, columns=None):
+        df = pd.read_csv(path, usecols=columns, dtype=self._dtypes(columns),
+                         keep_default_na=False, float_precision='round_trip')
+        return apply_schema(df)
+
+    def columns(self, path):
+        return list(pd.read_csv(path, nrows=0).columns)
+
+    def iter_chunks(self, path, chunksize, columns=None):
+        """Yield the file as DataFrames of at most `chunksize` rows"""
+        reader = pd.read_csv(path, usecols=columns, dtype=self._dtypes(columns),
+                             keep_default_na=False, float_precision='round_trip',
+                             chunksize=chunksize)
+        with reader:
+            for chunk in reader:
+                yield apply_schema(chunk)
+
+    def open_writer(self, path):
+        return CsvChunkWriter(path)
+
+    def row_locator(self, path):
+        """
+        Byte offset of the header and of every record, plus the file size,
+        found without parsing fields. Newlines inside quoted values are
+        skipped by tracking quote parity.
+        """
+        ends = []
+        parity = 0
+        position = 0
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(SCAN_BLOCK_SIZE)
+                if not block:
+                    break
+                data = np.frombuffer(block, dtype=np.uint8)
+                quotes = np.flatnonzero(data == ord('"'))
+                newlines = np.flatnonzero(data == ord('\n'))
+                # A newline ends a record when an even number of quotes precede it
+                outside = (np.searchsorted(quotes, newlines) + parity) % 2 == 0
+                ends.append(newlines[outside] + position + 1)
+                parity = (parity + len(quotes)) % 2
+                position += len(block)
+        offsets = np.concatenate([[0]] + ends) if ends else np.zeros(1, dtype=np.int64)
+        if offsets[-1] != position:
+            offsets = np.append(offsets, position)  # last record without a trailing newline
+        return offsets.astype(np.int64)
+
+    def read_rows(self, path, positions, locator, columns=None):
+        """Read only the records at `positions` (in that order) using row_locator() offsets"""
+        with open(path, 'rb') as f:
+            header = f.read(int(locator[1]))
+            parts = [header]
+            for position in positions:
+                f.seek(int(locator[position + 1]))
+                parts.append(f.read(int(locator[position + 2] - locator[position + 1])))
+        df = pd.read_csv(io.BytesIO(b''.join(parts)), usecols=columns, dtype=self._dtypes(columns),
+                         keep_default_na=False, float_precision='round_trip')
+        return apply_schema(df)
+
+    @staticmethod
+    def _dtypes(columns):
+        return {column: dtype for column, dtype in COLUMN_DTYPES.items()
+                if columns is None or column in columns}
+
+
+class CsvChunkWriter:
+    """Appends DataFrames to a CSV file, writing the header once"""
+
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='')
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self._file, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetStorage:
+    """
+    Columnar Parquet files with explicit dtypes.
+    Readers can load a subset of columns without decoding the others.
+    """
+    name = 'parquet'
+    extension = '.parquet'
+    queryable = False
+
+    def __init__(self, compression='zstd'):
+        self.compression = compression
+
+    @staticmethod
+    def available():
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def write(self, df, path):
+        apply_schema(df).to_parquet(
+            path, engine='pyarrow', index=False, compression=self.compression,
+            row_group_size=ROW_GROUP_SIZE
+        )
+
+    def read(self, path, columns=None):
+        import pyarrow.parquet as pq
+        # One chunk per column (not one per row group): picking rows out of
+        # chunked string columns costs a pass over the whole column
+        return pq.read_table(path, columns=columns).combine_chunks().to_pandas()
+
+    def columns(self, path):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+
+    def iter_chunks(self, path, chunksize, columns=None):
+        """Yield the file as DataFrames of at most `chunksize` rows"""
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+
+    def open_writer(self, path):
+        return ParquetChunkWriter(path, self.compression)
+
+    def publish(self, snapshot, path):
+        return publish_snapshot(snapshot, path)
+
+    def row_locator(self, path):
+        """First row of every row group (and the total row count), from the footer only"""
+        import pyarrow.parquet as pq
+        metadata = pq.ParquetFile(path).metadata
+        sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        return np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+    def read_rows(self, path, positions, locator, columns=None):
+        """Read only the row groups holding `positions` and return those rows in order"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        positions = np.asarray(positions, dtype=np.int64)
+        groups = np.searchsorted(locator, positions, side='right') - 1
+        parquet_file = pq.ParquetFile(path)
+        tables = []
+        for group in np.unique(groups):
+            table = parquet_file.read_row_group(int(group), columns=columns)
+            tables.append(table.take(positions[groups == group] - locator[group]))
+        df = pa.concat_tables(tables).to_pandas() if tables else self.read(path, columns).iloc[:0]
+        # Restore the requested order
+        order = np.argsort(np.argsort(groups, kind='stable'), kind='stable')
+        return df.iloc[order].reset_index(drop=True)
+
+
+class ParquetChunkWriter:
+    """Appends DataFrames to a Parquet file as row groups with a fixed schema"""
+
+    def __init__(self, path, compression):
+        self.path = path
+        self.compression = compression
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        df = apply_schema(df)
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class SqliteStorage:
+    """
+    Indexed SQLite database (see analysis.sqlite_store). Writes are bulk
+    upserts in a single transaction, and the endpoints query it directly
+    instead of filtering a DataFrame.
+    """
+    name = 'sqlite'
+    extension = '.db'
+    queryable = True
+
+    @staticmethod
+    def store(path):
+        from analysis.sqlite_store import get_store
+        return get_store(path)
+
+    def signature(self, path):
+        """Dataset version from the database's own counter (WAL writes leave the file mtime alone)"""
+        return self.store(path).signature()
+
+    def write(self, df, path):
+        self.store(path).replace_all(df)
+
+    def update(self, df, path, positions, removed, version):
+        """
+        Write the dataset `df` by touching only the rows at `positions` and
+        deleting the listing IDs `removed` (see ListingStore.update)
+        """
+        return self.store(path).update(df.iloc[positions], positions, removed, len(df), version)
+
+    def read(self, path, columns=None):
+        return self.store(path).read(columns)
+
+    def columns(self, path):
+        return self.store(path).columns()
+
+    def iter_chunks(self, path, chunksize, columns=None):
+        return self.store(path).iter_chunks(chunksize, columns)
+
+    def open_writer(self, path):
+        return SqliteChunkWriter(path)
+
+    def row_locator(self, path):
+        return None
+
+    def read_rows(self, path, positions, locator, columns=None):
+        return self.store(path).read_positions(positions, columns)
+
+    def publish(self, snapshot, path):
+        """Copy a finished snapshot database into the live one in one transaction"""
+        if os.path.abspath(snapshot) != os.path.abspath(path):
+            self.store(path).replace_from(snapshot)
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(snapshot + suffix):
+                    os.remove(snapshot + suffix)
+        return path
+
+
+class SqliteChunkWriter:
+    """
+    Appends DataFrames to a new database file (e.g. a snapshot), one
+    transaction per chunk. Not meant for the live database: publish the
+    finished file with SqliteStorage.publish().
+    """
+
+    def __init__(self, path):
+        from analysis.sqlite_store import ListingStore
+        # The live database builds its own search index when this is published
+        self.store = ListingStore(path, pool_size=1, searchable=False)
+        self.rows = 0
+
+    def write(self, df):
+        self.store.append(df, self.rows)
+        self.rows += len(df)
+
+    def close(self):
+        if self.store is not None:
+            self.store.finish(self.rows)
+            self.store.pool.close()
+            self.store = None
+
+
+STORAGE_BACKENDS = {
+    CsvStorage.name: CsvStorage,
+    ParquetStorage.name: ParquetStorage,
+    SqliteStorage.name: SqliteStorage,
+}
+
+
+def get_storage(name=None):
+    """
+    Return the storage backend named by `name` or the DATASET_FORMAT
+    environment variable. Defaults to Parquet when pyarrow is installed.
+    """
+    name = name or os.environ.get('DATASET_FORMAT')
+    if name is None:
+        name = ParquetStorage.name if ParquetStorage.available() else CsvStorage.name
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown dataset format: {name}")
+    return STORAGE_BACKENDS[name]()
+
+
+def storage_for_path(path):
+    """Pick the storage backend matching a file's extension"""
+    for backend in STORAGE_BACKENDS.values():
+        if path.endswith(backend.extension):
+            return backend()
+    raise ValueError(f"Unknown dataset format for {path}")
+
+
+def dataset_path(storage=None):
+    """Path of the analyzed listings for the given storage backend"""
+    storage = storage or get_storage()
+    return os.path.join(DATA_DIR, DATASET_NAME + storage.extension)
+
+
+def new_snapshot_path(path):
+    """Unique path for the next version of the dataset at `path`"""
+    directory = os.path.join(os.path.dirname(path), SNAPSHOT_DIR_NAME)
+    os.makedirs(directory, exist_ok=True)
+    base, extension = os.path.splitext(os.path.basename(path))
+    stamp = time.strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:8]
+    return os.path.join(directory, f"{base}-{stamp}{extension}")
+
+
+def publish_snapshot(snapshot, path, keep=KEEP_SNAPSHOTS):
+    """
+    Make the finished `snapshot` file visible at `path` in one rename, so
+    readers see either the previous dataset or the new one, never a
+    partial file. Only the newest `keep` snapshots are kept.
+    """
+    partial_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(snapshot, partial_path)
+    except OSError:
+        # File systems without hard links
+        shutil.copyfile(snapshot, partial_path)
+    os.replace(partial_path, path)
+
+    base, extension = os.path.splitext(os.path.basename(path))
+    pattern = os.path.join(os.path.dirname(snapshot), f"{base}-*{extension}")
+    for old in sorted(glob.glob(pattern))[:-keep]:
+        if not os.path.samefile(old, snapshot):
+            os.remove(old)
+    return path
+
+
+def warm_snapshot_path(path):
+    return path + WARM_SNAPSHOT_SUFFIX
+
+
+def write_warm_snapshot(df, path, signature):
+    """
+    Save `df` (the dataset at `path` with file signature `signature`) as an
+    uncompressed Arrow IPC file. Loading it is a memory map rather than a
+    Parquet decode or CSV parse. Returns the file written, or None without pyarrow.
+    """
+    if not ParquetStorage.available():
+        return None
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'dataset_signature': '-'.join(str(part) for part in signature).encode(),
+    })
+    warm_path = warm_snapshot_path(path)
+    partial_path = f"{warm_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        # A single record batch, so the mapped columns are unchunked (see ParquetStorage.read)
+        feather.write_feather(table, partial_path, compression='uncompressed',
+                              chunksize=max(len(table), 1))
+        os.replace(partial_path, warm_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return warm_path
+
+
+def read_warm_snapshot(path, signature):
+    """
+    The warm snapshot of the dataset at `path`, or None if there is none
+    or it was written for a different version (file signature) of the dataset.
+    """
+    warm_path = warm_snapshot_path(path)
+    if not os.path.exists(warm_path) or not ParquetStorage.available():
+        return None
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    try:
+        table = feather.read_table(warm_path, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    expected = '-'.join(str(part) for part in signature).encode()
+    if (table.schema.metadata or {}).get(b'dataset_signature') != expected:
+        return None
+    # One block per column, so numeric and string columns stay views of the mapped file
+    return table.to_pandas(split_blocks=True)
+
+
+def import_csv(csv_path, storage=None, path=None):
+    """Convert a CSV export into the configured storage format"""
+    storage = storage or get_storage()
+    path = path or dataset_path(storage)
+    df = CsvStorage().read(csv_path)
+    if 'url' in df.columns:
+        # Exports from before stable IDs existed
+        from analysis.listing_ids import add_listing_keys
+        df = add_listing_keys(df)
+    storage.write(df, path)
+    return path
+
+
+def export_csv(csv_path, storage=None, path=None):
+    """Write the stored analyzed listings out as CSV"""
+    storage = storage or get_storage()
+    path = path or dataset_path(storage)
+    storage.read(path).to_csv(csv_path, index=False)
+    return csv_path
+
+
+def migrate_legacy_csv(storage=None):
+    """
+    One-time migration of data/analyzed_listings.csv into the configured format.
+    Returns the new path, or None if there was nothing to migrate.
+    """
+    storage = storage or get_storage()
+    path = dataset_path(storage)
+    if storage.name == CsvStorage.name or os.path.exists(path):
+        return None
+    if not os.path.exists(LEGACY_CSV_PATH):
+        return None
+    return import_csv(LEGACY_CSV_PATH, storage, path)
+
+
+def backfill_listing_keys(storage=None, path=None):
+    """
+    Add listing_id and content_hash to a dataset file written before they
+    existed, such as the bundled legacy CSV, so lookups by ID work in
+    every format. The file is rewritten once, through a snapshot.
+    Returns the path if it was rewritten, None otherwise.
+    """
+    storage = storage or get_storage()
+    path = path or dataset_path(storage)
+    if storage.queryable or not os.path.exists(path):
+        # Databases are always created with both columns
+        return None
+    columns = storage.columns(path)
+    if 'url' not in columns or ('listing_id' in columns and 'content_hash' in columns):
+        return None
+    from analysis.listing_ids import add_listing_keys
+    snapshot = new_snapshot_path(path)
+    storage.write(add_listing_keys(storage.read(path)), snapshot)
+    return storage.publish(snapshot, path)
+
+
+if __name__ == '__main__':
+    # python -m analysis.storage [migrate | import <csv> | export <csv>]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    if command == 'migrate':
+        print(migrate_legacy_csv() or "Nothing to migrate")
+    elif command == 'import' and len(sys.argv) > 2:
+        print(import_csv(sys.argv[2]))
+    elif command == 'export' and len(sys.argv) > 2:
+        print(export_csv(sys.argv[2]))
+    else:
+        print("Usage: python -m analysis.storage [migrate | import <csv> | export <csv>]")
+        sys.exit(1)
@@ -1,25 +1,145 @@
 # app.py
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, redirect, url_for, g, Response
 import pandas as pd
 from datetime import datetime
 import os
 import json
+import time
 import numpy as np
-import colorsys
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import os
 
-# Import our custom modules
-from scrapers.scraper import BusinessScraper
-from analysis.analyzer import BusinessAnalyzer
+# Import our custom modules (the scraper and analyzer are imported on first use)
+from analysis.dataset import dataset_cache, ANALYZED_LISTINGS_PATH, PREWARM_DATASET
+from analysis.lazy import LazyInstance
+from analysis.storage import migrate_legacy_csv
+from analysis import opportunities, charts, search, export
+from analysis.index import ScoreIndex
+from analysis.details import ListingIndex, DetailCache, VersionedDetailCache, listing_details
+from analysis.api_cache import ApiResponseCache, cached_response
+from analysis.jobs import JobQueue, JobStore
+from analysis.report import REPORT_COLUMNS, report_rows
+from analysis import mailer
+from analysis.refresh import REFRESH_JOB, RefreshScheduler, submit_refresh
+from analysis import metrics
+from analysis.profiler import SamplingProfiler
 
 app = Flask(__name__)
 
-# Initialize our classes
-scraper = BusinessScraper()
-analyzer = BusinessAnalyzer()
+# Columns needed by the dashboard charts (skips loading description text)
+CHART_COLUMNS = ['title', 'price', 'revenue', 'turnaround_score', 'turnaround_difficulty']
+
+# Serialized (and compressed) API responses, keyed by dataset version
+api_cache = ApiResponseCache()
+
+# Background jobs (refreshes, emails), with their state in data/jobs so any worker
+# process can report them, and the SMTP connections they share
+job_queue = JobQueue(store=JobStore())
+smtp_pool = mailer.SmtpPool()
+
+def make_scraper():
+    from scrapers.scraper import BusinessScraper
+    return BusinessScraper()
+
+def make_analyzer():
+    from analysis.analyzer import BusinessAnalyzer
+    return BusinessAnalyzer()
+
+# Initialize our classes, deferred until a request needs them so workers boot quickly
+scraper = LazyInstance(make_scraper)
+analyzer = LazyInstance(make_analyzer)
+
+# Periodic refreshes (REFRESH_INTERVAL_MINUTES), started by the first request each worker serves
+scheduler = RefreshScheduler(job_queue, scraper, analyzer)
+
+# Computed business details when the dataset lives in SQLite
+store_detail_caches = VersionedDetailCache()
+
+# Request latency per route, exposed with everything else at /metrics
+REQUEST_SECONDS = metrics.histogram('http_request_duration_seconds', 'Time to handle a request',
+                                    ['method', 'route'])
+REQUESTS = metrics.counter('http_requests_total', 'Requests handled', ['method', 'route', 'status'])
+# Requests whose handler caught an unexpected exception (and answered with an error message)
+HTTP_ERRORS = metrics.counter('http_errors_total', 'Requests that failed with an unexpected error', ['endpoint'])
+
+# ?profile=1 returns a sampled profile of the request instead of its response
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL_MS', 1)) / 1000
+
+def dataset_memory_bytes():
+    report = dataset_cache.memory_report()
+    return {entry['column']: entry['bytes'] for entry in report['columns']} if report else {}
+
+def register_metrics():
+    """Expose the counters the caches and job queue already keep"""
+    metrics.callback('dataset_rows', 'Rows in the loaded dataset', lambda: dataset_cache.stats()['rows'])
+    metrics.callback('dataset_memory_bytes', 'Bytes held by each column of the loaded dataset', labels=['column'],
+                     func=dataset_memory_bytes)
+    metrics.callback('dataset_cache_lookups_total', 'Dataset cache lookups', kind='counter', labels=['result'],
+                     func=lambda: {'hit': dataset_cache.hits, 'miss': dataset_cache.misses})
+    metrics.callback('response_cache_lookups_total', 'API response cache lookups', kind='counter',
+                     labels=['result'], func=lambda: {'hit': api_cache.hits, 'miss': api_cache.misses,
+                                                      'not_modified': api_cache.not_modified})
+    metrics.callback('response_cache_bytes', 'Bytes held by the API response cache',
+                     lambda: api_cache.total_bytes)
+    metrics.callback('jobs_active', 'Queued and running background jobs', labels=['kind', 'status'],
+                     func=job_queue.active_counts)
+
+register_metrics()
+
+def prewarm():
+    """
+    Load the dataset and build the score index before the first request,
+    from the warm Arrow snapshot when one matches (PREWARM_DATASET=1).
+    """
+    if dataset_cache.prewarm() is not None:
+        dataset_cache.derived('score_index', ScoreIndex.from_frame)
+
+if PREWARM_DATASET:
+    # Runs once per worker (or once in the master with gunicorn --preload)
+    prewarm()
+
+@app.before_request
+def start_scheduler():
+    # A no-op after the first call; under any WSGI server each worker starts its
+    # scheduler here, and the scheduler's file lock lets only one of them submit refreshes
+    scheduler.start()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if PROFILING_ENABLED and request.args.get('profile'):
+        g.profiler = SamplingProfiler(interval=PROFILE_INTERVAL).start()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    REQUEST_SECONDS.observe(request.method, route, value=time.perf_counter() - g.request_start)
+    REQUESTS.inc(request.method, route, response.status_code)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        # Collapsed stacks (flamegraph.pl / speedscope input) of the request that just ran
+        profiler.stop()
+        response = Response(profiler.collapsed(), mimetype='text/plain')
+        response.headers['X-Profile-Samples'] = str(profiler.samples)
+        response.headers['X-Profile-Seconds'] = f"{profiler.elapsed_seconds:.6f}"
+    return response
+
+def log_request_error(message):
+    """Log the exception being handled, with its traceback, and count it against the endpoint"""
+    app.logger.exception("%s (%s %s)", message, request.method, request.full_path)
+    HTTP_ERRORS.inc(request.endpoint or '<unmatched>')
+
+def listing_store():
+    """
+    The SQLite listing store when DATASET_FORMAT=sqlite, so that filters,
+    sorting and aggregations run as indexed queries; None for file storage.
+    Raises FileNotFoundError if no analyzed data exists yet.
+    """
+    if not dataset_cache.storage.queryable:
+        return None
+    store = dataset_cache.storage.store(dataset_cache.path)
+    if store.signature() is None:
+        raise FileNotFoundError(dataset_cache.path)
+    return store
 
 @app.route('/')
 def home():
@@ -29,29 +149,47 @@ def home():
 
 @app.route('/api/refresh-data', methods=['POST'])
 def refresh_data():
-    """API endpoint to refresh the data"""
+    """
+    API endpoint to refresh the data in the background
+    Only new or changed listings are re-analyzed unless ?full=1. Returns a
+    job ID (the running one if a refresh is already in progress); poll
+    /api/jobs/<job_id> for progress.
+    """
     try:
-        # In a real app, you'd implement proper scraping here
-        # For demo purposes, we'll just use sample data
-        df = scraper.load_sample_data()
-        
-        # Analyze the data
-        analyzed_df = analyzer.analyze_turnaround_potential(df)
-        
+        job, created = submit_refresh(job_queue, scraper, analyzer,
+                                      full=bool(request.args.get('full', 0, type=int)))
         return jsonify({
             'success': True,
-            'message': f'Successfully refreshed data with {len(analyzed_df)} listings',
-            'count': len(analyzed_df)
-        })
+            'message': 'Refresh started' if created else 'A refresh is already in progress',
+            'job_id': job.id,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
     except Exception as e:
+        log_request_error("Error refreshing data")
         return jsonify({
             'success': False,
             'message': f'Error refreshing data: {str(e)}'
         })
 
+@app.route('/api/refresh-status')
+def refresh_status():
+    """Latest refresh job, the published dataset version and the refresh schedule"""
+    latest = job_queue.latest(REFRESH_JOB)
+    return jsonify({
+        'success': True,
+        'version': dataset_cache.current_version(),
+        'latest': latest.to_dict() if latest else None,
+        'schedule': scheduler.stats()
+    })
+
 @app.route('/api/opportunities')
+@cached_response(api_cache, dataset_cache)
 def get_opportunities():
-    """API endpoint to get filtered opportunities"""
+    """
+    API endpoint to get filtered opportunities
+    Optional parameters: limit (page size), cursor (from next_cursor),
+    fields (comma-separated columns to return)
+    """
     # Get query parameters
     min_score = request.args.get('min_score', 50, type=int)
     max_difficulty = request.args.get('max_difficulty', 5, type=int)
@@ -59,45 +197,214 @@ def get_opportunities():
     try:
         # Load the analyzed data
         try:
-            df = pd.read_csv('data/analyzed_listings.csv')
+            store = listing_store()
+            if store is None:
+                df = dataset_cache.get()
+                index = dataset_cache.derived('score_index', ScoreIndex.from_frame)
+                version = dataset_cache.version
         except FileNotFoundError:
             # If no analyzed data exists, process it first
+            store = None
             raw_df = scraper.load_sample_data()
             df = analyzer.analyze_turnaround_potential(raw_df)
+            index = ScoreIndex.from_frame(df)
+            version = dataset_cache.version
         
-        # Filter businesses
-        filtered_df = df[
-            (df['turnaround_score'] >= min_score) & 
-            (df['turnaround_difficulty'] <= max_difficulty)
-        ]
-        
-        # Sort by score (descending)
-        filtered_df = filtered_df.sort_values('turnaround_score', ascending=False)
-        
-        # Convert to list of dictionaries
-        opportunities = filtered_df.to_dict('records')
+        try:
+            limit = opportunities.parse_limit(request.args.get('limit', type=int))
+            
+            if store is not None:
+                # Filter, sort and page in SQL, reading only the requested columns
+                fields = opportunities.parse_fields(request.args.get('fields'), store.columns())
+                page, total, next_cursor = opportunities.store_page(
+                    store, min_score, max_difficulty, fields, dataset_cache.current_version(),
+                    limit=limit, cursor=request.args.get('cursor')
+                )
+            else:
+                fields = opportunities.parse_fields(request.args.get('fields'), df.columns)
+                
+                # Filter and sort by score (descending) through the shared index,
+                # serializing only the requested page and columns
+                page, total, next_cursor = opportunities.page(
+                    df, index, min_score, max_difficulty, fields, version,
+                    limit=limit, cursor=request.args.get('cursor')
+                )
+        except opportunities.QueryError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e),
+                'opportunities': []
+            }), 400
         
         return jsonify({
             'success': True,
-            'count': len(opportunities),
-            'opportunities': opportunities
+            'count': total,
+            'returned': len(page),
+            'next_cursor': next_cursor,
+            'opportunities': page
         })
     except Exception as e:
+        log_request_error("Error getting opportunities")
         return jsonify({
             'success': False,
             'message': f'Error getting opportunities: {str(e)}',
             'opportunities': []
-        })
+        }), 500
 
 
+@app.route('/api/opportunities/export')
+def export_opportunities():
+    """
+    Stream every opportunity matching min_score/max_difficulty, best score
+    first, as NDJSON (format=ndjson, the default) or CSV (format=csv).
+    Rows are serialized in batches as they are sent, gzipped when the client
+    accepts it. Optional: fields, cursor (X-Resume-Cursor of an earlier
+    export, or a next_cursor) and skip (rows already received from it).
+    """
+    min_score = request.args.get('min_score', 50, type=int)
+    max_difficulty = request.args.get('max_difficulty', 5, type=int)
+    
+    try:
+        try:
+            store = listing_store()
+            if store is None:
+                df = dataset_cache.get()
+        except FileNotFoundError:
+            # If no analyzed data exists, process it first
+            analyzer.analyze_turnaround_potential(scraper.load_sample_data())
+            store = listing_store()
+            if store is None:
+                df = dataset_cache.get()
+        
+        try:
+            export_format = export.parse_format(request.args.get('format'))
+            version = dataset_cache.current_version()
+            offset = export.start_offset(request.args.get('cursor'), request.args.get('skip', type=int), version)
+            if store is not None:
+                fields = opportunities.parse_fields(request.args.get('fields'), store.columns())
+                total = store.count(min_score, max_difficulty)
+                batches = export.store_batches(store, min_score, max_difficulty, fields, offset=offset)
+            else:
+                fields = opportunities.parse_fields(request.args.get('fields'), df.columns)
+                index = dataset_cache.derived('score_index', ScoreIndex.from_frame)
+                _, total = index.query(min_score, max_difficulty, limit=0)
+                # The generator keeps this version's frame alive, so a refresh mid-export is not seen
+                batches = export.frame_batches(df, index, min_score, max_difficulty, fields, offset=offset)
+        except opportunities.QueryError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        encoding = request.accept_encodings.best_match(['gzip'])
+        response = Response(export.serialize(batches, export_format, fields, encoding),
+                            mimetype=export.FORMATS[export_format])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['Content-Disposition'] = f'attachment; filename=opportunities.{export_format}'
+        response.headers['X-Total-Count'] = str(total)
+        response.headers['X-Resume-Cursor'] = opportunities.encode_cursor(version, offset)
+        return response
+    except Exception as e:
+        log_request_error("Error exporting opportunities")
+        return jsonify({
+            'success': False,
+            'message': f'Error exporting opportunities: {str(e)}'
+        }), 500
+
+
+@app.route('/api/search')
+@cached_response(api_cache, dataset_cache)
+def search_listings():
+    """
+    Full-text search over listing titles and descriptions, best match first
+    Parameters: q (all words must match), min_score and max_difficulty
+    (no filtering by default), limit (default 20), cursor, fields
+    """
+    min_score = request.args.get('min_score', 0, type=int)
+    max_difficulty = request.args.get('max_difficulty', 5, type=int)
+    
+    try:
+        try:
+            store = listing_store()
+        except FileNotFoundError:
+            # If no analyzed data exists, process it first
+            analyzer.analyze_turnaround_potential(scraper.load_sample_data())
+            store = listing_store()
+        
+        try:
+            terms = search.parse_query(request.args.get('q'))
+            limit = search.search_limit(request.args.get('limit', type=int))
+            
+            if store is not None and store.has_search():
+                fields = opportunities.parse_fields(request.args.get('fields'), store.columns())
+                results, total, next_cursor = search.store_page(
+                    store, terms, min_score, max_difficulty, fields, dataset_cache.current_version(),
+                    limit=limit, cursor=request.args.get('cursor')
+                )
+            else:
+                df = dataset_cache.get()
+                index = search.dataset_index(dataset_cache)
+                fields = opportunities.parse_fields(request.args.get('fields'), df.columns)
+                results, total, next_cursor = search.page(
+                    df, index, terms, min_score, max_difficulty, fields, dataset_cache.version,
+                    limit=limit, cursor=request.args.get('cursor')
+                )
+        except opportunities.QueryError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e),
+                'results': []
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'query': terms,
+            'count': total,
+            'returned': len(results),
+            'next_cursor': next_cursor,
+            'results': results
+        })
+    except Exception as e:
+        log_request_error("Error searching listings")
+        return jsonify({
+            'success': False,
+            'message': f'Error searching listings: {str(e)}',
+            'results': []
+        }), 500
 
 @app.route('/api/chart-data')
+@cached_response(api_cache, dataset_cache)
 def chart_data():
-    """Provide data for dashboard charts"""
+    """
+    Provide data for dashboard charts
+    Optional parameters: downsample (grid or sample) and max_points to
+    bound the size of the price vs revenue scatter
+    """
     try:
+        try:
+            downsample, max_points = charts.parse_downsample(
+                request.args.get('downsample'), request.args.get('max_points', type=int))
+        except opportunities.QueryError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Load data (or use sample data if file doesn't exist)
         try:
-            df = pd.read_csv('data/analyzed_listings.csv')
+            store = listing_store()
+            if store is not None:
+                # Histogram and grid cells are aggregated in SQL
+                score_counts = store.score_histogram(charts.SCORE_BINS)
+                cells = store.grid_cells(charts.grid_bins(max_points)) if downsample == 'grid' else None
+                if cells is not None:
+                    points, point_scores = charts.cell_points(cells)
+                    return jsonify(charts.payload(score_counts, points, point_scores,
+                                                  int(cells['count'].sum()), downsample))
+                df = store.read(CHART_COLUMNS)
+                return jsonify(charts.chart_payload(df, downsample=downsample, max_points=max_points,
+                                                    score_counts=score_counts))
+            df = dataset_cache.get(columns=CHART_COLUMNS)
         except FileNotFoundError:
             # Create sample data with more variety for better charts
             sample_data = [
@@ -180,52 +487,28 @@ def chart_data():
                 }
             ]
             df = pd.DataFrame(sample_data)
-            
-        # Prepare score distribution data
-        score_bins = [0, 20, 40, 60, 80, 100]
-        score_labels = ['0-20', '21-40', '41-60', '61-80', '81-100']
-        score_counts = np.histogram(df['turnaround_score'], bins=score_bins)[0].tolist()
         
-        # Prepare price vs revenue data
-        price_revenue_data = []
-        colors = []
-        
-        for _, row in df.iterrows():
-            # Generate colors based on turnaround score (higher score = more green)
-            h = (120 * min(row['turnaround_score'] / 100, 1)) / 360  # 0 = red, 120 = green in HSL
-            r, g, b = colorsys.hsv_to_rgb(h, 0.8, 0.8)
-            color = f'rgba({int(r*255)}, {int(g*255)}, {int(b*255)}, 0.7)'
-            
-            price_revenue_data.append({
-                'x': row['price'],
-                'y': row['revenue'],
-                'title': row['title'],
-                'score': row['turnaround_score'],
-                'difficulty': row['turnaround_difficulty']
-            })
-            colors.append(color)
-        
-        return jsonify({
-            'score_labels': score_labels,
-            'score_data': score_counts,
-            'price_revenue_data': price_revenue_data,
-            'colors': colors
-        })
+        # Score histogram and price vs revenue points, built column-wise
+        return jsonify(charts.chart_payload(df, downsample=downsample, max_points=max_points))
     
     except Exception as e:
-        print(f"Error generating chart data: {e}")
-        return jsonify({'error': str(e)})
+        log_request_error("Error generating chart data")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/email-results', methods=['POST'])
 def email_results():
-    """Email the current search results to the user"""
+    """
+    Queue an email of the current search results to one or more
+    (comma-separated) addresses. Returns a job ID; progress is available
+    from /api/jobs/<job_id>.
+    """
     try:
-        # Get email address from the form
-        recipient_email = request.form.get('email')
-        min_score = request.args.get('min_score', 50, type=int)
-        max_difficulty = request.args.get('max_difficulty', 5, type=int)
+        # Get email address(es) and filters from the form
+        recipients = mailer.parse_recipients(request.form.get('email'))
+        min_score = request.values.get('min_score', 50, type=int)
+        max_difficulty = request.values.get('max_difficulty', 5, type=int)
         
-        if not recipient_email:
+        if not recipients:
             return jsonify({
                 'success': False,
                 'message': 'Email address is required'
@@ -233,258 +516,143 @@ def email_results():
         
         # Get the current filtered opportunities
         try:
-            df = pd.read_csv('data/analyzed_listings.csv')
+            store = listing_store()
+            if store is None:
+                df = dataset_cache.get()
+                index = dataset_cache.derived('score_index', ScoreIndex.from_frame)
         except FileNotFoundError:
             # Use sample data if file doesn't exist
+            store = None
             raw_df = scraper.load_sample_data()
             df = analyzer.analyze_turnaround_potential(raw_df)
+            index = ScoreIndex.from_frame(df)
         
-        # Filter businesses
-        filtered_df = df[
-            (df['turnaround_score'] >= min_score) & 
-            (df['turnaround_difficulty'] <= max_difficulty)
-        ]
-        
-        # Sort by score (descending)
-        filtered_df = filtered_df.sort_values('turnaround_score', ascending=False)
+        # Filter businesses, sorted by score (descending)
+        if store is not None:
+            # Only the matching rows and the columns the report shows leave the database
+            df, total = store.query(min_score, max_difficulty,
+                                    columns=[column for column in REPORT_COLUMNS if column in store.columns()])
+            positions = np.arange(len(df))
+        else:
+            positions, total = index.query(min_score, max_difficulty)
         
         # If no matches, return error
-        if len(filtered_df) == 0:
+        if total == 0:
             return jsonify({
                 'success': False,
                 'message': 'No opportunities match your criteria'
             })
         
-        # Create email content
-        subject = "Your Business Turnaround Opportunities"
-        
-        # Create plain text version as fallback
-        plain_text = f"""
-Business Turnaround Opportunities
-
-Here are the {len(filtered_df)} opportunities that match your criteria:
-
-"""
-        
-        # Add each business to the plain text version
-        for _, business in filtered_df.iterrows():
-            plain_text += f"""
-{business['title']}
-Location: {business['location']}
-Price: ${int(business['price']):,}
-Revenue: ${int(business['revenue']):,}
-Score: {int(business['turnaround_score'])}
-URL: {business['url']}
-
-"""
-        
-        # Build the HTML version
-        html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body { font-family: Arial, sans-serif; }
-                .card { border: 1px solid #ddd; border-radius: 8px; padding: 15px; margin-bottom: 20px; }
-                .score { font-size: 20px; font-weight: bold; color: white; background-color: #28a745; 
-                         padding: 5px 10px; border-radius: 20px; }
-                .difficulty { color: #6c757d; }
-                .header { display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px; }
-                .title { font-size: 18px; font-weight: bold; margin: 0; }
-                .location { color: #6c757d; margin-top: 5px; }
-                .details { display: flex; margin: 10px 0; }
-                .details div { margin-right: 20px; }
-                .label { font-weight: bold; }
-            </style>
-        </head>
-        <body>
-            <h2>Business Turnaround Opportunities</h2>
-            <p>Here are the """ + str(len(filtered_df)) + """ opportunities that match your criteria:</p>
-        """
-        
-        # Add each business to the email
-        for _, business in filtered_df.iterrows():
-            # Create difficulty stars with ASCII characters
-            difficulty_stars = "*" * int(business['turnaround_difficulty']) + "-" * (5 - int(business['turnaround_difficulty']))
-            
-            # Get business data with safe fallbacks
-            title = str(business.get('title', 'Unnamed Business'))
-            location = str(business.get('location', 'Unknown Location'))
-            price = int(business.get('price', 0))
-            revenue = int(business.get('revenue', 0))
-            score = int(business.get('turnaround_score', 0))
-            url = str(business.get('url', '#'))
-            
-            # Make sure description is safe
-            description = str(business.get('description', 'No description available'))
-            if description:
-                # Limit length and ensure it's clean
-                description = description[:150]
-            else:
-                description = "No description available"
-            
-            # Build the business card HTML
-            card_html = """
-            <div class="card">
-                <div class="header">
-                    <h3 class="title">{title}</h3>
-                    <span class="score">{score}</span>
-                </div>
-                <div class="location">{location}</div>
-                <p>{description}...</p>
-                <div class="details">
-                    <div>
-                        <div class="label">Price:</div>
-                        <div>${price:,}</div>
-                    </div>
-                    <div>
-                        <div class="label">Revenue:</div>
-                        <div>${revenue:,}</div>
-                    </div>
-                    <div>
-                        <div class="label">Difficulty:</div>
-                        <div class="difficulty">{difficulty_stars}</div>
-                    </div>
-                </div>
-                <a href="{url}" style="color: #007bff;">View Details</a>
-            </div>
-            """.format(
-                title=title,
-                score=score,
-                location=location,
-                description=description,
-                price=price,
-                revenue=revenue,
-                difficulty_stars=difficulty_stars,
-                url=url
-            )
-            
-            html += card_html
-        
-        html += """
-            <p>This is an automated email from Business Turnaround Finder.</p>
-        </body>
-        </html>
-        """
-        
-        # For a weekend project with no budget, let's use a simple approach
-        # In a real project, you'd use environment variables for these
-        sender_email = ""  # Your email
-        app_password = ""     # Your app password
+        # Snapshot the rows now; rendering and sending happen in the background
+        rows = report_rows(df, positions)
+        job = job_queue.submit('email', mailer.send_report, smtp_pool, recipients, rows,
+                               description=f"Email {total} opportunities to {', '.join(recipients)}")
         
-        try:
-            # Create message
-            message = MIMEMultipart('alternative')
-            message['From'] = sender_email
-            message['To'] = recipient_email
-            message['Subject'] = subject
-            
-            # Attach plain text version
-            part1 = MIMEText(plain_text, 'plain')
-            message.attach(part1)
-            
-            # Attach HTML version
-            part2 = MIMEText(html, 'html')
-            message.attach(part2)
-            
-            # Send email
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                server.login(sender_email, app_password)
-                server.send_message(message)
-            
-            return jsonify({
-                'success': True,
-                'message': f'Results successfully sent to {recipient_email}'
-            })
-            
-        except Exception as e:
-            print(f"Error sending email: {e}")
-            # Try printing the html to find where the problem is
-            problematic_chars = []
-            for i, char in enumerate(html):
-                if ord(char) > 127:
-                    problematic_chars.append((i, char, ord(char)))
-            
-            if problematic_chars:
-                print(f"Found problematic characters at: {problematic_chars[:5]}")
-            
-            return jsonify({
-                'success': False,
-                'message': f'Error sending email: {str(e)}'
-            })
+        return jsonify({
+            'success': True,
+            'message': f'Sending results to {", ".join(recipients)}',
+            'job_id': job.id,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
     
     except Exception as e:
-        print(f"Error in email-results: {e}")
+        log_request_error("Error in email-results")
         return jsonify({
             'success': False,
             'message': f'Server error: {str(e)}'
         })
 
-@app.route('/business/<int:business_id>')
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Status, progress and result of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/business/<business_id>')
 def business_detail(business_id):
-    """Show detailed view of a business"""
+    """
+    Show detailed view of a business, looked up by its stable listing_id.
+    Old positional links (/business/<row number>) redirect to the stable URL.
+    """
     try:
-        # Load data
         try:
-            df = pd.read_csv('data/analyzed_listings.csv')
+            store = listing_store()
         except FileNotFoundError:
             raw_df = scraper.load_sample_data()
-            df = analyzer.analyze_turnaround_potential(raw_df)
+            analyzer.analyze_turnaround_potential(raw_df)
+            store = listing_store()
+        if store is not None:
+            return store_business_detail(store, business_id)
         
-        # Find the business by ID (index in this case)
-        if business_id < 0 or business_id >= len(df):
-            return render_template('error.html', message="Business not found")
+        # Make sure analyzed data exists
+        try:
+            listing_index = dataset_cache.derived('listing_index', ListingIndex.from_frame,
+                                                  columns=['listing_id'])
+        except FileNotFoundError:
+            raw_df = scraper.load_sample_data()
+            analyzer.analyze_turnaround_potential(raw_df)
+            listing_index = dataset_cache.derived('listing_index', ListingIndex.from_frame,
+                                                  columns=['listing_id'])
         
-        business = df.iloc[business_id].to_dict()
+        # Computed details are cached per listing until the dataset changes
+        detail_cache = dataset_cache.derived('detail_cache', lambda _: DetailCache(),
+                                             columns=['listing_id'])
+        cached = detail_cache.get(business_id)
+        if cached is not None:
+            business, improvement_areas = cached
+            return render_template('business_detail.html', business=business,
+                                   improvement_areas=improvement_areas)
         
-        # Add additional analysis
-        business['roi_estimate'] = f"{(business['revenue'] / business['price'] * 100):.1f}%"
+        position = listing_index.position(business_id)
+        if position is None:
+            if business_id.isdigit() and int(business_id) < len(listing_index):
+                legacy = dataset_cache.read_rows([int(business_id)], columns=['listing_id'])
+                return redirect(url_for('business_detail', business_id=legacy['listing_id'].iloc[0]))
+            return render_template('error.html', message="Business not found")
         
-        # Calculate potential improvement areas
-        improvement_areas = []
-        if business.get('declining_revenue', 0) == 1:
-            improvement_areas.append({
-                'area': 'Revenue Growth',
-                'description': 'This business shows signs of declining revenue, which presents an opportunity for new marketing initiatives and sales strategies.',
-                'impact': 'High'
-            })
+        # Read just this record (from memory if the dataset is already loaded)
+        business = dataset_cache.read_rows([position]).iloc[0].to_dict()
+        if business.get('listing_id') != business_id:
+            # The file changed between the lookup and the read
+            return render_template('error.html', message="Business not found")
         
-        if business.get('management_issues', 0) == 1:
-            improvement_areas.append({
-                'area': 'Management Efficiency',
-                'description': 'There appear to be management issues that could be addressed with better operational processes and leadership.',
-                'impact': 'High'
-            })
-            
-        if business.get('price_drop', 0) == 1:
-            improvement_areas.append({
-                'area': 'Valuation',
-                'description': 'The price has been reduced, suggesting potential for negotiation or value-based improvements.',
-                'impact': 'Medium'
-            })
-            
-        if business.get('prime_location', 0) == 1:
-            improvement_areas.append({
-                'area': 'Location Leverage',
-                'description': 'The business is in a prime location that may not be fully utilized in the current operation.',
-                'impact': 'Medium'
-            })
-            
-        # If no improvement areas identified, add a default one
-        if not improvement_areas:
-            improvement_areas.append({
-                'area': 'General Operations',
-                'description': 'Potential for operational improvements and efficiency gains under new management.',
-                'impact': 'Medium'
-            })
-            
+        business, improvement_areas = detail_cache.put(business_id, listing_details(business))
         return render_template('business_detail.html', business=business, improvement_areas=improvement_areas)
     
     except Exception as e:
-        print(f"Error in business detail: {e}")
+        log_request_error("Error in business detail")
         return render_template('error.html', message=f"Error: {str(e)}")
 
+def store_business_detail(store, business_id):
+    """business_detail() for the SQLite store: one primary-key lookup per listing"""
+    detail_cache = store_detail_caches.for_version(dataset_cache.current_version())
+    cached = detail_cache.get(business_id)
+    if cached is None:
+        business = store.get(business_id)
+        if business is None:
+            legacy_id = store.listing_id_at(int(business_id)) if business_id.isdigit() else None
+            if legacy_id is not None:
+                return redirect(url_for('business_detail', business_id=legacy_id))
+            return render_template('error.html', message="Business not found")
+        cached = detail_cache.put(business_id, listing_details(business))
+    business, improvement_areas = cached
+    return render_template('business_detail.html', business=business, improvement_areas=improvement_areas)
+
+@app.route('/api/dataset-stats')
+def dataset_stats():
+    """Report dataset and API response cache hit/miss counts and load timings"""
+    stats = dataset_cache.stats()
+    stats['memory'] = dataset_cache.memory_report()
+    stats['response_cache'] = api_cache.stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request latency, dataset load, analysis stage and scraper metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # Add to app.py
 @app.template_filter('format_number')
 def format_number(value):
@@ -493,9 +661,14 @@ def format_number(value):
 
 if __name__ == '__main__':
     # Ensure we have some data to work with
-    if not os.path.exists('data/analyzed_listings.csv'):
+    migrate_legacy_csv()
+    if not os.path.exists(ANALYZED_LISTINGS_PATH):
         print("Initializing sample data...")
         raw_df = scraper.load_sample_data()
         analyzer.analyze_turnaround_potential(raw_df)
     
+    # The debug reloader runs the app in a child process; schedule refreshes there
+    # right away rather than on the first request (never in the watching parent)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        scheduler.start()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,75 @@
+# benchmarks/chart_benchmark.py
+"""
+Compare the old row-by-row chart-data builder with analysis.charts and
+report payload sizes for each downsampling mode.
+
+Usage: python -m benchmarks.chart_benchmark [rows ...]
+"""
+import colorsys
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.charts import chart_payload, color_levels, score_palette
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'title': [f'Business {i}' for i in range(rows)],
+        'price': np.round(10 ** rng.normal(5.5, 0.5, rows)).astype(np.int64),
+        'revenue': np.round(10 ** rng.normal(5.6, 0.5, rows)).astype(np.int64),
+        'turnaround_score': np.round(rng.random(rows) * 100, 1),
+        'turnaround_difficulty': rng.integers(1, 6, rows),
+    })
+
+
+def iterrows_payload(df):
+    """The original implementation, kept for comparison"""
+    points, colors = [], []
+    for _, row in df.iterrows():
+        h = (120 * min(row['turnaround_score'] / 100, 1)) / 360
+        r, g, b = colorsys.hsv_to_rgb(h, 0.8, 0.8)
+        colors.append(f'rgba({int(r*255)}, {int(g*255)}, {int(b*255)}, 0.7)')
+        points.append({'x': row['price'], 'y': row['revenue'], 'title': row['title'],
+                       'score': row['turnaround_score'], 'difficulty': row['turnaround_difficulty']})
+    return {'price_revenue_data': points, 'colors': colors}
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    palette = score_palette()
+    for rows in sizes:
+        df = make_frame(rows)
+        if rows <= 200_000:
+            legacy, legacy_time = timed(lambda: iterrows_payload(df))
+            legacy_text = f"iterrows {legacy_time * 1000:9.1f} ms"
+        else:
+            legacy_text = "iterrows   (skipped)"
+
+        full, full_time = timed(lambda: chart_payload(df))
+        if rows <= 200_000:
+            assert [p['x'] for p in full['price_revenue_data']] == [p['x'] for p in legacy['price_revenue_data']]
+        # Palette colours never drift more than half a palette step from the exact colour
+        assert np.all(np.abs(color_levels(df['turnaround_score']) / (len(palette) - 1) * 100
+                             - df['turnaround_score']) <= 100 / (len(palette) - 1) / 2 + 1e-9)
+
+        print(f"{rows:>10,} rows  {legacy_text}  vectorized {full_time * 1000:8.1f} ms  "
+              f"payload {len(json.dumps(full)) / 1024:9.0f} KB")
+        for mode in ('sample', 'grid'):
+            payload, elapsed = timed(lambda: chart_payload(df, downsample=mode, max_points=2000))
+            print(f"{'':>16}{mode:>6}: {elapsed * 1000:8.1f} ms  "
+                  f"{len(payload['price_revenue_data']):>5} points  "
+                  f"{len(json.dumps(payload)) / 1024:6.0f} KB")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,49 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark suite results (see benchmarks.suite) and flag
+measurements that got slower by more than the threshold (default 20%).
+Exits with status 1 if any did.
+
+Usage: python -m benchmarks.compare OLD.json NEW.json [threshold]
+"""
+import json
+import sys
+
+DEFAULT_THRESHOLD = 0.2
+
+
+def load(path):
+    with open(path) as f:
+        run = json.load(f)
+    return run['meta'], {(entry['name'], entry['rows']): entry['seconds'] for entry in run['results']}
+
+
+def main(old_path, new_path, threshold=DEFAULT_THRESHOLD):
+    old_meta, old = load(old_path)
+    new_meta, new = load(new_path)
+    print(f"old: {old_meta.get('commit')} ({old_meta.get('timestamp')})")
+    print(f"new: {new_meta.get('commit')} ({new_meta.get('timestamp')})")
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys(), key=lambda key: (key[1], key[0])):
+        name, rows = key
+        ratio = new[key] / old[key] if old[key] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  SLOWER'
+            regressions += 1
+        elif ratio < 1 / (1 + threshold):
+            flag = '  faster'
+        print(f"{rows:>10,}  {name:<34} {old[key] * 1000:11.2f} ms -> {new[key] * 1000:11.2f} ms  "
+              f"x{ratio:5.2f}{flag}")
+    for name, rows in sorted(old.keys() ^ new.keys()):
+        print(f"{rows:>10,}  {name:<34} only in {'old' if (name, rows) in old else 'new'} run")
+
+    print(f"{regressions} measurement(s) slower by more than {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    sys.exit(main(sys.argv[1], sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_THRESHOLD))
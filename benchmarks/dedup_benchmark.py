@@ -0,0 +1,82 @@
+# benchmarks/dedup_benchmark.py
+"""
+Time near-duplicate detection (analysis.dedup) as the listing count
+grows: the first scrape (every listing MinHashed), the same scrape again
+(all signatures reused) and a scrape with 5% new listings. A share of
+the listings is relisted with an edited title and a lower price; reports
+how many of those relistings were caught (the cheaper copy kept) and how
+many unrelated listings were dropped.
+
+Usage: python -m benchmarks.dedup_benchmark [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.dedup import ListingDeduplicator
+
+VOCABULARY_SIZE = 20000
+DUPLICATE_SHARE = 0.05
+NEW_SHARE = 0.05
+
+
+def synthetic_listings(rows, rng, start=0):
+    """Listings with titles and descriptions drawn from a Zipf-like vocabulary"""
+    words = np.array([f'w{i}' for i in range(VOCABULARY_SIZE)])
+    weights = 1 / np.arange(1, len(words) + 1)
+    lengths = rng.integers(20, 60, rows)
+    drawn = rng.choice(words, lengths.sum(), p=weights / weights.sum())
+    texts = [' '.join(chunk) for chunk in np.split(drawn, np.cumsum(lengths)[:-1])]
+    return pd.DataFrame({
+        'title': [' '.join(text.split(' ', 6)[:6]) for text in texts],
+        'description': texts,
+        'price': rng.integers(50, 5000, rows) * 100,
+        'url': [f'https://example.com/listing/{n}' for n in range(start, start + rows)],
+    })
+
+
+def relist(df, rng):
+    """Copies of some listings under a new URL, one title word changed and 10% cheaper"""
+    copies = df.iloc[rng.choice(len(df), int(len(df) * DUPLICATE_SHARE), replace=False)].copy()
+    copies['title'] = [title.rsplit(' ', 1)[0] + ' reduced' for title in copies['title']]
+    copies['price'] = (copies['price'] * 0.9).astype(np.int64)
+    originals = copies['url'].to_numpy()
+    copies['url'] = [url.replace('example.com', 'broker.example') for url in originals]
+    return copies, originals
+
+
+def timed(deduplicator, df):
+    start = time.perf_counter()
+    kept, summary = deduplicator.deduplicate(df)
+    return kept, summary, time.perf_counter() - start
+
+
+def main(sizes):
+    for rows in sizes:
+        rng = np.random.default_rng(rows)
+        originals = synthetic_listings(rows, rng)
+        copies, copied_urls = relist(originals, rng)
+        scrape = pd.concat([originals, copies], ignore_index=True)
+
+        with tempfile.TemporaryDirectory(prefix='turnaround-dedup-') as workdir:
+            deduplicator = ListingDeduplicator(path=os.path.join(workdir, 'signatures.npz'), keep='cheapest')
+            kept, summary, first = timed(deduplicator, scrape)
+            _, _, repeat = timed(deduplicator, scrape)
+            grown = pd.concat([scrape, synthetic_listings(int(rows * NEW_SHARE), rng, start=rows)],
+                              ignore_index=True)
+            _, grown_summary, incremental = timed(deduplicator, grown)
+
+        kept_urls = set(kept['url'])
+        caught = len(copies) - sum(url in kept_urls for url in copied_urls)
+        dropped_unrelated = summary['duplicates'] - caught
+        print(f"{rows:>10,} rows  first {first * 1000:9.1f} ms  repeat {repeat * 1000:9.1f} ms  "
+              f"+{NEW_SHARE:.0%} new {incremental * 1000:9.1f} ms ({grown_summary['hashed']:,} hashed)  "
+              f"relistings caught {caught:,}/{len(copies):,}  unrelated dropped {dropped_unrelated:,}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,88 @@
+# benchmarks/email_benchmark.py
+"""
+Render the results email for a synthetic dataset and send it through a
+local aiosmtpd server, once with a new connection per message and once
+through SmtpPool.
+
+Requires aiosmtpd (pip install aiosmtpd).
+Usage: python -m benchmarks.email_benchmark [listings] [recipients]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.mailer import SmtpPool, SmtpSettings, build_messages
+from analysis.report import report_rows, render_report
+
+PORT = 8026
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'title': [f'Business {i}' for i in range(rows)],
+        'location': rng.choice(['Seattle, WA', 'Austin, TX', 'Online Business'], rows),
+        'price': rng.integers(50_000, 2_000_000, rows),
+        'revenue': rng.integers(50_000, 3_000_000, rows),
+        'turnaround_score': np.round(rng.random(rows) * 100, 1),
+        'turnaround_difficulty': rng.integers(1, 6, rows),
+        'url': [f'https://example.com/business{i}' for i in range(rows)],
+        'description': ['Motivated seller! Prime location & declining revenue.'] * rows,
+    })
+
+
+def main(listings=500, recipients=100):
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("aiosmtpd is not installed: pip install aiosmtpd")
+
+    df = make_frame(listings)
+    start = time.perf_counter()
+    subject, plain_text, html = render_report(report_rows(df, np.arange(listings)))
+    print(f"render {listings} listings: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(html) / 1024:.0f} KB html)")
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=PORT)
+    controller.start()
+    try:
+        settings = SmtpSettings(host='127.0.0.1', port=PORT, security='none', user='',
+                                sender='finder@example.com')
+        messages = build_messages(settings.sender, [f'user{i}@example.com' for i in range(recipients)],
+                                  subject, plain_text, html)
+
+        start = time.perf_counter()
+        for message in messages:
+            server = settings.connect()
+            server.send_message(message)
+            server.quit()
+        fresh = time.perf_counter() - start
+
+        pool = SmtpPool(settings)
+        start = time.perf_counter()
+        pool.send(messages)
+        pooled = time.perf_counter() - start
+        pool.close()
+    finally:
+        controller.stop()
+
+    assert handler.received == 2 * recipients
+    print(f"{recipients} recipients  connection per message {fresh * 1000:8.1f} ms  "
+          f"pooled {pooled * 1000:8.1f} ms  ({pool.connections_opened} connection(s))")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
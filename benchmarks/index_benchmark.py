@@ -0,0 +1,60 @@
+# benchmarks/index_benchmark.py
+"""
+Compare boolean-mask + sort filtering with ScoreIndex queries as the
+listing count grows. Checks both return the same rows in the same order.
+
+Usage: python -m benchmarks.index_benchmark [rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from analysis.index import ScoreIndex
+
+QUERIES = [(50, 5), (80, 3), (20, 2), (0, 5)]
+PAGE_SIZE = 50
+
+
+def mask_and_sort(scores, difficulties, min_score, max_difficulty):
+    positions = np.flatnonzero((scores >= min_score) & (difficulties <= max_difficulty))
+    return positions[np.argsort(-scores[positions], kind='stable')]
+
+
+def best_of(func, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(sizes):
+    for rows in sizes:
+        rng = np.random.default_rng(rows)
+        scores = np.round(rng.random(rows) * 100, 1)
+        difficulties = rng.integers(1, 6, rows)
+
+        start = time.perf_counter()
+        index = ScoreIndex(scores, difficulties)
+        build = time.perf_counter() - start
+
+        scan_total = index_total = 0.0
+        for min_score, max_difficulty in QUERIES:
+            expected, scan = best_of(lambda: mask_and_sort(scores, difficulties, min_score, max_difficulty))
+            (page, total), lookup = best_of(lambda: index.query(min_score, max_difficulty, limit=PAGE_SIZE))
+            full, _ = index.query(min_score, max_difficulty)
+            if total != len(expected) or not np.array_equal(full, expected) \
+                    or not np.array_equal(page, expected[:PAGE_SIZE]):
+                raise AssertionError(f"Index results differ for {min_score}/{max_difficulty}")
+            scan_total += scan
+            index_total += lookup
+
+        print(f"{rows:>10,} rows  build {build * 1000:8.1f} ms  "
+              f"mask+sort {scan_total / len(QUERIES) * 1000:8.2f} ms/query  "
+              f"index page {index_total / len(QUERIES) * 1000:6.3f} ms/query  (parity ok)")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
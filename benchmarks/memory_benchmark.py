@@ -0,0 +1,116 @@
+# benchmarks/memory_benchmark.py
+"""
+Memory held by the analyzed dataset in a worker process:
+
+- per column, with the dtypes of the stored file and with the compact
+  in-memory dtypes of analysis.compact (COMPACT_DATASET)
+- per worker process, loading the dataset through DatasetCache:
+  - full: file dtypes, read into private memory
+  - compact: compact dtypes, read into private memory
+  - shared: compact dtypes memory-mapped from the warm snapshot, so
+    every worker on the host maps the same pages
+
+Private bytes (Private_Clean + Private_Dirty of /proc/self/smaps_rollup)
+are what each extra worker costs; mapped snapshot pages are counted in
+RSS but only stored once. Linux only for the per-process part.
+
+Usage: python -m benchmarks.memory_benchmark [rows]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints the growth of its memory as JSON
+CHILD = """
+import json, sys
+
+def memory():
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return values['Rss'], values['Private_Clean'] + values['Private_Dirty']
+
+import pyarrow.feather, pyarrow.parquet
+from analysis.dataset import DatasetCache
+cache = DatasetCache(warm_snapshots=sys.argv[1] == '1', compact=sys.argv[2] == '1')
+rss, private = memory()
+df = cache.get()
+after_rss, after_private = memory()
+print(json.dumps({'rss_bytes': after_rss - rss, 'private_bytes': after_private - private,
+                  'shared': cache.stats()['shared']}))
+"""
+
+# mode -> (warm snapshots, compact dtypes)
+MODES = {
+    'full': (False, False),
+    'compact': (False, True),
+    'shared': (True, True),
+}
+
+
+def megabytes(value):
+    return f"{value / 1e6:9.1f} MB"
+
+
+def columns_table(df):
+    """Per-column bytes as stored and as compacted, largest first"""
+    from analysis.compact import compact, memory_report
+
+    stored = memory_report(df)
+    compacted = {entry['column']: entry for entry in memory_report(compact(df))['columns']}
+    print(f"{'column':<24} {'file dtype':<12} {'bytes':>12}   {'compact dtype':<14} {'bytes':>12}")
+    for entry in stored['columns']:
+        small = compacted[entry['column']]
+        print(f"{entry['column']:<24} {entry['dtype']:<12} {megabytes(entry['bytes'])}   "
+              f"{small['dtype']:<14} {megabytes(small['bytes'])}")
+    total = sum(entry['bytes'] for entry in compacted.values())
+    print(f"{'total':<24} {'':<12} {megabytes(stored['bytes'])}   {'':<14} {megabytes(total)}")
+
+
+def worker_memory(workdir, mode):
+    warm, compact = MODES[mode]
+    completed = subprocess.run([sys.executable, '-c', CHILD, str(int(warm)), str(int(compact))],
+                               cwd=workdir, capture_output=True, text=True,
+                               env={**os.environ, 'PYTHONPATH': REPO_ROOT})
+    if completed.returncode != 0:
+        raise RuntimeError(f"Worker failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(rows):
+    from analysis.analyzer import BusinessAnalyzer
+    from analysis.dataset import DatasetCache, dataset_cache
+    from benchmarks.synthetic import generate_listings
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='turnaround-memory-') as workdir:
+        os.chdir(workdir)
+        try:
+            BusinessAnalyzer().analyze_turnaround_potential(generate_listings(rows))
+            print(f"{rows:,} rows ({dataset_cache.storage.name})")
+            columns_table(dataset_cache.storage.read(dataset_cache.path))
+            # Write the warm snapshot, as the first worker (or the analyzer's publish) would
+            DatasetCache(warm_snapshots=True).get()
+        finally:
+            os.chdir(cwd)
+
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            print("Per-process memory needs /proc/self/smaps_rollup (Linux)")
+            return 0
+        print()
+        for mode in MODES:
+            result = worker_memory(workdir, mode)
+            print(f"{mode:<8} private {megabytes(result['private_bytes'])}  rss {megabytes(result['rss_bytes'])}"
+                  f"{'  (mapped from the warm snapshot)' if result['shared'] else ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000))
@@ -0,0 +1,52 @@
+# benchmarks/parser_benchmark.py
+"""
+Parse the saved search result pages in benchmarks/fixtures with every
+available card parser, check that they produce identical listings and
+report the time per page.
+
+Usage: python -m benchmarks.parser_benchmark [repeats]
+"""
+import glob
+import os
+import sys
+import time
+
+from scrapers.parsers import PARSERS
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixtures():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'search_page_*.html'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+
+def main(repeats=20):
+    pages = load_fixtures()
+    parsers = [cls() for cls in PARSERS.values()
+               if not hasattr(cls, 'available') or cls.available()]
+
+    reference = None
+    for parser in parsers:
+        results = [parser.parse(page) for page in pages]
+        if reference is None:
+            reference = results
+        elif results != reference:
+            raise AssertionError(f"{parser.name} output differs from {parsers[0].name}")
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for page in pages:
+                parser.parse(page)
+        per_page = (time.perf_counter() - start) / (repeats * len(pages))
+        cards = sum(len(result) for result in results)
+        print(f"{parser.name:>5}  {per_page * 1000:8.2f} ms/page  ({cards} listings in {len(pages)} pages)")
+
+    print("All parsers produced identical listings")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
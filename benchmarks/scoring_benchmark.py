@@ -0,0 +1,89 @@
+# benchmarks/scoring_benchmark.py
+"""
+Compare the row-wise scoring path with the vectorized one in analysis.scoring.
+Checks that both give identical ratios, raw scores and difficulty ratings.
+
+Usage: python -m benchmarks.scoring_benchmark [rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import scoring
+from analysis.analyzer import BusinessAnalyzer
+from analysis.signals import get_default_extractor
+
+
+def make_frame(rows, seed=0):
+    """Random price/revenue/signal columns covering every difficulty combination"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'price': rng.integers(0, 1_500_000, rows),
+        'revenue': rng.integers(0, 2_000_000, rows),
+    })
+    for signal in get_default_extractor().signals:
+        df[signal] = rng.integers(0, 2, rows)
+    # Put some rows exactly on the 500k boundary and with zero revenue
+    df.loc[::97, 'price'] = 500000
+    df.loc[::89, 'revenue'] = 0
+    return df
+
+
+def rowwise(df, analyzer):
+    """The original implementation: DataFrame.apply(axis=1) for ratio and difficulty"""
+    ratio = df.apply(lambda row: row['price'] / max(row['revenue'], 1), axis=1)
+    raw = (
+        (1 - np.clip(ratio / 2, 0, 1)) * 30 +
+        df['price_drop'] * 15 +
+        df['urgency_signal'] * 10 +
+        df['declining_revenue'] * 15 +
+        df['management_issues'] * 20 +
+        df['prime_location'] * 10
+    )
+    difficulty = df.apply(analyzer._calculate_difficulty, axis=1)
+    return ratio.values, raw.values, difficulty.values
+
+
+def vectorized(df):
+    ratio = scoring.price_to_revenue_ratio(df['price'].values, df['revenue'].values)
+    extractor = get_default_extractor()
+    raw = scoring.raw_scores(
+        ratio, {signal: df[signal].values for signal in extractor.signals}, extractor.weights
+    )
+    difficulty = scoring.difficulty(
+        df['price'].values,
+        df['declining_revenue'].values,
+        df['management_issues'].values,
+        df['price_drop'].values,
+        df['prime_location'].values
+    )
+    return ratio, raw, difficulty
+
+
+def check_parity(expected, actual):
+    for name, a, b in zip(('ratio', 'raw_score', 'difficulty'), expected, actual):
+        if not np.array_equal(np.asarray(a), np.asarray(b)):
+            raise AssertionError(f"{name} differs between row-wise and vectorized scoring")
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    analyzer = BusinessAnalyzer()
+    for rows in sizes:
+        df = make_frame(rows)
+        expected, slow = timed(rowwise, df, analyzer)
+        actual, fast = timed(vectorized, df)
+        check_parity(expected, actual)
+        print(f"{rows:>9,} rows  row-wise {slow:8.3f}s  vectorized {fast:8.4f}s  "
+              f"speedup {slow / max(fast, 1e-9):8.1f}x  (parity ok)")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
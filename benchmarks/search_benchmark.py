@@ -0,0 +1,95 @@
+# benchmarks/search_benchmark.py
+"""
+Compare scanning every listing's text with SearchIndex lookups as the
+listing count grows, and time building the index from scratch against
+updating it after a refresh that edits or adds 5% of the listings.
+Checks the index finds exactly the listings the scan does.
+
+Usage: python -m benchmarks.search_benchmark [rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.search import SearchIndex, parse_query
+
+VOCABULARY_SIZE = 5000
+QUERIES = ['owner retiring', 'laundromat', 'declining revenue motivated', 'w17 w240']
+PAGE_SIZE = 20
+CHANGED_SHARE = 0.05
+
+
+def synthetic_texts(rows, rng):
+    """Titles and descriptions drawn from a Zipf-like vocabulary"""
+    words = np.array(['owner', 'retiring', 'laundromat', 'declining', 'revenue', 'motivated']
+                     + [f'w{i}' for i in range(VOCABULARY_SIZE)])
+    weights = 1 / np.arange(1, len(words) + 1)
+    lengths = rng.integers(8, 60, rows)
+    drawn = rng.choice(words, lengths.sum(), p=weights / weights.sum())
+    texts = [' '.join(chunk) for chunk in np.split(drawn, np.cumsum(lengths)[:-1])]
+    return pd.DataFrame({
+        'title': [' '.join(text.split(' ', 4)[:4]) for text in texts],
+        'description': texts,
+    })
+
+
+def scan(df, terms, scores, difficulties, min_score, max_difficulty):
+    text = (df['title'] + ' ' + df['description']).str.lower()
+    matches = (scores >= min_score) & (difficulties <= max_difficulty)
+    for term in terms:
+        matches &= text.str.contains(rf'(?<![^\W_]){term}(?![^\W_])', regex=True).to_numpy()
+    return np.flatnonzero(matches)
+
+
+def main(sizes):
+    for rows in sizes:
+        rng = np.random.default_rng(rows)
+        df = synthetic_texts(rows, rng)
+        scores = np.round(rng.random(rows) * 100, 1)
+        difficulties = rng.integers(1, 6, rows)
+
+        start = time.perf_counter()
+        index = SearchIndex.from_frame(df)
+        build = time.perf_counter() - start
+
+        scan_total = index_total = 0.0
+        for query in QUERIES:
+            terms = parse_query(query)
+            start = time.perf_counter()
+            expected = scan(df, terms, scores, difficulties, 0, 5)
+            scan_total += time.perf_counter() - start
+            start = time.perf_counter()
+            page, _, total = index.search(terms, scores, difficulties, 0, 5, limit=PAGE_SIZE)
+            index_total += time.perf_counter() - start
+            found, _, _ = index.search(terms, scores, difficulties, 0, 5)
+            if total != len(expected) or not np.array_equal(np.sort(found), expected) \
+                    or not np.array_equal(page, found[:PAGE_SIZE]):
+                raise AssertionError(f"Search results differ for {query!r}")
+
+        # A refresh: some listings edited, some dropped, some new
+        changed = rng.choice(rows, int(rows * CHANGED_SHARE), replace=False)
+        refreshed = df.copy()
+        refreshed.loc[changed, 'description'] = synthetic_texts(len(changed), rng)['description'].to_numpy()
+        refreshed = pd.concat([refreshed.iloc[len(changed) // 2:],
+                               synthetic_texts(len(changed) // 2, rng)], ignore_index=True)
+        start = time.perf_counter()
+        updated = index.update(refreshed)
+        update = time.perf_counter() - start
+        rebuilt = SearchIndex.from_frame(refreshed)
+        for query in QUERIES:
+            terms = parse_query(query)
+            scores = np.zeros(len(refreshed))
+            difficulties = np.ones(len(refreshed))
+            a, b = updated.search(terms, scores, difficulties, 0, 5), rebuilt.search(terms, scores, difficulties, 0, 5)
+            if not np.array_equal(a[0], b[0]) or not np.allclose(a[1], b[1]):
+                raise AssertionError(f"Updated index differs from a rebuild for {query!r}")
+
+        print(f"{rows:>10,} rows  build {build:6.2f} s  update {update:6.2f} s  "
+              f"scan {scan_total / len(QUERIES) * 1000:9.1f} ms/query  "
+              f"index page {index_total / len(QUERIES) * 1000:7.2f} ms/query  (parity ok)")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,128 @@
+# benchmarks/signals_benchmark.py
+"""
+Compare one str.contains scan per signal with the single-pass SignalExtractor.
+Checks that both produce identical flag columns.
+
+Then grow the rules to thousands of keywords and time the extractor against
+a single longest-first alternation regex (re-searched after every match):
+the regex slows down with every keyword added, the extractor should not.
+
+Usage: python -m benchmarks.signals_benchmark [rows ...]
+"""
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import signals
+from analysis.signals import SignalExtractor, get_default_extractor
+
+KEYWORD_COUNTS = [20, 200, 2000, 20000]
+SWEEP_ROWS = 10_000
+# The alternation regex takes minutes beyond this
+REGEX_MAX_KEYWORDS = 2000
+
+FILLER = (
+    "established business with loyal customers and strong brand recognition "
+    "great opportunity for an experienced operator with room to grow online sales"
+).split()
+
+
+def make_descriptions(rows, seed=0):
+    """Random filler text with keywords (including overlapping ones) sprinkled in"""
+    rng = np.random.default_rng(seed)
+    keywords = [k for rule in get_default_extractor().rules.values() for k in rule['keywords']]
+    keywords += ['REDUCED REVENUE', 'Prime Location', 'unpopular']
+    descriptions = []
+    for _ in range(rows):
+        words = list(rng.choice(FILLER, rng.integers(20, 60)))
+        for _ in range(rng.integers(0, 4)):
+            words.insert(rng.integers(0, len(words) + 1), str(rng.choice(keywords)))
+        descriptions.append(' '.join(words))
+    return pd.Series(descriptions)
+
+
+def per_signal(descriptions, rules):
+    """The original approach: one case-insensitive regex scan per signal"""
+    # Object dtype, as produced by read_csv before pandas 3
+    descriptions = descriptions.astype(object)
+    return {
+        signal: descriptions.str.contains(
+            '|'.join(re.escape(k) for k in rule['keywords']), case=False
+        ).astype(int).values
+        for signal, rule in rules.items()
+    }
+
+
+def grown_rules(rules, count, seed=0):
+    """`rules` with made-up keywords added until there are `count` in total"""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    grown = {signal: {**rule, 'keywords': list(rule['keywords'])} for signal, rule in rules.items()}
+    names = list(grown)
+    total = sum(len(rule['keywords']) for rule in grown.values())
+    for i in range(max(count - total, 0)):
+        word = ''.join(rng.choice(letters, rng.integers(5, 12)))
+        grown[names[i % len(names)]]['keywords'].append(f"{word} {i}")
+    return grown
+
+
+def alternation(descriptions, rules):
+    """One regex of every keyword, longest first, searched again one character after each match"""
+    keywords = sorted({k.lower() for rule in rules.values() for k in rule['keywords']}, key=len, reverse=True)
+    pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+    text = '\n'.join(str(text).lower() for text in descriptions)
+    found = 0
+    match = pattern.search(text)
+    while match is not None:
+        found += 1
+        match = pattern.search(text, match.start() + 1)
+    return found
+
+
+def keyword_sweep(rows=SWEEP_ROWS):
+    descriptions = make_descriptions(rows).values
+    backend = 'Aho-Corasick' if signals.ahocorasick is not None else 'anchor scan'
+    for count in KEYWORD_COUNTS:
+        rules = grown_rules(get_default_extractor().rules, count)
+        extractor = SignalExtractor(rules)
+
+        regex = None
+        if count <= REGEX_MAX_KEYWORDS:
+            start = time.perf_counter()
+            alternation(descriptions, rules)
+            regex = time.perf_counter() - start
+
+        start = time.perf_counter()
+        extractor.extract(descriptions)
+        fast = time.perf_counter() - start
+        regex = f"{regex:8.3f}s" if regex is not None else ' skipped'
+        print(f"{rows:>9,} rows  {count:>6,} keywords  alternation regex {regex}  "
+              f"extractor ({backend}) {fast:8.3f}s")
+
+
+def main(sizes):
+    extractor = get_default_extractor()
+    for rows in sizes:
+        descriptions = make_descriptions(rows)
+
+        start = time.perf_counter()
+        expected = per_signal(descriptions, extractor.rules)
+        slow = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = extractor.extract(descriptions.values)
+        fast = time.perf_counter() - start
+
+        for signal in extractor.signals:
+            if not np.array_equal(expected[signal], actual[signal]):
+                raise AssertionError(f"{signal} flags differ")
+        print(f"{rows:>9,} rows  per-signal {slow:8.3f}s  single-pass {fast:8.3f}s  "
+              f"({len(extractor.signals)} signals, parity ok)")
+    keyword_sweep()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
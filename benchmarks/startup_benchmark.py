@@ -0,0 +1,112 @@
+# benchmarks/startup_benchmark.py
+"""
+Time a fresh worker process from interpreter start to its first
+/api/opportunities response, as a new gunicorn worker would see it:
+
+- lazy: the dataset is loaded by the first request
+- prewarm_cold: PREWARM_DATASET=1 with no warm snapshot yet (it is
+  written during this boot)
+- prewarm_warm: PREWARM_DATASET=1 booting from the warm Arrow snapshot
+
+Each mode reports the process total, the `import app` time (including
+any prewarm) and the first request on its own. The warm boot is checked
+against STARTUP_BUDGET_SECONDS.
+
+Usage: python -m benchmarks.startup_benchmark [rows]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_BUDGET_SECONDS = 1.5
+FIRST_REQUEST = '/api/opportunities?min_score=50&limit=50'
+REPEATS = 3
+
+# Runs in the child process; prints its own timings as JSON
+CHILD = f"""
+import json, time
+start = time.perf_counter()
+import app as webapp
+imported = time.perf_counter()
+response = webapp.app.test_client().get({FIRST_REQUEST!r})
+assert response.status_code == 200, response.status_code
+print(json.dumps({{'import_seconds': imported - start, 'first_request_seconds': time.perf_counter() - imported}}))
+"""
+
+MODES = [
+    ('lazy', {'PREWARM_DATASET': '0'}),
+    ('prewarm_cold', {'PREWARM_DATASET': '1'}),
+    ('prewarm_warm', {'PREWARM_DATASET': '1'}),
+]
+
+
+def boot(workdir, env):
+    """Start a worker process in `workdir`; returns its timings"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', CHILD], cwd=workdir, capture_output=True, text=True,
+                               env={**os.environ, 'PYTHONPATH': REPO_ROOT, **env})
+    total = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Worker failed to start:\n{completed.stderr}")
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings['total_seconds'] = total
+    return timings
+
+
+def remove_warm_snapshots(workdir):
+    from analysis.storage import WARM_SNAPSHOT_SUFFIX
+    data_dir = os.path.join(workdir, 'data')
+    for name in os.listdir(data_dir):
+        if name.endswith(WARM_SNAPSHOT_SUFFIX):
+            os.remove(os.path.join(data_dir, name))
+
+
+def measure(workdir):
+    """
+    Boot timings for each mode against the dataset already analyzed in
+    workdir/data. Returns {mode: timings} with the fastest of REPEATS boots.
+    """
+    results = {}
+    for mode, env in MODES:
+        best = None
+        for _ in range(REPEATS if mode != 'prewarm_cold' else 1):
+            if mode != 'prewarm_warm':
+                remove_warm_snapshots(workdir)
+            timings = boot(workdir, env)
+            if best is None or timings['total_seconds'] < best['total_seconds']:
+                best = timings
+        results[mode] = best
+    return results
+
+
+def main(rows):
+    from analysis.analyzer import BusinessAnalyzer
+    from benchmarks.synthetic import generate_listings
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='turnaround-startup-') as workdir:
+        os.chdir(workdir)
+        try:
+            BusinessAnalyzer().analyze_turnaround_potential(generate_listings(rows))
+        finally:
+            os.chdir(cwd)
+        results = measure(workdir)
+
+    for mode, timings in results.items():
+        print(f"{rows:>10,} rows  {mode:<13} total {timings['total_seconds'] * 1000:8.1f} ms  "
+              f"import {timings['import_seconds'] * 1000:8.1f} ms  "
+              f"first request {timings['first_request_seconds'] * 1000:8.1f} ms")
+    warm = results['prewarm_warm']['total_seconds']
+    within = warm <= STARTUP_BUDGET_SECONDS
+    print(f"Warm boot to first response: {warm:.2f} s "
+          f"({'within' if within else 'OVER'} the {STARTUP_BUDGET_SECONDS:.1f} s budget)")
+    return 0 if within else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
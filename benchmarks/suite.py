@@ -0,0 +1,240 @@
+# benchmarks/suite.py
+"""
+End-to-end benchmark suite over synthetic listings (benchmarks.synthetic).
+For each dataset size it times:
+
+- analysis: analyze_turnaround_potential (analyze_streaming from a CSV
+  above STREAMING_ROWS, so 10M rows never have to fit in memory)
+- _calculate_difficulty row by row, next to the vectorized scoring.difficulty
+- HTML card parsing of generated result pages with every available parser
+- each read-only Flask endpoint through the test client:
+  - cold: the first request after the dataset is reloaded
+  - uncached: the response cache is cleared before each request
+  - cached: repeated identical requests
+- worker startup to the first /api/opportunities response, lazily and
+  prewarmed from the warm snapshot (benchmarks.startup_benchmark)
+
+Everything runs in a scratch directory, so data/ is left alone. Results
+are written as JSON to benchmarks/results/ (or the path in
+BENCHMARK_OUTPUT). Compare two runs with benchmarks.compare.
+
+Usage: python -m benchmarks.suite [rows ...]
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from analysis import scoring
+from analysis.analyzer import BusinessAnalyzer
+from benchmarks import startup_benchmark
+from benchmarks.synthetic import generate_listings, render_search_page, write_listings_csv
+from scrapers.parsers import PARSERS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# Larger datasets are written to CSV in chunks and analyzed with analyze_streaming
+STREAMING_ROWS = 1_000_000
+DIFFICULTY_ROWS = 100_000
+PARSE_CARDS = 2_000
+CARDS_PER_PAGE = 50
+REPEATS = 5
+
+# (name, url); {listing_id} is filled in with a listing from the dataset
+ENDPOINTS = [
+    ('home', '/'),
+    ('opportunities_page', '/api/opportunities?min_score=50&max_difficulty=5&limit=50'),
+    ('opportunities_projected', '/api/opportunities?min_score=50&fields=listing_id,title,turnaround_score'),
+    ('chart_data', '/api/chart-data?downsample=sample&max_points=2000'),
+    ('chart_data_grid', '/api/chart-data?downsample=grid&max_points=2000'),
+    ('search', '/api/search?q=motivated+seller&limit=20'),
+    ('business_detail', '/business/{listing_id}'),
+    ('dataset_stats', '/api/dataset-stats'),
+    ('refresh_status', '/api/refresh-status'),
+]
+# Return every matching listing; skipped where the response would be huge
+FULL_RESULTS_ENDPOINTS = [
+    ('opportunities_full', '/api/opportunities?min_score=50'),
+    ('opportunities_export', '/api/opportunities/export?min_score=50'),
+    ('opportunities_export_csv', '/api/opportunities/export?min_score=50&format=csv'),
+]
+FULL_RESULTS_MAX_ROWS = 100_000
+
+
+def best_of(func, repeats=REPEATS):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def record(results, name, rows, seconds, **extra):
+    entry = {'name': name, 'rows': rows, 'seconds': seconds, **extra}
+    results.append(entry)
+    detail = ' '.join(f"{key}={value}" for key, value in extra.items())
+    print(f"{rows:>10,}  {name:<34} {seconds * 1000:11.2f} ms  {detail}")
+
+
+def bench_analysis(results, rows, workdir):
+    analyzer = BusinessAnalyzer()
+    if rows > STREAMING_ROWS:
+        start = time.perf_counter()
+        raw_path = write_listings_csv(os.path.join(workdir, 'raw_listings.csv'), rows)
+        record(results, 'generate_csv', rows, time.perf_counter() - start)
+        start = time.perf_counter()
+        analyzer.analyze_streaming(raw_path)
+        record(results, 'analyze_streaming', rows, time.perf_counter() - start)
+        return generate_listings(min(rows, DIFFICULTY_ROWS))
+
+    start = time.perf_counter()
+    df = generate_listings(rows)
+    record(results, 'generate', rows, time.perf_counter() - start)
+    repeats = 3 if rows <= 100_000 else 1
+    _, seconds = best_of(lambda: analyzer.analyze_turnaround_potential(df), repeats)
+    record(results, 'analyze_turnaround_potential', rows, seconds, per_row_us=round(seconds / rows * 1e6, 3))
+    return df
+
+
+def bench_difficulty(results, rows, df):
+    analyzer = BusinessAnalyzer()
+    sample = df.head(DIFFICULTY_ROWS)
+    features = sample.copy()
+    analyzer._compute_features(features)
+    records = features.to_dict('records')
+    n = len(records)
+
+    _, seconds = best_of(lambda: [analyzer._calculate_difficulty(row) for row in records], 3)
+    record(results, '_calculate_difficulty', rows, seconds, sample=n, per_row_us=round(seconds / n * 1e6, 3))
+    _, seconds = best_of(lambda: scoring.difficulty(
+        features['price'].values, features['declining_revenue'].values, features['management_issues'].values,
+        features['price_drop'].values, features['prime_location'].values))
+    record(results, 'scoring.difficulty', rows, seconds, sample=n, per_row_us=round(seconds / n * 1e6, 4))
+
+
+def bench_parsing(results, rows, df):
+    sample = df.head(PARSE_CARDS)
+    pages = [render_search_page(sample.iloc[start:start + CARDS_PER_PAGE], page=i + 1)
+             for i, start in enumerate(range(0, len(sample), CARDS_PER_PAGE))]
+    expected = sample.to_dict('records')
+    for cls in PARSERS.values():
+        if hasattr(cls, 'available') and not cls.available():
+            continue
+        parser = cls()
+        parsed, seconds = best_of(lambda: [listing for page in pages for listing in parser.parse(page)], 3)
+        if parsed != expected:
+            raise AssertionError(f"{parser.name} did not recover the generated listings")
+        record(results, f'parse_cards[{parser.name}]', rows, seconds, pages=len(pages),
+               ms_per_page=round(seconds / len(pages) * 1000, 3))
+
+
+def bench_endpoints(results, rows):
+    # Imported here: the app sets itself up relative to the scratch directory
+    import app as webapp
+
+    client = webapp.app.test_client()
+    listing_id = webapp.dataset_cache.get(columns=['listing_id'])['listing_id'].iloc[0]
+    endpoints = list(ENDPOINTS)
+    if rows <= FULL_RESULTS_MAX_ROWS:
+        endpoints.extend(FULL_RESULTS_ENDPOINTS)
+
+    for name, url in endpoints:
+        url = url.format(listing_id=listing_id)
+
+        def get():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise AssertionError(f"{url} returned {response.status_code}")
+            # Streamed responses are only produced as the body is read
+            response.get_data()
+            return response
+
+        webapp.dataset_cache.invalidate()
+        webapp.api_cache.clear()
+        start = time.perf_counter()
+        response = get()
+        cold = time.perf_counter() - start
+
+        uncached = []
+        for _ in range(REPEATS):
+            webapp.api_cache.clear()
+            start = time.perf_counter()
+            get()
+            uncached.append(time.perf_counter() - start)
+
+        cached = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            get()
+            cached.append(time.perf_counter() - start)
+
+        record(results, f'endpoint[{name}]', rows, statistics.median(uncached),
+               cold_ms=round(cold * 1000, 3), cached_ms=round(statistics.median(cached) * 1000, 3),
+               bytes=len(response.get_data()))
+
+
+def bench_startup(results, rows, workdir):
+    for mode, timings in startup_benchmark.measure(workdir).items():
+        record(results, f'startup[{mode}]', rows, timings['total_seconds'],
+               import_ms=round(timings['import_seconds'] * 1000, 3),
+               first_request_ms=round(timings['first_request_seconds'] * 1000, 3))
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    from analysis.dataset import STORAGE
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'dataset_format': STORAGE.name,
+    }
+
+
+def main(sizes):
+    meta = environment()
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='turnaround-bench-') as workdir:
+        os.chdir(workdir)
+        try:
+            for rows in sizes:
+                df = bench_analysis(results, rows, workdir)
+                bench_difficulty(results, rows, df)
+                bench_parsing(results, rows, df)
+                bench_endpoints(results, rows)
+                bench_startup(results, rows, workdir)
+        finally:
+            os.chdir(cwd)
+
+    output = os.environ.get('BENCHMARK_OUTPUT') or os.path.join(
+        RESULTS_DIR, f"{meta['timestamp'].replace(':', '')}-{meta['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'meta': meta, 'sizes': sizes, 'results': results}, f, indent=2)
+    print(f"Results written to {output}")
+    return output
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,149 @@
+# benchmarks/synthetic.py
+"""
+Synthetic business listings for benchmarks: realistic titles, locations,
+log-normal prices with correlated cash flow, and descriptions that mix
+neutral sentences with the phrases the signal rules look for. Generation
+is vectorized, so millions of rows take seconds; larger datasets can be
+written to CSV chunk by chunk.
+"""
+import html
+
+import numpy as np
+import pandas as pd
+
+from scrapers.parsers import LISTING_BASE_URL
+
+BUSINESS_TYPES = [
+    'Restaurant', 'Laundromat', 'Dental Practice', 'Auto Repair Shop', 'Bakery', 'Coffee Shop',
+    'Fitness Studio', 'Car Wash', 'Daycare Center', 'Landscaping Company', 'Plumbing Business',
+    'HVAC Contractor', 'Manufacturing Business', 'E-commerce Store', 'Software Agency', 'Pet Grooming Salon',
+    'Liquor Store', 'Pizza Franchise', 'Dry Cleaner', 'Hair Salon', 'Convenience Store', 'Print Shop',
+    'Cleaning Service', 'Moving Company', 'Veterinary Clinic', 'Brewery', 'Hotel', 'Gas Station',
+]
+QUALIFIERS = ['Profitable', 'Established', 'Struggling', 'Turnkey', 'Family-Owned', 'Growing',
+              'Absentee-Run', 'Award-Winning', 'Underperforming', 'Semi-Absentee']
+TAGLINES = ['Priced to Sell', 'Owner Retiring', 'Great Opportunity', 'Real Estate Included',
+            'SBA Pre-Qualified', 'Seller Financing Available', 'Below Market Value']
+LOCATIONS = [
+    'Seattle, WA', 'Portland, OR', 'Chicago, IL', 'Dallas, TX', 'Austin, TX', 'Boston, MA',
+    'Denver, CO', 'Phoenix, AZ', 'Atlanta, GA', 'Miami, FL', 'Tampa, FL', 'Nashville, TN',
+    'San Diego, CA', 'Los Angeles, CA', 'Sacramento, CA', 'Las Vegas, NV', 'Salt Lake City, UT',
+    'Minneapolis, MN', 'Columbus, OH', 'Charlotte, NC', 'Raleigh, NC', 'Philadelphia, PA',
+    'Pittsburgh, PA', 'New York, NY', 'Buffalo, NY', 'Kansas City, MO', 'St. Louis, MO',
+    'Detroit, MI', 'Milwaukee, WI', 'Online Business',
+]
+OPENERS = [
+    'Well-known {type} serving the community for over 15 years.',
+    'Turnkey {type} with trained staff and loyal repeat customers.',
+    'Established {type} with modern equipment and a long lease.',
+    '{type} with strong online reviews and steady foot traffic.',
+    'Owner-operated {type} with room to expand services.',
+    'Recently renovated {type} with recurring contracts.',
+]
+CLOSERS = [
+    'Great opportunity for an experienced operator.',
+    'Training and transition support included.',
+    'Financials available after signing an NDA.',
+    'Ideal for a first-time buyer or an add-on acquisition.',
+    'Owner retiring after many years in the business.',
+    '',
+]
+# Sentences that trigger each signal in analysis/signal_rules.json, and how often they appear
+SIGNAL_SENTENCES = {
+    'price_drop': (0.25, ['Price reduced for a quick sale.', 'Motivated seller!',
+                          'Recent price drop of 15%.', 'Offered at a discount to recent comparables.']),
+    'urgency_signal': (0.15, ['Must sell due to health issues.', 'Urgent sale - relocating out of state.',
+                              'Seller needs a quick sale.']),
+    'declining_revenue': (0.25, ['Showing declining revenue since 2022.', 'Sales decreasing over the last two years.',
+                                 'Hit by a local downturn but recovering.', 'Reduced revenue after losing a key account.']),
+    'management_issues': (0.2, ['Currently absentee owned.', 'Poorly managed with high staff turnover.',
+                                'Understaffed and missing growth opportunities.',
+                                'Management issues have hurt margins.']),
+    'prime_location': (0.2, ['Prime location on a busy corner.', 'High traffic retail strip.',
+                             'Located in a busy area near downtown.', 'Popular neighborhood with new development.']),
+}
+MEDIAN_PRICE = 350_000
+ZERO_PRICE_SHARE = 0.005
+
+
+def _pick(options, rng, rows):
+    return np.asarray(options, dtype=object)[rng.integers(len(options), size=rows)]
+
+
+def _capitalize(text):
+    return text[:1].upper() + text[1:]
+
+
+# Every opener filled in with every business type
+OPENING_SENTENCES = np.array([_capitalize(opener.format(type=kind.lower()))
+                              for opener in OPENERS for kind in BUSINESS_TYPES], dtype=object)
+
+
+def generate_listings(rows, seed=0, start=0):
+    """
+    `rows` scraper-shaped listings (title, price, revenue, description,
+    location, url). `start` offsets the listing numbers used in the URLs,
+    so chunks generated with different starts never share a listing.
+    """
+    rng = np.random.default_rng(seed)
+    type_codes = rng.integers(len(BUSINESS_TYPES), size=rows)
+    types = np.asarray(BUSINESS_TYPES, dtype=object)[type_codes]
+    locations = _pick(LOCATIONS, rng, rows)
+
+    template = rng.integers(3, size=rows)
+    title = np.where(template == 0, _pick(QUALIFIERS, rng, rows) + ' ' + types,
+                     np.where(template == 1, types + ' in ' + locations,
+                              types + ' - ' + _pick(TAGLINES, rng, rows)))
+
+    description = OPENING_SENTENCES[rng.integers(len(OPENERS), size=rows) * len(BUSINESS_TYPES) + type_codes]
+    for probability, sentences in SIGNAL_SENTENCES.values():
+        present = rng.random(rows) < probability
+        description = np.where(present, description + ' ' + _pick(sentences, rng, rows), description)
+    description = description + _pick([' ' + closer if closer else '' for closer in CLOSERS], rng, rows)
+
+    price = np.round(rng.lognormal(np.log(MEDIAN_PRICE), 0.9, rows), -2).clip(10_000, 25_000_000)
+    revenue = np.round(price * rng.lognormal(np.log(0.35), 0.6, rows), -2)
+    price[rng.random(rows) < ZERO_PRICE_SHARE] = 0
+
+    return pd.DataFrame({
+        'title': title,
+        'price': price.astype(np.int64),
+        'revenue': revenue.astype(np.int64),
+        'description': description,
+        'location': locations,
+        'url': [f"{LISTING_BASE_URL}/business-opportunity/{n}/" for n in range(start, start + rows)],
+    })
+
+
+def iter_listings(rows, chunksize=500_000, seed=0):
+    """generate_listings() in chunks, for datasets that should not be built in memory at once"""
+    for start in range(0, rows, chunksize):
+        yield generate_listings(min(chunksize, rows - start), seed=seed + start, start=start)
+
+
+def write_listings_csv(path, rows, chunksize=500_000, seed=0):
+    """Write `rows` synthetic listings to a raw listings CSV"""
+    for i, chunk in enumerate(iter_listings(rows, chunksize, seed)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+
+def render_search_page(listings, page=1):
+    """A search results page in the card markup the scraper parses (see benchmarks/fixtures)"""
+    cards = []
+    for n, listing in enumerate(listings.itertuples(index=False)):
+        path = listing.url[len(LISTING_BASE_URL):]
+        cards.append(
+            f'<div class="card card--result" data-id="{page * 1000 + n}"><div class="card-body">'
+            f'<h2 class="card-title"><a href="{html.escape(path)}">{html.escape(listing.title)}</a></h2>'
+            f'<p class="card-location">{html.escape(listing.location)}</p>'
+            f'<div class="card-description">\n{html.escape(listing.description)}\n</div>'
+            f'<div class="financials"><div class="price">${listing.price:,}</div>'
+            f'<div class="fact">Gross Revenue: ${listing.revenue * 3:,}</div>'
+            f'<div class="fact">Cash Flow: ${listing.revenue:,}</div></div>'
+            f'</div></div>'
+        )
+    body = '\n'.join(cards)
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+            f'<title>Businesses For Sale - Page {page}</title></head><body>'
+            f'<main class="search-results">\n{body}\n</main></body></html>').encode('utf-8')
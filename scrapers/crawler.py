@@ -0,0 +1,276 @@
+# scrapers/crawler.py
+import csv
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from analysis import metrics
+
+logger = logging.getLogger(__name__)
+
+BIZBUYSELL_URL = 'https://www.bizbuysell.com/businesses-for-sale/'
+
+LISTING_FIELDS = ['title', 'price', 'revenue', 'description', 'location', 'url']
+
+FETCH_SECONDS = metrics.histogram('scraper_fetch_seconds', 'Time to fetch a result page (after rate limiting)')
+PARSE_SECONDS = metrics.histogram('scraper_parse_seconds', 'Time to parse the listing cards of a result page')
+PAGES = metrics.counter('scraper_pages_total', 'Result pages crawled', ['result'])
+PAGE_ERRORS = metrics.counter('crawl_page_errors_total', 'Result pages that failed after retries, by error',
+                              ['error'])
+LISTINGS = metrics.counter('scraper_listings_total', 'Listings found by the crawler')
+BYTES = metrics.counter('scraper_downloaded_bytes_total', 'Response bytes downloaded by the crawler')
+PAGES_PER_SECOND = metrics.gauge('scraper_pages_per_second', 'Pages fetched per second by the last crawl')
+
+
+class RateLimiter:
+    """Spaces out requests to each host to at most `requests_per_second`"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CrawlEngine:
+    """
+    Walks paginated search result pages with a thread pool over one pooled
+    keep-alive session. Pages are fetched through a bounded in-flight window,
+    each host is rate limited, and transient failures are retried with
+    exponential backoff. Parsed listings are handed to a sink page by page.
+    With a ResponseCache, pages are revalidated with conditional requests
+    and only re-parsed when their content actually changed.
+    """
+
+    def __init__(self, parse, base_url=BIZBUYSELL_URL, headers=None, concurrency=4,
+                 requests_per_second=2.0, retries=3, backoff_factor=0.5, timeout=15,
+                 session=None, cache=None, parser_name=None):
+        self.parse = parse
+        self.cache = cache
+        self.parser_name = parser_name
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.session = session or self._make_session(headers, retries, backoff_factor)
+
+        self._lock = threading.Lock()
+        self.pages_fetched = 0
+        self.pages_failed = 0
+        self.listings_found = 0
+        self.bytes_downloaded = 0
+        self.elapsed_seconds = 0.0
+        self.fetch_seconds = 0.0
+        self.parse_seconds = 0.0
+
+    def _make_session(self, headers, retries, backoff_factor):
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=('GET',),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=4,
+                              pool_maxsize=max(self.concurrency, 1))
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def page_url(self, page):
+        """URL of a search results page (page 1 is the base URL)"""
+        if page == 1:
+            return self.base_url
+        return f"{self.base_url.rstrip('/')}/{page}/"
+
+    def fetch(self, url, headers=None):
+        """GET a page through the rate limiter; returns the response"""
+        self.rate_limiter.wait(urlsplit(url).netloc)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            size = len(response.content)
+        finally:
+            elapsed = time.perf_counter() - start
+            FETCH_SECONDS.observe(value=elapsed)
+            with self._lock:
+                self.fetch_seconds += elapsed
+        BYTES.inc(amount=size)
+        with self._lock:
+            self.bytes_downloaded += size
+        return response
+
+    def _parse(self, body):
+        start = time.perf_counter()
+        try:
+            return self.parse(body)
+        finally:
+            elapsed = time.perf_counter() - start
+            PARSE_SECONDS.observe(value=elapsed)
+            with self._lock:
+                self.parse_seconds += elapsed
+
+    def _crawl_page(self, page):
+        url = self.page_url(page)
+        headers = self.cache.conditional_headers(url) if self.cache else None
+        try:
+            response = self.fetch(url, headers=headers)
+        except requests.HTTPError as e:
+            # A missing page means we ran past the end of the results
+            if e.response is not None and e.response.status_code == 404:
+                return []
+            raise
+
+        if self.cache is None:
+            return self._parse(response.content)
+
+        if response.status_code == 304:
+            body, listings = self.cache.not_modified(url, self.parser_name)
+            if listings is not None:
+                return listings
+            if body is None:
+                # Validators were sent but the entry has since been evicted
+                self.cache.record_miss()
+                response = self.fetch(url)
+        else:
+            body = None
+            listings = self.cache.unchanged_listings(url, response.content, self.parser_name)
+            if listings is not None:
+                return listings
+            self.cache.record_miss()
+
+        body = response.content if body is None else body
+        listings = self._parse(body)
+        self.cache.store(url, body,
+                         etag=response.headers.get('ETag'),
+                         last_modified=response.headers.get('Last-Modified'),
+                         listings=listings,
+                         parser_name=self.parser_name)
+        return listings
+
+    def crawl(self, max_pages=10, sink=None):
+        """
+        Crawl pages 1..max_pages, stopping at the first page without listings.
+        Each page's listings are passed to sink(listings) as soon as it is parsed.
+        Returns the number of listings found.
+        """
+        start = time.perf_counter()
+        last_page = max_pages
+        next_page = 1
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while in_flight or next_page <= last_page:
+                # Keep at most `concurrency` pages in flight
+                while next_page <= last_page and len(in_flight) < self.concurrency:
+                    in_flight[pool.submit(self._crawl_page, next_page)] = next_page
+                    next_page += 1
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = in_flight.pop(future)
+                    try:
+                        listings = future.result()
+                    except Exception as e:
+                        logger.warning("Error crawling page %d", page, exc_info=True)
+                        PAGE_ERRORS.inc(type(e).__name__)
+                        PAGES.inc('failed')
+                        with self._lock:
+                            self.pages_failed += 1
+                        continue
+
+                    PAGES.inc('fetched')
+                    with self._lock:
+                        self.pages_fetched += 1
+                    if not listings:
+                        # Past the last page of results
+                        last_page = min(last_page, page - 1)
+                        continue
+                    if page > last_page:
+                        continue
+                    LISTINGS.inc(amount=len(listings))
+                    with self._lock:
+                        self.listings_found += len(listings)
+                    if sink is not None:
+                        sink(listings)
+
+        self.elapsed_seconds = time.perf_counter() - start
+        PAGES_PER_SECOND.set(value=self.stats()['pages_per_second'])
+        if self.cache is not None:
+            self.cache.flush()
+        return self.listings_found
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'pages_fetched': self.pages_fetched,
+                'pages_failed': self.pages_failed,
+                'listings_found': self.listings_found,
+                'bytes_downloaded': self.bytes_downloaded,
+                'elapsed_seconds': self.elapsed_seconds,
+                'fetch_seconds': self.fetch_seconds,
+                'parse_seconds': self.parse_seconds,
+                'pages_per_second': (self.pages_fetched / self.elapsed_seconds
+                                     if self.elapsed_seconds else 0.0),
+            }
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+
+class CsvListingSink:
+    """
+    Appends listings to a CSV file as they arrive.
+    Rows go to a temporary file that replaces `path` when the sink is closed,
+    so an interrupted crawl never leaves a truncated listings file behind.
+    """
+
+    def __init__(self, path, fields=LISTING_FIELDS):
+        self.path = path
+        self.fields = fields
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def __call__(self, listings):
+        with self._lock:
+            self._writer.writerows(listings)
+            self._file.flush()
+            self.rows += len(listings)
+
+    def close(self, publish=True):
+        self._file.close()
+        if publish:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(publish=exc_type is None)
+        return False
@@ -0,0 +1,200 @@
+# scrapers/http_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join('data', 'http_cache')
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of fetched pages keyed by URL.
+
+    Each entry keeps the response body, its ETag/Last-Modified validators,
+    a content hash and the listings parsed from it, so a later crawl can
+    send a conditional request and skip parsing when the server answers
+    304 or returns identical content. Total size is capped, evicting the
+    least recently used entries first.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # url -> metadata, least recently used first
+        self._dirty = False
+        self.total_bytes = 0
+
+        # Statistics
+        self.hits = 0           # pages whose listings came from the cache, without parsing
+        self.unchanged = 0      # pages confirmed unchanged: 304 Not Modified, or 200 with the same content
+        self.misses = 0         # new or changed pages
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.directory, 'index.json')
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for entry in entries:
+            if os.path.exists(self._file(entry['key'], '.body')):
+                self._entries[entry['url']] = entry
+                self.total_bytes += entry['size']
+
+    def _file(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a cached URL"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return {}
+            headers = {}
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def _touch(self, url):
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+            self._dirty = True
+        return entry
+
+    def _read_listings(self, entry, parser_name):
+        if entry.get('parser') != parser_name:
+            return None
+        try:
+            with open(self._file(entry['key'], '.listings.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def not_modified(self, url, parser_name):
+        """
+        Record a 304 for `url`. Returns (body, listings) from the cache;
+        listings is None if they were parsed with a different parser.
+        """
+        with self._lock:
+            entry = self._touch(url)
+            if entry is None:
+                return None, None
+            self.unchanged += 1
+            with open(self._file(entry['key'], '.body'), 'rb') as f:
+                body = f.read()
+            listings = self._read_listings(entry, parser_name)
+            if listings is not None:
+                self.hits += 1
+            return body, listings
+
+    def unchanged_listings(self, url, body, parser_name):
+        """Cached listings if `body` is identical to the cached page, else None"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry['hash'] != content_hash(body):
+                return None
+            listings = self._read_listings(entry, parser_name)
+            if listings is not None:
+                self._touch(url)
+                self.unchanged += 1
+                self.hits += 1
+            return listings
+
+    def store(self, url, body, etag=None, last_modified=None, listings=None, parser_name=None):
+        """Save a fetched page (and optionally its parsed listings)"""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        listings_json = json.dumps(listings) if listings is not None else None
+        size = len(body) + (len(listings_json) if listings_json else 0)
+        body_hash = content_hash(body)
+
+        with self._lock:
+            previous = self._entries.pop(url, None)
+            if previous is not None:
+                self.total_bytes -= previous['size']
+                if previous['hash'] == body_hash:
+                    # Same content (e.g. re-parsed after a 304): keep the validators
+                    etag = etag or previous.get('etag')
+                    last_modified = last_modified or previous.get('last_modified')
+
+            with open(self._file(key, '.body'), 'wb') as f:
+                f.write(body)
+            listings_path = self._file(key, '.listings.json')
+            if listings_json is not None:
+                with open(listings_path, 'w') as f:
+                    f.write(listings_json)
+            elif os.path.exists(listings_path):
+                os.remove(listings_path)
+
+            self._entries[url] = {
+                'url': url,
+                'key': key,
+                'etag': etag,
+                'last_modified': last_modified,
+                'hash': body_hash,
+                'parser': parser_name if listings_json is not None else None,
+                'size': size,
+                'stored_at': time.time(),
+            }
+            self.total_bytes += size
+            self._dirty = True
+            self._evict()
+
+    def record_miss(self):
+        """Count a page that was new or changed since it was cached"""
+        with self._lock:
+            self.misses += 1
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            url, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry['size']
+            self.evictions += 1
+            for suffix in ('.body', '.listings.json'):
+                try:
+                    os.remove(self._file(entry['key'], suffix))
+                except FileNotFoundError:
+                    pass
+
+    def flush(self):
+        """Persist the index (entries are written least recently used first)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._entries.values()), f)
+            os.replace(tmp_path, self._index_path)
+            self._dirty = False
+
+    def stats(self):
+        with self._lock:
+            requests_seen = self.unchanged + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'unchanged': self.unchanged,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests_seen if requests_seen else 0.0,
+            }
@@ -0,0 +1,192 @@
+# scrapers/parsers.py
+import logging
+import os
+import re
+
+from analysis import metrics
+
+logger = logging.getLogger(__name__)
+
+LISTING_BASE_URL = 'https://www.bizbuysell.com'
+
+NUMBER_PATTERN = re.compile(r'[\d,]+')
+
+PARSE_ERRORS = metrics.counter('scraper_listing_parse_errors_total', 'Listing cards that could not be parsed',
+                               ['parser'])
+
+
+def extract_price(text):
+    """Extract numeric price from text like '$100,000'"""
+    if not text:
+        return 0
+    numbers = NUMBER_PATTERN.findall(text)
+    if numbers:
+        return int(numbers[0].replace(',', ''))
+    return 0
+
+
+def extract_value(fact_texts, label, default="0"):
+    """Extract the number following `label` from the first fact that contains it"""
+    for text in fact_texts:
+        if label in text:
+            numbers = NUMBER_PATTERN.findall(text.replace(label, ''))
+            if numbers:
+                return int(numbers[0].replace(',', ''))
+    return int(default)
+
+
+def make_listing(title, href, description, price_text, location, fact_texts):
+    return {
+        'title': title,
+        'price': extract_price(price_text),
+        'revenue': extract_value(fact_texts, 'Cash Flow:', '0'),
+        'description': description,
+        'location': location,
+        'url': f"{LISTING_BASE_URL}{href}" if href is not None else ""
+    }
+
+
+class BeautifulSoupCardParser:
+    """Reference parser using BeautifulSoup's html.parser (pure Python fallback)"""
+    name = 'bs4'
+
+    def parse(self, html):
+        from bs4 import BeautifulSoup
+
+        businesses = []
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Find business listings
+        for listing in soup.select('div.card.card--result'):
+            try:
+                title_elem = listing.select_one('h2.card-title')
+                title = title_elem.text.strip() if title_elem else "Unknown"
+
+                link_elem = title_elem.find('a') if title_elem else None
+                href = link_elem['href'] if link_elem and 'href' in link_elem.attrs else None
+
+                desc_elem = listing.select_one('div.card-description')
+                description = desc_elem.text.strip() if desc_elem else ""
+
+                price_elem = listing.select_one('div.price')
+                price_text = price_elem.text.strip() if price_elem else "0"
+
+                location_elem = listing.select_one('p.card-location')
+                location = location_elem.text.strip() if location_elem else "Unknown"
+
+                facts = [element.text for element in listing.find_all('div', class_='fact')]
+
+                businesses.append(make_listing(title, href, description, price_text, location, facts))
+            except Exception:
+                logger.warning("Error parsing listing card with %s", self.name, exc_info=True)
+                PARSE_ERRORS.inc(self.name)
+
+        return businesses
+
+
+def _has_class(element, name):
+    return name in (element.get('class') or '').split()
+
+
+class LxmlCardParser:
+    """
+    libxml2-based parser. Each card's fields are resolved in a single walk
+    over its descendants instead of one CSS query per field.
+    """
+    name = 'lxml'
+
+    CARD_XPATH = (
+        "//div[contains(concat(' ', normalize-space(@class), ' '), ' card ')"
+        " and contains(concat(' ', normalize-space(@class), ' '), ' card--result ')]"
+    )
+
+    @staticmethod
+    def available():
+        try:
+            import lxml.html  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @staticmethod
+    def _decode(html):
+        if isinstance(html, str):
+            return html
+        try:
+            return html.decode('utf-8')
+        except UnicodeDecodeError:
+            return html.decode('windows-1252', errors='replace')
+
+    def parse(self, html):
+        import lxml.html
+
+        businesses = []
+        text = self._decode(html)
+        if not text.strip():
+            return businesses
+        root = lxml.html.document_fromstring(text)
+
+        for listing in root.xpath(self.CARD_XPATH):
+            try:
+                title_elem = desc_elem = price_elem = location_elem = None
+                facts = []
+
+                # One pass over the card, keeping the first match for each field
+                for element in listing.iterdescendants():
+                    tag = element.tag
+                    if not isinstance(tag, str):
+                        continue  # comments and processing instructions
+                    if tag == 'div':
+                        if _has_class(element, 'fact'):
+                            facts.append(element.text_content())
+                        if desc_elem is None and _has_class(element, 'card-description'):
+                            desc_elem = element
+                        if price_elem is None and _has_class(element, 'price'):
+                            price_elem = element
+                    elif tag == 'h2':
+                        if title_elem is None and _has_class(element, 'card-title'):
+                            title_elem = element
+                    elif tag == 'p':
+                        if location_elem is None and _has_class(element, 'card-location'):
+                            location_elem = element
+
+                title = title_elem.text_content().strip() if title_elem is not None else "Unknown"
+
+                href = None
+                if title_elem is not None:
+                    link_elem = next(title_elem.iterdescendants('a'), None)
+                    if link_elem is not None:
+                        href = link_elem.get('href')
+
+                description = desc_elem.text_content().strip() if desc_elem is not None else ""
+                price_text = price_elem.text_content().strip() if price_elem is not None else "0"
+                location = location_elem.text_content().strip() if location_elem is not None else "Unknown"
+
+                businesses.append(make_listing(title, href, description, price_text, location, facts))
+            except Exception:
+                logger.warning("Error parsing listing card with %s", self.name, exc_info=True)
+                PARSE_ERRORS.inc(self.name)
+
+        return businesses
+
+
+PARSERS = {
+    BeautifulSoupCardParser.name: BeautifulSoupCardParser,
+    LxmlCardParser.name: LxmlCardParser,
+}
+
+
+def get_parser(name=None):
+    """
+    Return the card parser named by `name` or the SCRAPER_PARSER environment
+    variable. Defaults to lxml when installed, falling back to BeautifulSoup.
+    """
+    name = name or os.environ.get('SCRAPER_PARSER')
+    if name is None:
+        name = LxmlCardParser.name if LxmlCardParser.available() else BeautifulSoupCardParser.name
+    if name == LxmlCardParser.name and not LxmlCardParser.available():
+        logger.warning("lxml is not installed, falling back to BeautifulSoup")
+        name = BeautifulSoupCardParser.name
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser: {name}")
+    return PARSERS[name]()
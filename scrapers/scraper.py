@@ -1,106 +1,89 @@
 # scrapers/scraper.py
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import time
 import re
 import json
+import logging
 import os
 
+from scrapers.parsers import get_parser, extract_price, extract_value
+
+logger = logging.getLogger(__name__)
+
 class BusinessScraper:
-    def __init__(self):
+    def __init__(self, parser=None):
+        # HTML card parser backend (lxml when available, BeautifulSoup otherwise)
+        self.parser = get_parser(parser)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         # Create data directory if it doesn't exist
         os.makedirs('data', exist_ok=True)
     
-    def scrape_bizbuysell_sample(self):
+    def scrape_bizbuysell_sample(self, max_pages=1, **engine_options):
         """
-        This is a simplified demonstration scraper.
-        In a real application, you would implement proper pagination and error handling.
+        Scrape the first page(s) of BizBuySell search results into
+        data/raw_listings.csv through the crawl engine (rate limited, with
+        retries and the response cache). Returns an empty DataFrame if
+        nothing could be fetched; see crawl() for the options.
         
         Note: Always check terms of service before scraping any website.
         """
-        businesses = []
+        try:
+            return self.crawl(max_pages=max_pages, **engine_options)
+        except Exception:
+            logger.exception("Error scraping data")
+            return pd.DataFrame()
+    
+    def crawl(self, max_pages=10, output_path='data/raw_listings.csv', cache=True, **engine_options):
+        """
+        Crawl paginated search results concurrently and stream the parsed
+        listings to `output_path` as each page arrives. A crawl in which
+        every page failed leaves `output_path` as it was and returns an
+        empty DataFrame.
+        `cache` is True (use data/http_cache), False, or a ResponseCache.
+        Extra keyword arguments are passed to CrawlEngine (base_url,
+        concurrency, requests_per_second, retries, ...).
+        """
+        # Imported here to keep the crawler optional for the sample-data path
+        from scrapers.crawler import CrawlEngine, CsvListingSink
+        from scrapers.http_cache import ResponseCache
         
-        # For demo purposes, we'll use a sample page
-        # (In a real app, you'd loop through multiple pages)
-        url = 'https://www.bizbuysell.com/businesses-for-sale/'
+        if cache is True:
+            cache = self.response_cache = getattr(self, 'response_cache', None) or ResponseCache()
+        engine = CrawlEngine(parse=self.parse_listings, headers=self.headers,
+                             cache=cache or None, parser_name=self.parser.name,
+                             **engine_options)
+        sink = CsvListingSink(output_path)
+        try:
+            engine.crawl(max_pages=max_pages, sink=sink)
+        except BaseException:
+            sink.close(publish=False)
+            raise
+        self.last_crawl_stats = engine.stats()
+        if sink.rows == 0 and engine.pages_failed:
+            # Every page failed: keep the listings from the last good crawl
+            sink.close(publish=False)
+            return pd.DataFrame()
+        sink.close()
         
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find business listings
-            listings = soup.select('div.card.card--result')
-            
-            for listing in listings[:10]:  # Limit to first 10 for demo
-                try:
-                    # Extract basic info (adjust selectors based on actual structure)
-                    title_elem = listing.select_one('h2.card-title')
-                    title = title_elem.text.strip() if title_elem else "Unknown"
-                    
-                    link_elem = title_elem.find('a') if title_elem else None
-                    link = f"https://www.bizbuysell.com{link_elem['href']}" if link_elem and 'href' in link_elem.attrs else ""
-                    
-                    desc_elem = listing.select_one('div.card-description')
-                    description = desc_elem.text.strip() if desc_elem else ""
-                    
-                    # Extract price and financials
-                    price_elem = listing.select_one('div.price')
-                    price_text = price_elem.text.strip() if price_elem else "0"
-                    price = self._extract_price(price_text)
-                    
-                    # Extract location
-                    location_elem = listing.select_one('p.card-location')
-                    location = location_elem.text.strip() if location_elem else "Unknown"
-                    
-                    # Extract other financial data if available
-                    revenue = self._extract_value(listing, 'Cash Flow:', '0')
-                    
-                    business = {
-                        'title': title,
-                        'price': price,
-                        'revenue': revenue,
-                        'description': description,
-                        'location': location,
-                        'url': link
-                    }
-                    businesses.append(business)
-                    
-                except Exception as e:
-                    print(f"Error parsing listing: {e}")
-            
-            # Save data to file
-            df = pd.DataFrame(businesses)
-            df.to_csv('data/raw_listings.csv', index=False)
-            return df
-            
-        except Exception as e:
-            print(f"Error scraping data: {e}")
+            return pd.read_csv(output_path)
+        except pd.errors.EmptyDataError:
             return pd.DataFrame()
     
+    def parse_listings(self, html):
+        """Parse every listing card on a search results page"""
+        return self.parser.parse(html)
+    
     def _extract_price(self, text):
         """Extract numeric price from text like '$100,000'"""
-        if not text:
-            return 0
-        numbers = re.findall(r'[\d,]+', text)
-        if numbers:
-            return int(numbers[0].replace(',', ''))
-        return 0
+        return extract_price(text)
     
     def _extract_value(self, listing, label, default="0"):
-        """Extract a value from a label in the listing"""
-        elements = listing.find_all('div', class_='fact')
-        for element in elements:
-            if label in element.text:
-                value_text = element.text.replace(label, '')
-                numbers = re.findall(r'[\d,]+', value_text)
-                if numbers:
-                    return int(numbers[0].replace(',', ''))
-        return int(default)
+        """Extract a value from a label in a BeautifulSoup listing card"""
+        facts = [element.text for element in listing.find_all('div', class_='fact')]
+        return extract_value(facts, label, default)
 
     def load_sample_data(self):
         """For testing: load sample data or generate it if not available"""
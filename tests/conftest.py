@@ -0,0 +1,40 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory with a data/ folder, as the app expects"""
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def use_storage(workdir, monkeypatch):
+    """
+    use_storage(storage) points the analyzer and the shared dataset cache at
+    `storage` in the working directory and returns the dataset path
+    """
+    from analysis import analyzer
+    from analysis.dataset import dataset_cache
+    from analysis.storage import dataset_path
+
+    def use(storage):
+        path = dataset_path(storage)
+        monkeypatch.setattr(analyzer, 'STORAGE', storage)
+        monkeypatch.setattr(analyzer, 'ANALYZED_LISTINGS_PATH', path)
+        monkeypatch.setattr(dataset_cache, 'storage', storage)
+        monkeypatch.setattr(dataset_cache, 'path', path)
+        monkeypatch.setattr(dataset_cache, '_migrated', True)
+        dataset_cache.invalidate()
+        return path
+    yield use
+    dataset_cache.invalidate()
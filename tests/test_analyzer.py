@@ -0,0 +1,147 @@
+# tests/test_analyzer.py
+import os
+
+import pandas as pd
+import pytest
+
+from analysis.analyzer import BusinessAnalyzer
+from analysis.dataset import dataset_cache
+from analysis.listing_ids import listing_ids
+from analysis.sqlite_store import ListingStore
+from analysis.storage import CsvStorage, ParquetStorage, SqliteStorage, apply_schema
+from benchmarks.synthetic import generate_listings
+
+FORMATS = [CsvStorage, SqliteStorage, pytest.param(ParquetStorage, marks=pytest.mark.skipif(
+    not ParquetStorage.available(), reason='pyarrow is not installed'))]
+
+
+@pytest.fixture(params=FORMATS)
+def storage(request, use_storage):
+    storage = request.param()
+    return storage, use_storage(storage)
+
+
+def refreshed(listings):
+    """The next scrape: a few listings gone and edited, a few new ones at the end"""
+    listings = listings.drop(index=[3, 40, 41]).reset_index(drop=True)
+    listings.loc[[5, 60], 'description'] += ' Owner retiring, motivated seller.'
+    listings.loc[7, 'price'] += 5000
+    return pd.concat([listings, generate_listings(8, seed=1, start=len(listings) + 10)], ignore_index=True)
+
+
+def stored(storage, path):
+    return apply_schema(storage.read(path))
+
+
+def test_incremental_matches_a_full_run(storage):
+    storage, path = storage
+    base = generate_listings(120)
+    update = refreshed(base)
+    expected = apply_schema(BusinessAnalyzer().analyze_turnaround_potential(update))
+
+    BusinessAnalyzer().analyze_turnaround_potential(base)
+    dataset_cache.get()
+    result, recomputed = BusinessAnalyzer().analyze_incremental(update)
+
+    assert recomputed == 3 + 8
+    pd.testing.assert_frame_equal(apply_schema(result), expected)
+    pd.testing.assert_frame_equal(stored(storage, path), expected)
+    # The cache serves the new version with values as stored
+    pd.testing.assert_frame_equal(apply_schema(dataset_cache.read_exact()), expected)
+
+
+def test_database_refresh_writes_only_changed_rows(use_storage, monkeypatch):
+    storage = SqliteStorage()
+    path = use_storage(storage)
+    base = generate_listings(120)
+    BusinessAnalyzer().analyze_turnaround_potential(base)
+
+    # Edited titles and relisted copies keep every raw score, and so the
+    # normalization, as it was; dropping the last rows moves no other row
+    update = base.iloc[:-2].copy()
+    update.loc[[4, 50], 'title'] += ' (reduced)'
+    relisted = base.iloc[[10, 11]].assign(url=['https://example.com/new/1', 'https://example.com/new/2'])
+    update = pd.concat([update, relisted], ignore_index=True)
+    written = []
+    original_update = ListingStore.update
+
+    def spy(self, df, positions, removed, rows, version):
+        written.append((sorted(df['title']), list(positions), sorted(removed)))
+        return original_update(self, df, positions, removed, rows, version)
+
+    def full_write(*args):
+        raise AssertionError("the whole dataset was written")
+
+    monkeypatch.setattr(ListingStore, 'update', spy)
+    monkeypatch.setattr(storage, 'write', full_write)
+    result, recomputed = BusinessAnalyzer().analyze_incremental(update)
+
+    titles, positions, removed = written[0]
+    assert recomputed == 4
+    assert positions == [4, 50, 118, 119]
+    assert titles == sorted(result['title'].iloc[positions])
+    assert removed == sorted(listing_ids(base['url'].values[-2:]))
+    pd.testing.assert_frame_equal(stored(storage, path), apply_schema(result))
+
+
+def test_database_changed_meanwhile_is_written_in_full(use_storage, monkeypatch):
+    storage = SqliteStorage()
+    path = use_storage(storage)
+    base = generate_listings(120)
+    BusinessAnalyzer().analyze_turnaround_potential(base)
+    read_exact = dataset_cache.read_exact
+
+    def read_then_replaced(columns=None):
+        previous = read_exact(columns=columns)
+        # Another writer replaces the dataset after the refresh has read it
+        BusinessAnalyzer().analyze_turnaround_potential(base.iloc[:80])
+        return previous
+
+    monkeypatch.setattr(dataset_cache, 'read_exact', read_then_replaced)
+    update = refreshed(base)
+    result, _ = BusinessAnalyzer().analyze_incremental(update)
+
+    assert len(stored(storage, path)) == len(update)
+    pd.testing.assert_frame_equal(stored(storage, path), apply_schema(result))
+
+
+def test_streaming_matches_in_memory_analysis(storage):
+    storage, path = storage
+    listings = generate_listings(250)
+    listings.to_csv('data/raw_listings.csv', index=False)
+    expected = apply_schema(BusinessAnalyzer().analyze_turnaround_potential(listings))
+    dataset_cache.invalidate()
+
+    summary = BusinessAnalyzer().analyze_streaming('data/raw_listings.csv', output_path=path, chunksize=40)
+
+    assert summary['rows'] == 250
+    assert summary['chunks'] == 7
+    pd.testing.assert_frame_equal(stored(storage, path), expected)
+    assert not [name for name in os.listdir('data/snapshots') if name.endswith('.tmp')]
+
+
+def test_streaming_empty_input_writes_to_the_output_path(storage):
+    storage, path = storage
+    BusinessAnalyzer().analyze_turnaround_potential(generate_listings(50))
+    generate_listings(0).to_csv('data/empty.csv', index=False)
+    export_path = 'data/export.csv'
+
+    summary = BusinessAnalyzer().analyze_streaming('data/empty.csv', output_path=export_path)
+
+    assert summary['rows'] == 0
+    export = CsvStorage().read(export_path)
+    assert len(export) == 0
+    assert list(export.columns) == list(stored(storage, path).columns)
+    # The live dataset is left alone
+    assert len(stored(storage, path)) == 50
+
+
+def test_streaming_empty_input_empties_the_live_dataset(storage):
+    storage, path = storage
+    BusinessAnalyzer().analyze_turnaround_potential(generate_listings(50))
+    generate_listings(0).to_csv('data/empty.csv', index=False)
+
+    BusinessAnalyzer().analyze_streaming('data/empty.csv', output_path=path)
+
+    assert len(stored(storage, path)) == 0
+    assert 'turnaround_score' in storage.columns(path)
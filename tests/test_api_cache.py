@@ -0,0 +1,77 @@
+# tests/test_api_cache.py
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, jsonify
+
+from analysis import api_cache
+from analysis.api_cache import ApiResponseCache, cached_response
+from analysis.dataset import DatasetCache
+from analysis.storage import CsvStorage
+
+
+@pytest.fixture
+def dataset_path(workdir):
+    path = str(workdir / 'data' / 'listings.csv')
+    CsvStorage().write(pd.DataFrame({
+        'title': [f'Listing {n}' for n in range(200)],
+        'turnaround_score': np.linspace(100, 0, 200),
+    }), path)
+    return path
+
+
+def worker(path):
+    """A Flask app with its own dataset and response caches, as one worker process holds them"""
+    app = Flask(__name__)
+    dataset_cache = DatasetCache(path=path, storage=CsvStorage(), warm_snapshots=False)
+    app.view_calls = 0
+
+    @app.route('/titles')
+    @cached_response(ApiResponseCache(), dataset_cache)
+    def titles():
+        app.view_calls += 1
+        df = dataset_cache.get()
+        return jsonify({'titles': df['title'].tolist()})
+
+    return app
+
+
+def test_workers_send_the_same_etag(dataset_path):
+    first = worker(dataset_path).test_client().get('/titles?limit=5')
+    second = worker(dataset_path).test_client().get('/titles?limit=5')
+    assert first.status_code == second.status_code == 200
+    assert first.headers['ETag'] == second.headers['ETag']
+
+
+def test_cold_worker_answers_revalidation_without_loading(dataset_path):
+    etag = worker(dataset_path).test_client().get('/titles').headers['ETag']
+
+    cold = worker(dataset_path)
+    response = cold.test_client().get('/titles', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert cold.view_calls == 0
+
+
+def test_gzip_bodies_are_identical_across_workers(dataset_path, monkeypatch):
+    monkeypatch.setattr(api_cache, 'brotli', None)
+    headers = {'Accept-Encoding': 'gzip'}
+    first = worker(dataset_path).test_client().get('/titles', headers=headers)
+    second = worker(dataset_path).test_client().get('/titles', headers=headers)
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert first.data == second.data
+    assert len(json.loads(gzip.decompress(first.data))['titles']) == 200
+
+
+def test_changed_dataset_gets_a_new_etag(dataset_path):
+    client = worker(dataset_path).test_client()
+    etag = client.get('/titles').headers['ETag']
+
+    CsvStorage().write(pd.DataFrame({'title': ['Only listing'], 'turnaround_score': [50.0]}), dataset_path)
+    response = client.get('/titles', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json() == {'titles': ['Only listing']}
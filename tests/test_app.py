@@ -0,0 +1,75 @@
+# tests/test_app.py
+import logging
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import app as app_module
+from analysis.storage import CsvStorage, ParquetStorage, dataset_path
+
+LEGACY_CSV = os.path.join(app_module.app.root_path, 'data', 'analyzed_listings.csv')
+FORMATS = [CsvStorage, pytest.param(ParquetStorage, marks=pytest.mark.skipif(
+    not ParquetStorage.available(), reason='pyarrow is not installed'))]
+
+
+@pytest.fixture(params=FORMATS)
+def client(request, workdir, monkeypatch):
+    """A test client serving the bundled legacy CSV in each file format"""
+    shutil.copy(LEGACY_CSV, workdir / 'data' / 'analyzed_listings.csv')
+    storage = request.param()
+    cache = app_module.dataset_cache
+    monkeypatch.setattr(cache, 'storage', storage)
+    monkeypatch.setattr(cache, 'path', dataset_path(storage))
+    monkeypatch.setattr(cache, '_migrated', False)
+    cache.invalidate()
+    app_module.api_cache.clear()
+    yield app_module.app.test_client()
+    cache.invalidate()
+    app_module.api_cache.clear()
+
+
+def test_legacy_dataset_gets_listing_ids(client):
+    response = client.get('/api/opportunities?min_score=0&fields=title,listing_id')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['count'] == len(pd.read_csv(LEGACY_CSV))
+    ids = [row['listing_id'] for row in data['opportunities']]
+    assert all(len(listing_id) == 16 for listing_id in ids)
+    assert len(set(ids)) == len(ids)
+
+    hashes = client.get('/api/opportunities?min_score=0&fields=content_hash').get_json()['opportunities']
+    assert all(row['content_hash'] for row in hashes)
+
+
+def test_legacy_business_links_resolve(client):
+    listing = client.get('/api/opportunities?min_score=0&limit=1&fields=title,listing_id')
+    listing = listing.get_json()['opportunities'][0]
+
+    response = client.get(f"/business/{listing['listing_id']}")
+    assert response.status_code == 200
+    assert listing['title'] in response.get_data(as_text=True)
+
+    redirect = client.get('/business/0')
+    assert redirect.status_code == 302
+    assert '/business/' in redirect.headers['Location']
+    assert client.get(redirect.headers['Location']).status_code == 200
+
+
+def test_handler_errors_are_logged_and_counted(client, monkeypatch, caplog):
+    def broken(*args, **kwargs):
+        raise RuntimeError("disk on fire")
+    monkeypatch.setattr(app_module.dataset_cache, 'get', broken)
+    counts = lambda: {key: value for _, key, _, value in app_module.HTTP_ERRORS.samples()}
+    before = counts().get(('get_opportunities',), 0)
+
+    with caplog.at_level(logging.ERROR, logger=app_module.app.logger.name):
+        response = client.get('/api/opportunities?min_score=0')
+
+    assert response.status_code == 500
+    assert 'disk on fire' in response.get_json()['message']
+    assert counts()[('get_opportunities',)] == before + 1
+    record, = [record for record in caplog.records if record.levelno == logging.ERROR]
+    assert 'Error getting opportunities' in record.getMessage()
+    assert record.exc_info[0] is RuntimeError
@@ -0,0 +1,106 @@
+# tests/test_charts.py
+import colorsys
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from analysis import charts
+from analysis.analyzer import BusinessAnalyzer
+from analysis.storage import CsvStorage, SqliteStorage
+from benchmarks.synthetic import generate_listings
+
+
+def listings(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'title': [f'Listing {n}' for n in range(rows)],
+        'price': np.round(10 ** rng.normal(5.5, 0.4, rows)),
+        'revenue': np.round(10 ** rng.normal(5.8, 0.4, rows)),
+        'turnaround_score': rng.uniform(0, 100, rows).round(2),
+        'turnaround_difficulty': rng.integers(1, 6, rows),
+    })
+    # A few far-off listings the sample must keep
+    df.loc[[7, 8], 'price'] = [50_000_000, 20]
+    df.loc[9, 'revenue'] = 90_000_000
+    return df
+
+
+def rowwise_color(score):
+    """The colour the per-row chart builder gave a score"""
+    h = (120 * min(score / 100, 1)) / 360
+    r, g, b = colorsys.hsv_to_rgb(h, 0.8, 0.8)
+    return f'rgba({int(r*255)}, {int(g*255)}, {int(b*255)}, 0.7)'
+
+
+def test_points_and_histogram_match_the_rows():
+    df = listings(500)
+    data = charts.chart_payload(df)
+
+    assert data['total_points'] == 500
+    assert data['score_data'] == np.histogram(df['turnaround_score'], bins=charts.SCORE_BINS)[0].tolist()
+    assert data['price_revenue_data'] == [
+        {'x': row.price, 'y': row.revenue, 'title': row.title,
+         'score': row.turnaround_score, 'difficulty': row.turnaround_difficulty}
+        for row in df.itertuples()
+    ]
+
+
+def test_colors_are_the_nearest_palette_level():
+    levels = np.arange(charts.PALETTE_SIZE) * 100 / (charts.PALETTE_SIZE - 1)
+    assert charts.score_palette() == [rowwise_color(score) for score in levels]
+
+    scores = np.array([0, 3.3, 3.4, 52, 96.6, 100, 140, -5])
+    expected = [np.abs(levels - min(max(score, 0), 100)).argmin() for score in scores]
+    assert charts.color_levels(scores).tolist() == expected
+
+
+def test_sample_is_bounded_and_keeps_outliers():
+    df = listings(5000)
+    data = charts.chart_payload(df, downsample='sample', max_points=400)
+
+    points = data['price_revenue_data']
+    assert len(points) == len(data['color_index']) == 400
+    titles = {point['title'] for point in points}
+    assert {'Listing 7', 'Listing 8', 'Listing 9'} <= titles
+    # Every point is a real listing, and the sample is the same on every call
+    by_title = df.set_index('title')
+    assert all(by_title.loc[point['title'], 'price'] == point['x'] for point in points)
+    assert charts.chart_payload(df, downsample='sample', max_points=400) == data
+
+
+def test_grid_is_bounded_and_counts_every_listing():
+    df = listings(5000)
+    data = charts.chart_payload(df, downsample='grid', max_points=400)
+
+    points = data['price_revenue_data']
+    assert len(points) <= 400
+    assert sum(point['count'] for point in points) == 5000
+    mean_score = sum(point['score'] * point['count'] for point in points) / 5000
+    assert mean_score == pytest.approx(df['turnaround_score'].mean(), abs=0.05)
+
+
+@pytest.mark.parametrize('storage_class', [CsvStorage, SqliteStorage])
+@pytest.mark.parametrize('mode', ['sample', 'grid'])
+def test_chart_endpoint_payload_stays_bounded(use_storage, storage_class, mode):
+    use_storage(storage_class())
+    BusinessAnalyzer().analyze_turnaround_potential(generate_listings(3000))
+    app_module.api_cache.clear()
+    client = app_module.app.test_client()
+
+    full = client.get('/api/chart-data').get_json()
+    assert len(full['price_revenue_data']) == 3000
+
+    response = client.get(f'/api/chart-data?downsample={mode}&max_points=200')
+    data = response.get_json()
+    assert data['downsample'] == mode
+    assert data['total_points'] == 3000
+    assert data['score_data'] == full['score_data']
+    assert len(data['price_revenue_data']) <= 200
+    assert len(response.get_data()) < len(json.dumps(full)) / 5
+
+    assert client.get('/api/chart-data?downsample=hexbin').status_code == 400
+    assert client.get('/api/chart-data?downsample=grid&max_points=0').status_code == 400
+    app_module.api_cache.clear()
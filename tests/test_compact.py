@@ -0,0 +1,89 @@
+# tests/test_compact.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import opportunities
+from analysis.compact import compact, python_values
+from analysis.dataset import DatasetCache
+from analysis.index import ScoreIndex
+from analysis.storage import CsvStorage, ParquetStorage
+
+BACKENDS = [CsvStorage, pytest.param(ParquetStorage, marks=pytest.mark.skipif(
+    not ParquetStorage.available(), reason='pyarrow is not installed'))]
+
+
+def listings(scores):
+    return pd.DataFrame({
+        'title': [f'Listing {n}' for n in range(len(scores))],
+        'location': ['Austin, TX'] * len(scores),
+        'price_to_revenue_ratio': np.linspace(0.1, 3.0, len(scores)),
+        'raw_score': np.asarray(scores, dtype=np.float64) / 2,
+        'turnaround_score': np.asarray(scores, dtype=np.float64),
+        'turnaround_difficulty': np.arange(len(scores)) % 5 + 1,
+    })
+
+
+@pytest.mark.parametrize('storage_class', BACKENDS)
+def test_min_score_boundary_matches_the_stored_scores(workdir, storage_class):
+    # 49.9999999 rounds to 50.0 in float32; it must still miss min_score=50
+    scores = [49.9999999, 50.0, 50.0000001, 49.99999, 75.25, 12.0]
+    storage = storage_class()
+    path = str(workdir / 'data' / f'listings{storage.extension}')
+    storage.write(listings(scores), path)
+
+    cache = DatasetCache(path=path, storage=storage, warm_snapshots=False, compact=True)
+    df = cache.get()
+    assert df['turnaround_score'].dtype == np.float64
+    assert df['raw_score'].dtype == np.float32
+
+    index = ScoreIndex.from_frame(df)
+    page, total, _ = opportunities.page(df, index, 50, 5, ['turnaround_score'], cache.version)
+    assert total == 3
+    assert [row['turnaround_score'] for row in page] == [75.25, 50.0000001, 50.0]
+
+
+def test_sort_order_is_unchanged_by_compaction():
+    scores = [60.00000001, 60.0, 60.00000002, 59.99999999]
+    df = listings(scores)
+    full, _ = ScoreIndex.from_frame(df).query(0, 5)
+    compacted, _ = ScoreIndex.from_frame(compact(df)).query(0, 5)
+    assert compacted.tolist() == full.tolist() == [2, 0, 1, 3]
+
+
+def test_float32_values_are_sent_with_seven_significant_digits():
+    values = pd.Series([0.4, 1 / 3, 123456.789, 0.0, -2.5e-5, np.nan], dtype=np.float32)
+    sent = python_values(values)
+    assert sent[:5] == [0.4, 0.3333333, 123456.8, 0.0, -2.5e-5]
+    assert np.isnan(sent[5])
+    # Full-width values go out untouched
+    assert python_values(pd.Series([1 / 3])) == [1 / 3]
+
+
+def test_compact_records_round_ratios_but_not_turnaround_score():
+    df = compact(listings([50.123456789]))
+    record, = opportunities.records(df, [0], ['price_to_revenue_ratio', 'raw_score', 'turnaround_score'])
+    assert record == {'price_to_revenue_ratio': 0.1, 'raw_score': 25.06173, 'turnaround_score': 50.123456789}
+
+
+@pytest.mark.skipif(not ParquetStorage.available(), reason='pyarrow is not installed')
+def test_workers_share_the_mapped_dataset_by_default(workdir):
+    storage = ParquetStorage()
+    path = str(workdir / 'data' / 'listings.parquet')
+    storage.write(listings([10.0, 20.0, 30.0]), path)
+
+    first = DatasetCache(path=path, storage=storage)
+    second = DatasetCache(path=path, storage=storage)
+    assert first.get()['title'].tolist() == second.get()['title'].tolist()
+    assert first.stats()['shared'] and second.stats()['shared']
+    assert (workdir / 'data' / 'listings.parquet.warm.arrow').exists()
+
+    # The process that publishes a new version maps it as well
+    snapshot = str(workdir / 'data' / 'next.parquet')
+    update = listings([40.0, 50.0])
+    storage.write(update, snapshot)
+    first.publish(snapshot, frame=update)
+    assert first.stats()['shared']
+    assert first.get()['turnaround_score'].tolist() == [40.0, 50.0]
+    assert second.get()['turnaround_score'].tolist() == [40.0, 50.0]
+    assert second.stats()['shared']
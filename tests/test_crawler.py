@@ -0,0 +1,308 @@
+# tests/test_crawler.py
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('requests')
+
+from scrapers import crawler
+from scrapers.crawler import CrawlEngine, CsvListingSink
+from scrapers.http_cache import ResponseCache
+from scrapers.parsers import get_parser
+from scrapers.scraper import BusinessScraper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+PAGES = {}
+for number in (1, 2, 3):
+    with open(os.path.join(FIXTURES, f'search_page_{number}.html'), 'rb') as f:
+        PAGES[number] = f.read()
+BASE_PATH = '/businesses-for-sale/'
+
+
+class SearchSite(ThreadingHTTPServer):
+    """
+    Serves the fixture pages as paginated search results: page 1 at
+    BASE_PATH, page n at BASE_PATH + 'n/', 404 past the last page.
+    `failures` maps a page number to how many 503s it answers before the page.
+    With `etags`, pages carry an ETag and a matching If-None-Match gets a 304.
+    """
+    daemon_threads = True
+
+    def __init__(self, failures=None, etags=False):
+        super().__init__(('127.0.0.1', 0), SearchHandler)
+        self.failures = dict(failures or {})
+        self.etags = etags
+        self.pages = dict(PAGES)
+        self.requests = []  # (page, time) of every request
+        self.responses = []  # (page, status) of every answered page request
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}{BASE_PATH}'
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        rest = self.path[len(BASE_PATH):].strip('/')
+        page = int(rest) if rest else 1
+        site = self.server
+        with site.lock:
+            site.requests.append((page, time.monotonic()))
+            failing = site.failures.get(page, 0)
+            if failing:
+                site.failures[page] = failing - 1
+        body = site.pages.get(page)
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"' if body is not None and site.etags else None
+        if failing:
+            status = 503
+            self.send_error(status)
+        elif body is None:
+            status = 404
+            self.send_error(status)
+        elif etag is not None and self.headers.get('If-None-Match') == etag:
+            status = 304
+            self.send_response(status)
+            self.send_header('ETag', etag)
+            self.end_headers()
+        else:
+            status = 200
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if etag is not None:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+        with site.lock:
+            site.responses.append((page, status))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    servers = []
+
+    def start(**options):
+        server = SearchSite(**options)
+        threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope='module')
+def expected():
+    """Listings of each fixture page, as the parser reads them"""
+    parser = get_parser()
+    return {number: parser.parse(html) for number, html in PAGES.items()}
+
+
+def engine(site, **options):
+    options = {'requests_per_second': 0, 'backoff_factor': 0.01, 'concurrency': 2, **options}
+    return CrawlEngine(parse=get_parser().parse, base_url=site.base_url, **options)
+
+
+def ordered(listings):
+    return sorted(listings, key=lambda listing: tuple(str(value) for value in listing.values()))
+
+
+def requests_per_page(site):
+    return Counter(page for page, _ in site.requests)
+
+
+def test_crawl_follows_pagination_until_the_results_end(site, expected):
+    server = site()
+    collected = []
+    crawl = engine(server)
+
+    found = crawl.crawl(max_pages=10, sink=collected.extend)
+
+    assert found == sum(len(listings) for listings in expected.values())
+    assert ordered(collected) == ordered(listing for listings in expected.values() for listing in listings)
+    # Pages past the end are 404s and stop the crawl; no page is fetched twice
+    assert set(requests_per_page(server)) <= {1, 2, 3, 4, 5}
+    assert all(count == 1 for count in requests_per_page(server).values())
+    assert crawl.stats()['pages_failed'] == 0
+
+
+def test_server_errors_are_retried(site, expected):
+    server = site(failures={2: 2})
+    crawl = engine(server)
+
+    found = crawl.crawl(max_pages=3)
+
+    assert found == sum(len(listings) for listings in expected.values())
+    assert requests_per_page(server)[2] == 3
+    assert crawl.stats()['pages_failed'] == 0
+
+
+def test_page_that_keeps_failing_is_counted(site, expected):
+    server = site(failures={2: 100})
+    crawl = engine(server, retries=2)
+    errors = lambda: sum(value for _, _, _, value in crawler.PAGE_ERRORS.samples())
+    before = errors()
+
+    found = crawl.crawl(max_pages=3)
+
+    assert found == len(expected[1]) + len(expected[3])
+    assert requests_per_page(server)[2] == 3
+    assert crawl.stats()['pages_failed'] == 1
+    assert errors() == before + 1
+
+
+def test_requests_are_rate_limited(site):
+    server = site()
+    rate = 20
+    engine(server, requests_per_second=rate, concurrency=4).crawl(max_pages=4)
+
+    times = sorted(moment for _, moment in server.requests)
+    assert len(times) == 4
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    # Allow for scheduling jitter between the limiter and the server
+    assert min(gaps) >= 0.8 / rate
+
+
+def test_crawl_streams_listings_to_csv(site, expected, workdir):
+    server = site()
+    scraper = BusinessScraper()
+    output = str(workdir / 'data' / 'raw_listings.csv')
+
+    df = scraper.crawl(max_pages=10, output_path=output, cache=False, base_url=server.base_url,
+                       requests_per_second=0, concurrency=2)
+
+    written = pd.read_csv(output, keep_default_na=False)
+    assert list(written.columns) == crawler.LISTING_FIELDS
+    assert len(df) == len(written) == sum(len(listings) for listings in expected.values())
+    assert set(written['url']) == {listing['url'] for listings in expected.values() for listing in listings}
+    assert not os.path.exists(output + '.tmp')
+
+
+def test_sample_scrape_goes_through_the_crawl_engine(site, expected, workdir):
+    server = site()
+    df = BusinessScraper().scrape_bizbuysell_sample(cache=False, base_url=server.base_url, requests_per_second=0)
+
+    assert len(df) == len(expected[1])
+    assert len(pd.read_csv(workdir / 'data' / 'raw_listings.csv')) == len(expected[1])
+    assert requests_per_page(server) == {1: 1}
+
+
+def test_failed_crawl_keeps_the_previous_listings(site, workdir):
+    server = site(failures={1: 100})
+    output = workdir / 'data' / 'raw_listings.csv'
+    output.write_text('title,price,revenue,description,location,url\nKept,1,2,d,l,u\n')
+
+    df = BusinessScraper().crawl(max_pages=1, output_path=str(output), cache=False, base_url=server.base_url,
+                                 requests_per_second=0, retries=1, backoff_factor=0.01)
+
+    assert df.empty
+    assert pd.read_csv(output)['title'].tolist() == ['Kept']
+    assert not os.path.exists(str(output) + '.tmp')
+
+
+def test_interrupted_sink_leaves_no_file(workdir):
+    output = str(workdir / 'data' / 'raw_listings.csv')
+    with pytest.raises(RuntimeError):
+        with CsvListingSink(output) as sink:
+            sink([{'title': 'Partial', 'url': 'u'}])
+            raise RuntimeError("crawl interrupted")
+    assert os.listdir(workdir / 'data') == []
+
+
+def responses(site, status):
+    """Pages answered with `status`, in page order"""
+    return sorted(page for page, answered in site.responses if answered == status)
+
+
+def cached_engine(site, cache, parsed):
+    """engine() with a response cache, recording the pages it had to parse"""
+    parse = get_parser().parse
+
+    def counting_parse(html):
+        parsed.append(html)
+        return parse(html)
+    return CrawlEngine(parse=counting_parse, base_url=site.base_url, requests_per_second=0,
+                       concurrency=2, backoff_factor=0.01, cache=cache, parser_name='test')
+
+
+def test_cached_pages_are_revalidated_with_etags(site, expected, workdir):
+    server = site(etags=True)
+    cache = ResponseCache(str(workdir / 'cache'))
+    parsed = []
+    first = []
+    cached_engine(server, cache, parsed).crawl(max_pages=3, sink=first.extend)
+    assert len(parsed) == 3
+
+    second = []
+    cached_engine(server, cache, parsed).crawl(max_pages=3, sink=second.extend)
+
+    assert ordered(second) == ordered(first)
+    assert responses(server, 304) == [1, 2, 3]
+    assert len(parsed) == 3  # nothing re-parsed
+    stats = cache.stats()
+    assert (stats['hits'], stats['unchanged'], stats['misses']) == (3, 3, 3)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_changed_page_is_fetched_and_parsed_again(site, expected, workdir):
+    server = site(etags=True)
+    cache = ResponseCache(str(workdir / 'cache'))
+    parsed = []
+    cached_engine(server, cache, parsed).crawl(max_pages=3)
+
+    server.pages[2] = PAGES[3]
+    collected = []
+    cached_engine(server, cache, parsed).crawl(max_pages=3, sink=collected.extend)
+
+    assert responses(server, 304) == [1, 3]
+    assert len(parsed) == 4
+    assert ordered(collected) == ordered(expected[1] + expected[3] + expected[3])
+    stats = cache.stats()
+    assert (stats['hits'], stats['unchanged'], stats['misses']) == (2, 2, 4)
+
+
+def test_identical_content_without_validators_is_not_parsed_again(site, workdir):
+    server = site()
+    cache = ResponseCache(str(workdir / 'cache'))
+    parsed = []
+    cached_engine(server, cache, parsed).crawl(max_pages=3)
+    cached_engine(server, cache, parsed).crawl(max_pages=3)
+
+    assert responses(server, 304) == []
+    assert len(parsed) == 3
+    stats = cache.stats()
+    assert (stats['hits'], stats['unchanged'], stats['misses']) == (3, 3, 3)
+
+
+def test_cache_evicts_least_recently_used_pages(site, workdir):
+    server = site(etags=True)
+    directory = str(workdir / 'cache')
+    # Room for about one page and its listings
+    cache = ResponseCache(directory, max_bytes=max(len(page) for page in PAGES.values()) * 3 // 2)
+    parsed = []
+    cached_engine(server, cache, parsed).crawl(max_pages=3)
+
+    stats = cache.stats()
+    assert stats['entries'] == 1
+    assert stats['evictions'] == 2
+    assert stats['bytes'] <= stats['max_bytes']
+    assert len([name for name in os.listdir(directory) if name.endswith('.body')]) == 1
+
+    # The index survives a restart; evicted pages are fetched in full again
+    reopened = ResponseCache(directory)
+    assert reopened.stats()['entries'] == 1
+    cached_engine(server, reopened, parsed).crawl(max_pages=3)
+    assert len(responses(server, 304)) == 1
+    assert reopened.stats()['misses'] == 2
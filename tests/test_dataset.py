@@ -0,0 +1,95 @@
+# tests/test_dataset.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import export, opportunities
+from analysis.dataset import DatasetCache
+from analysis.index import ScoreIndex
+from analysis.storage import CsvStorage
+
+
+def listings(rows):
+    return pd.DataFrame({
+        'title': [f'Listing {n}' for n in range(rows)],
+        'turnaround_score': np.linspace(100, 0, rows),
+        'turnaround_difficulty': np.arange(rows) % 5 + 1,
+    })
+
+
+@pytest.fixture
+def dataset(workdir):
+    storage = CsvStorage()
+    path = str(workdir / 'data' / 'listings.csv')
+    storage.write(listings(20), path)
+    return path, storage
+
+
+def worker_cache(dataset):
+    """A DatasetCache as a separate worker process would hold it"""
+    path, storage = dataset
+    return DatasetCache(path=path, storage=storage, warm_snapshots=False)
+
+
+def first_page(cache, limit):
+    df = cache.get()
+    index = ScoreIndex.from_frame(df)
+    return opportunities.page(df, index, 0, 5, ['title'], cache.version, limit=limit)
+
+
+def test_workers_agree_on_the_version(dataset):
+    first, second = worker_cache(dataset), worker_cache(dataset)
+    # The second worker has reloaded (and so cleared its cache) a few times
+    for _ in range(3):
+        second.get()
+        second.invalidate()
+    first.get(), second.get()
+
+    assert first.version is not None
+    assert first.version == second.version == first.current_version() == second.current_version()
+
+
+def test_cursor_from_one_worker_is_accepted_by_another(dataset):
+    first, second = worker_cache(dataset), worker_cache(dataset)
+    page, total, cursor = first_page(first, limit=5)
+
+    second.get()
+    second.invalidate()
+    df = second.get()
+    rest, _, _ = opportunities.page(df, ScoreIndex.from_frame(df), 0, 5, ['title'], second.version,
+                                    limit=100, cursor=cursor)
+    assert [row['title'] for row in page + rest] == [f'Listing {n}' for n in range(total)]
+    assert export.start_offset(cursor, 3, second.current_version()) == 8
+
+
+def test_version_changes_with_the_file(dataset):
+    path, storage = dataset
+    cache = worker_cache(dataset)
+    cache.get()
+    old_version = cache.version
+    _, _, cursor = first_page(cache, limit=5)
+
+    storage.write(listings(21), path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.current_version() is None
+    cache.get()
+    assert cache.version != old_version
+    with pytest.raises(opportunities.QueryError):
+        opportunities.decode_cursor(cursor, cache.version)
+
+
+def test_read_exact_restores_stored_floats(dataset):
+    path, storage = dataset
+    storage.write(listings(20).assign(raw_score=np.linspace(0.1, 2.9, 20)), path)
+    cache = worker_cache(dataset)
+    assert cache.get()['raw_score'].dtype == np.float32
+
+    exact = cache.read_exact(columns=['title', 'raw_score'])
+    assert exact['raw_score'].dtype == np.float64
+    assert exact['raw_score'].tolist() == storage.read(path)['raw_score'].tolist()
+    assert exact['title'].tolist() == cache.get()['title'].tolist()
+    # The cached frame keeps its compact dtypes
+    assert cache.get()['raw_score'].dtype == np.float32
@@ -0,0 +1,110 @@
+# tests/test_dedup.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import dedup
+from analysis.dedup import NUM_PERM, ListingDeduplicator, clusters
+
+DESCRIPTION = ("Family owned bakery on a busy corner with loyal regulars and a catering contract. "
+               "The owner is retiring after twenty years and will train the buyer for two months. "
+               "Equipment was replaced in the last three years and the lease runs until the end of the decade.")
+OTHER = ("Landscaping company with three crews and a fleet of trucks serving homeowners associations "
+         "across the county under multi year maintenance agreements and seasonal snow removal work.")
+
+
+def signature_rows(*agreements):
+    """
+    Signatures of listings built from a base one: row i keeps the base
+    value in the columns of agreements[i] and has its own value elsewhere
+    """
+    base = np.arange(NUM_PERM, dtype=np.uint32) + 100
+    rows = []
+    for number, columns in enumerate(agreements):
+        row = base + np.uint32(1000 * (number + 1))
+        row[columns] = base[columns]
+        rows.append(row)
+    return np.array(rows, dtype=np.uint32)
+
+
+def test_bucket_members_are_compared_beyond_neighbours():
+    # A, B and C share band 0 and no other band; A and C agree on three of
+    # every four signature values, B on nothing else. B sorts between them,
+    # so comparing neighbours alone never links A and C.
+    shared = np.arange(4)
+    a = np.arange(NUM_PERM)
+    b = shared
+    c = np.union1d(shared, np.flatnonzero(np.arange(NUM_PERM) % 4 != 3))
+    labels = clusters(signature_rows(a, b, c))
+    assert labels.tolist() == [0, 1, 0]
+
+
+def test_large_bucket_members_are_compared_with_the_first():
+    count = dedup.SMALL_BUCKET * 3
+    labels = clusters(signature_rows(*[np.arange(NUM_PERM)] * count))
+    assert labels.tolist() == [0] * count
+
+
+def test_listings_without_text_are_not_grouped():
+    empty = np.full((3, NUM_PERM), np.iinfo(np.uint32).max, dtype=np.uint32)
+    assert clusters(empty).tolist() == [0, 1, 2]
+
+
+def listings(*rows):
+    return pd.DataFrame(rows, columns=['title', 'description', 'price', 'url'])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Makes time.time() return the value set on the returned list"""
+    now = [1_000.0]
+    monkeypatch.setattr(dedup.time, 'time', lambda: now[0])
+    return now
+
+
+def test_signatures_are_reused_across_runs(tmp_path):
+    deduplicator = ListingDeduplicator(path=str(tmp_path / 'signatures.npz'))
+    scrape = listings(('Corner bakery', DESCRIPTION, 250000, 'https://example.com/1'),
+                      ('Landscaping company', OTHER, 400000, 'https://example.com/2'))
+
+    _, summary = deduplicator.deduplicate(scrape)
+    assert summary['hashed'] == 2
+
+    _, summary = deduplicator.deduplicate(scrape)
+    assert summary['hashed'] == 0
+
+    edited = scrape.copy()
+    edited.loc[1, 'description'] = OTHER + ' Price reduced for a quick sale.'
+    _, summary = ListingDeduplicator(path=deduplicator.path).deduplicate(edited)
+    assert summary['hashed'] == 1
+
+
+def test_newest_keeps_the_listing_first_seen_last(tmp_path, clock):
+    deduplicator = ListingDeduplicator(path=str(tmp_path / 'signatures.npz'), keep='newest')
+    original = ('Corner bakery for sale', DESCRIPTION, 250000, 'https://example.com/1')
+    deduplicator.deduplicate(listings(original))
+
+    clock[0] = 2_000.0
+    relisted = ('Corner bakery now for sale', DESCRIPTION, 260000, 'https://broker.example/9')
+    kept, summary = deduplicator.deduplicate(listings(relisted, original))
+
+    assert summary['duplicates'] == 1
+    assert kept['url'].tolist() == ['https://broker.example/9']
+
+
+def test_cheapest_keeps_the_lowest_disclosed_price(tmp_path, clock):
+    deduplicator = ListingDeduplicator(path=str(tmp_path / 'signatures.npz'), keep='cheapest')
+    kept, summary = deduplicator.deduplicate(listings(
+        ('Corner bakery for sale', DESCRIPTION, 0, 'https://example.com/1'),
+        ('Corner bakery now for sale', DESCRIPTION, 225000, 'https://broker.example/9'),
+        ('Corner bakery for sale', DESCRIPTION, 250000, 'https://example.com/3'),
+        ('Landscaping company', OTHER, 100000, 'https://example.com/2'),
+    ))
+
+    assert summary == {**summary, 'listings': 4, 'duplicates': 2, 'groups': 1}
+    assert sorted(kept['url']) == ['https://broker.example/9', 'https://example.com/2']
+
+
+def test_unknown_keep_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ListingDeduplicator(path=str(tmp_path / 'signatures.npz'), keep='oldest')
@@ -0,0 +1,117 @@
+# tests/test_export.py
+import csv
+import gzip
+import io
+import json
+import zlib
+
+import pytest
+
+import app as app_module
+from analysis import export
+from analysis.analyzer import BusinessAnalyzer
+from analysis.index import ScoreIndex
+from analysis.storage import CsvStorage, ParquetStorage, SqliteStorage, apply_schema
+from benchmarks.synthetic import generate_listings
+
+FORMATS = [CsvStorage, SqliteStorage, pytest.param(ParquetStorage, marks=pytest.mark.skipif(
+    not ParquetStorage.available(), reason='pyarrow is not installed'))]
+FIELDS = 'listing_id,title,price,turnaround_score,turnaround_difficulty'
+QUERY = f'min_score=30&max_difficulty=4&fields={FIELDS}'
+
+
+@pytest.fixture(params=FORMATS)
+def client(request, use_storage):
+    use_storage(request.param())
+    BusinessAnalyzer().analyze_turnaround_potential(generate_listings(700))
+    app_module.api_cache.clear()
+    yield app_module.app.test_client()
+    app_module.api_cache.clear()
+
+
+def expected_rows(client):
+    """The same matches, in the same order, from /api/opportunities"""
+    data = client.get(f'/api/opportunities?{QUERY}').get_json()
+    assert data['next_cursor'] is None
+    return data['opportunities']
+
+
+def ndjson(body):
+    return [json.loads(line) for line in body.decode('utf-8').splitlines()]
+
+
+def test_ndjson_export_streams_every_match(client):
+    expected = expected_rows(client)
+    response = client.get(f'/api/opportunities/export?{QUERY}')
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Total-Count'] == str(len(expected))
+    assert 'Content-Encoding' not in response.headers
+    assert ndjson(response.get_data()) == expected
+
+
+def test_csv_export_has_a_header_and_the_same_rows(client):
+    expected = expected_rows(client)
+    response = client.get(f'/api/opportunities/export?{QUERY}&format=csv')
+
+    assert response.mimetype == 'text/csv'
+    assert 'opportunities.csv' in response.headers['Content-Disposition']
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == FIELDS.split(',')
+    assert rows[1:] == [[str(row[field]) for field in rows[0]] for row in expected]
+
+
+@pytest.mark.parametrize('export_format', ['ndjson', 'csv'])
+def test_gzip_export_decompresses_to_the_plain_body(client, export_format):
+    plain = client.get(f'/api/opportunities/export?{QUERY}&format={export_format}').get_data()
+    response = client.get(f'/api/opportunities/export?{QUERY}&format={export_format}',
+                          headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.get_data()) == plain
+
+
+def test_interrupted_export_resumes_from_its_cursor(client):
+    expected = expected_rows(client)
+    first = client.get(f'/api/opportunities/export?{QUERY}')
+    cursor = first.headers['X-Resume-Cursor']
+
+    resumed = client.get(f'/api/opportunities/export?{QUERY}&cursor={cursor}&skip=123')
+    assert ndjson(resumed.get_data()) == expected[123:]
+
+    # A next_cursor from /api/opportunities works as well
+    page = client.get(f'/api/opportunities?{QUERY}&limit=50').get_json()
+    rest = client.get(f"/api/opportunities/export?{QUERY}&cursor={page['next_cursor']}")
+    assert page['opportunities'] + ndjson(rest.get_data()) == expected
+
+
+def test_bad_parameters_and_stale_cursors_are_rejected(client):
+    cursor = client.get(f'/api/opportunities/export?{QUERY}').headers['X-Resume-Cursor']
+    assert client.get(f'/api/opportunities/export?{QUERY}&format=xml').status_code == 400
+    assert client.get(f'/api/opportunities/export?{QUERY}&skip=-1').status_code == 400
+    assert client.get(f'/api/opportunities/export?{QUERY}&cursor=garbage').status_code == 400
+
+    BusinessAnalyzer().analyze_turnaround_potential(generate_listings(300, seed=2))
+    response = client.get(f'/api/opportunities/export?{QUERY}&cursor={cursor}')
+    assert response.status_code == 400
+    assert 'older dataset' in response.get_json()['message']
+
+
+def test_rows_are_serialized_and_flushed_a_batch_at_a_time(use_storage):
+    use_storage(CsvStorage())
+    df = apply_schema(BusinessAnalyzer().analyze_turnaround_potential(generate_listings(400)))
+    index = ScoreIndex.from_frame(df)
+    batches = list(export.frame_batches(df, index, 0, 5, ['listing_id'], batch_size=64))
+    assert [len(batch) for batch in batches] == [64] * 6 + [16]
+
+    # Every compressed chunk decompresses to whole lines as it arrives
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    received = b''
+    for chunk in export.serialize(iter(batches), 'ndjson', ['listing_id'], encoding='gzip'):
+        received += decompressor.decompress(chunk)
+        assert received.endswith(b'\n')
+    expected = df['listing_id'].iloc[index.query(0, 5)[0]].tolist()
+    assert [row['listing_id'] for row in ndjson(received)] == expected
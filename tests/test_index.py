@@ -0,0 +1,74 @@
+# tests/test_index.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from analysis.analyzer import BusinessAnalyzer
+from analysis.index import ScoreIndex
+from analysis.storage import CsvStorage, apply_schema
+from benchmarks.synthetic import generate_listings
+
+
+def frame(rows, seed=0):
+    """Whole-number scores, so many rows tie"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'turnaround_score': rng.integers(0, 100, rows).astype(np.float64),
+        'turnaround_difficulty': rng.integers(1, 6, rows),
+    })
+
+
+def masked(df, min_score, max_difficulty):
+    """Row positions as the boolean masks and a stable descending sort give them"""
+    matches = df[(df['turnaround_score'] >= min_score) & (df['turnaround_difficulty'] <= max_difficulty)]
+    return matches.sort_values('turnaround_score', ascending=False, kind='stable').index.to_numpy()
+
+
+@pytest.mark.parametrize('min_score, max_difficulty', [
+    (0, 5), (50, 5), (50, 3), (50.5, 2), (99, 5), (100, 5), (0, 1), (0, 0),
+])
+def test_query_matches_mask_and_sort(min_score, max_difficulty):
+    df = frame(3000)
+    index = ScoreIndex.from_frame(df)
+    expected = masked(df, min_score, max_difficulty)
+
+    positions, total = index.query(min_score, max_difficulty)
+    assert total == len(expected)
+    np.testing.assert_array_equal(positions, expected)
+
+    # Pages put together give the same order
+    pages = [index.query(min_score, max_difficulty, offset=offset, limit=250)[0]
+             for offset in range(0, total + 250, 250)]
+    np.testing.assert_array_equal(np.concatenate(pages), expected)
+
+
+def test_iter_positions_resumes_from_an_offset():
+    df = frame(3000, seed=1)
+    index = ScoreIndex.from_frame(df)
+    expected = masked(df, 40, 4)
+
+    batches = list(index.iter_positions(40, 4, offset=37, batch_size=100))
+    assert all(len(batch) <= 100 for batch in batches)
+    np.testing.assert_array_equal(np.concatenate(batches), expected[37:])
+    assert list(index.iter_positions(40, 4, offset=len(expected))) == []
+
+
+def test_opportunities_endpoint_pages_through_the_index(use_storage):
+    use_storage(CsvStorage())
+    df = apply_schema(BusinessAnalyzer().analyze_turnaround_potential(generate_listings(400)))
+    expected = df['listing_id'].to_numpy()[masked(df, 30, 3)]
+    app_module.api_cache.clear()
+    client = app_module.app.test_client()
+
+    ids, cursor = [], None
+    while True:
+        url = '/api/opportunities?min_score=30&max_difficulty=3&limit=40&fields=listing_id'
+        data = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+        assert data['count'] == len(expected)
+        ids += [row['listing_id'] for row in data['opportunities']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    assert ids == expected.tolist()
+    app_module.api_cache.clear()
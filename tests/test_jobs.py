@@ -0,0 +1,121 @@
+# tests/test_jobs.py
+import logging
+import threading
+
+import pytest
+
+from analysis import jobs
+from analysis.jobs import DONE, FAILED, JobQueue, JobStore
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=2)
+    yield queue
+    queue.shutdown()
+
+
+def failures(kind):
+    return {key: value for _, key, _, value in jobs.JOB_FAILURES.samples()}.get((kind,), 0)
+
+
+def test_job_result_and_progress(queue):
+    def work(job, items):
+        for done in range(1, items + 1):
+            job.update(progress=done / items)
+        return {'items': items}
+
+    job = queue.wait(queue.submit('count', work, 3).id, timeout=5)
+    assert job.status == DONE
+    assert job.to_dict()['result'] == {'items': 3}
+    assert job.progress == 1.0
+
+
+def test_failed_job_is_logged_and_counted(queue, caplog, capsys):
+    def broken(job):
+        raise RuntimeError("smtp down")
+    before = failures('email')
+
+    with caplog.at_level(logging.ERROR, logger=jobs.logger.name):
+        job = queue.wait(queue.submit('email', broken).id, timeout=5)
+
+    assert job.status == FAILED
+    assert job.error == 'smtp down'
+    assert failures('email') == before + 1
+    record, = [record for record in caplog.records if record.levelno == logging.ERROR]
+    assert job.id in record.getMessage()
+    assert record.exc_info[0] is RuntimeError
+    assert 'Traceback' not in capsys.readouterr().err
+
+
+def worker_queue():
+    """A JobQueue as another worker process holds it, sharing data/jobs"""
+    return JobQueue(store=JobStore())
+
+
+def test_job_can_be_polled_on_another_worker(workdir):
+    first, second = worker_queue(), worker_queue()
+    try:
+        def work(job):
+            job.update(progress=0.5, message="Halfway")
+            return {'sent': 2}
+        job = first.wait(first.submit('email', work, description="Email 2").id, timeout=5)
+
+        polled = second.get(job.id)
+        assert polled.to_dict() == job.to_dict()
+        assert polled.status == DONE and polled.result == {'sent': 2}
+        assert [job.id for job in second.list('email')] == [job.id]
+        assert second.get('0' * 32) is None
+        assert second.get('../../etc/passwd') is None
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+
+@pytest.mark.skipif(jobs.fcntl is None, reason='no file locks on this platform')
+def test_locked_job_runs_once_across_workers(workdir):
+    first, second = worker_queue(), worker_queue()
+    release = threading.Event()
+    lock_path = str(workdir / 'data' / 'refresh.lock')
+    try:
+        # Separate lock file handles behave like separate worker processes
+        running, created = first.submit_unique('refresh', lambda job: release.wait(5), lock_path=lock_path)
+        assert created
+        other, created = second.submit_unique('refresh', lambda job: None, lock_path=lock_path)
+        assert not created
+        assert other.id == running.id
+
+        release.set()
+        assert first.wait(running.id, timeout=5).status == DONE
+        job, created = second.submit_unique('refresh', lambda job: 'again', lock_path=lock_path)
+        assert created
+        assert second.wait(job.id, timeout=5).result == 'again'
+        assert first.get(job.id).result == 'again'
+    finally:
+        release.set()
+        first.shutdown()
+        second.shutdown()
+
+
+def test_store_keeps_the_newest_finished_jobs(workdir):
+    queue = JobQueue(store=JobStore(history=3))
+    try:
+        ids = [queue.wait(queue.submit('email', lambda job: None).id, timeout=5).id for _ in range(5)]
+        queue.submit('email', lambda job: None)
+        stored = [job.id for job in JobStore().list()]
+        assert len(stored) == 3
+        assert ids[0] not in stored and ids[1] not in stored
+    finally:
+        queue.shutdown()
+
+
+def test_job_endpoint_reports_jobs_of_other_workers(workdir):
+    import app as app_module
+    other = worker_queue()
+    try:
+        job = other.wait(other.submit('email', lambda job: {'sent': 1}).id, timeout=5)
+        response = app_module.app.test_client().get(f'/api/jobs/{job.id}')
+        assert response.status_code == 200
+        assert response.get_json()['job']['result'] == {'sent': 1}
+    finally:
+        other.shutdown()
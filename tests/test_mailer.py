@@ -0,0 +1,138 @@
+# tests/test_mailer.py
+import email
+import smtplib
+import socket
+
+import pytest
+
+from analysis import mailer
+from analysis.mailer import SmtpPool, SmtpSettings, build_messages
+
+controller_module = pytest.importorskip('aiosmtpd.controller')
+
+RECIPIENTS = [f'buyer{n}@example.com' for n in range(7)]
+
+
+class RecordingHandler:
+    """Keeps every delivered message and the client connection it arrived on"""
+
+    def __init__(self, drop_after=None, refuse=()):
+        self.delivered = []
+        self.peers = []
+        # Drop the connection instead of accepting the message after this many deliveries (once)
+        self.drop_after = drop_after
+        self.refuse = set(refuse)
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.drop_after is not None and len(self.delivered) == self.drop_after:
+            self.drop_after = None
+            server.transport.close()
+            return '421 Closing connection'
+        self.delivered.append((envelope.rcpt_tos, email.message_from_bytes(envelope.content)))
+        self.peers.append(session.peer)
+        return '250 Message accepted'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    servers = []
+
+    def start(handler):
+        controller = controller_module.Controller(handler, hostname='127.0.0.1', port=free_port())
+        controller.start()
+        servers.append(controller)
+        return SmtpPool(SmtpSettings(host='127.0.0.1', port=controller.port, security='none',
+                                     user='', sender='reports@example.com', timeout=5))
+
+    yield start
+    for controller in servers:
+        controller.stop()
+
+
+def report_messages(recipients):
+    return build_messages('reports@example.com', recipients, 'Top opportunities',
+                          'Plain report', '<p>HTML report</p>')
+
+
+def test_batch_reaches_every_recipient_over_reused_connections(smtp_server):
+    handler = RecordingHandler()
+    pool = smtp_server(handler)
+    progress = []
+
+    sent = pool.send(report_messages(RECIPIENTS), batch_size=3,
+                     progress=lambda done, total: progress.append((done, total)))
+    sent += pool.send(report_messages(RECIPIENTS[:2]))
+
+    assert sent == 9
+    assert [rcpt for rcpt, _ in handler.delivered] == [[address] for address in RECIPIENTS + RECIPIENTS[:2]]
+    assert [message['To'] for _, message in handler.delivered] == RECIPIENTS + RECIPIENTS[:2]
+    assert progress == [(3, 7), (6, 7), (7, 7)]
+    # Every batch and the second send borrowed the same connection
+    assert len(set(handler.peers)) == 1
+    assert pool.stats()['connections_opened'] == 1
+    pool.close()
+
+
+def test_dropped_connection_is_reopened_and_the_batch_retried(smtp_server):
+    handler = RecordingHandler(drop_after=2)
+    pool = smtp_server(handler)
+
+    assert pool.send(report_messages(RECIPIENTS[:5]), batch_size=5) == 5
+
+    assert [message['To'] for _, message in handler.delivered] == RECIPIENTS[:5]
+    assert len(set(handler.peers)) == 2
+    assert pool.stats()['connections_opened'] == 2
+    pool.close()
+
+
+def test_refused_recipient_fails_the_send(smtp_server):
+    handler = RecordingHandler(refuse={RECIPIENTS[1]})
+    pool = smtp_server(handler)
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.send(report_messages(RECIPIENTS[:3]))
+
+    assert [message['To'] for _, message in handler.delivered] == RECIPIENTS[:1]
+    # The failed connection is not put back in the pool
+    assert pool.stats()['idle_connections'] == 0
+
+
+def test_messages_do_not_share_parts():
+    first, second = report_messages(RECIPIENTS[:2])
+    for part, other in zip(first.get_payload(), second.get_payload()):
+        assert part is not other
+    first.get_payload()[0]['X-Changed'] = 'only here'
+    assert second.get_payload()[0]['X-Changed'] is None
+    assert [part.get_content_type() for part in second.get_payload()] == ['text/plain', 'text/html']
+    assert second.get_payload()[1].get_payload(decode=True) == b'<p>HTML report</p>'
+
+
+def test_send_report_reports_progress(smtp_server):
+    handler = RecordingHandler()
+    pool = smtp_server(handler)
+    updates = []
+
+    class Job:
+        def update(self, **fields):
+            updates.append(fields)
+
+    rows = [{'title': 'Corner bakery', 'location': 'Austin, TX', 'price': 250000, 'revenue': 400000,
+             'turnaround_score': 82.5, 'turnaround_difficulty': 2}]
+    result = mailer.send_report(Job(), pool, RECIPIENTS[:2], rows)
+
+    assert result == {'sent': 2, 'recipients': RECIPIENTS[:2], 'opportunities': 1}
+    assert updates[-1]['progress'] == pytest.approx(1.0)
+    assert 'Corner bakery' in handler.delivered[0][1].get_payload()[0].get_payload(decode=True).decode()
+    pool.close()
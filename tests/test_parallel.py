@@ -0,0 +1,59 @@
+# tests/test_parallel.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import parallel
+from analysis.parallel import compute_features_parallel
+from analysis.signals import load_rules
+
+DESCRIPTIONS = [
+    'Owner retiring, must sell quickly. Price reduced!',
+    'Prime location downtown with declining revenue',
+    'Absentee owner, management issues',
+    '',
+]
+
+
+@pytest.fixture
+def scratch(tmp_path, monkeypatch):
+    directory = tmp_path / 'scratch'
+    monkeypatch.setattr(parallel, 'SCRATCH_DIR', str(directory))
+    return directory
+
+
+def listings(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'price': rng.integers(10_000, 1_000_000, rows),
+        'revenue': rng.integers(0, 2_000_000, rows),
+        'description': [DESCRIPTIONS[n % len(DESCRIPTIONS)] for n in range(rows)],
+    })
+
+
+def test_scratch_files_are_removed_after_a_run(scratch):
+    rules = load_rules()
+    features = compute_features_parallel(listings(50), rules, workers=2, partition_size=20)
+
+    assert len(features['raw_score']) == 50
+    assert features['price_drop'][0] == 1
+    assert os.listdir(scratch) == []
+
+
+def test_scratch_files_are_removed_when_the_pool_fails(scratch):
+    # Workers build their SignalExtractor from the rules and reject an empty keyword
+    rules = {'broken': {'keywords': [''], 'weight': 1}}
+    with pytest.raises(Exception):
+        compute_features_parallel(listings(50), rules, workers=2, partition_size=20)
+    assert os.listdir(scratch) == []
+
+
+def test_scratch_dir_defaults_to_the_system_temp_dir(tmp_path, monkeypatch):
+    # Runs from a directory without data/, and leaves nothing in it
+    monkeypatch.setattr(parallel, 'SCRATCH_DIR', None)
+    monkeypatch.chdir(tmp_path)
+    features = compute_features_parallel(listings(5), load_rules(), workers=1)
+    assert len(features['raw_score']) == 5
+    assert os.listdir(tmp_path) == []
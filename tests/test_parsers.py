@@ -0,0 +1,43 @@
+# tests/test_parsers.py
+import logging
+
+import pytest
+
+from scrapers import parsers
+
+CARD = """
+<div class="card card--result"><div class="card-body">
+  <h2 class="card-title"><a href="/listing/{id}/">{title}</a></h2>
+  <p class="card-location">Portland, OR</p>
+  <div class="card-description">Owner retiring</div>
+  <div class="financials"><div class="price">$250,000</div><div class="fact">Cash Flow: {cash_flow}</div></div>
+</div></div>
+"""
+
+
+def parse_errors(parser_name):
+    return {key: value for _, key, _, value in parsers.PARSE_ERRORS.samples()}.get((parser_name,), 0)
+
+
+@pytest.fixture(params=list(parsers.PARSERS))
+def parser(request):
+    parser_class = parsers.PARSERS[request.param]
+    if not getattr(parser_class, 'available', lambda: True)():
+        pytest.skip(f'{request.param} is not installed')
+    return parser_class()
+
+
+def test_unparseable_card_is_logged_counted_and_skipped(parser, caplog):
+    html = ('<html><body>' + CARD.format(id=1, title='Corner bakery', cash_flow='$90,000') +
+            CARD.format(id=2, title='Broken card', cash_flow=',,,') + '</body></html>')
+    before = parse_errors(parser.name)
+
+    with caplog.at_level(logging.WARNING, logger='scrapers.parsers'):
+        listings = parser.parse(html)
+
+    assert [listing['title'] for listing in listings] == ['Corner bakery']
+    assert listings[0]['revenue'] == 90000
+    assert parse_errors(parser.name) == before + 1
+    record, = [record for record in caplog.records if record.name == 'scrapers.parsers']
+    assert parser.name in record.getMessage()
+    assert record.exc_info is not None
@@ -0,0 +1,77 @@
+# tests/test_refresh.py
+import time
+
+import pytest
+
+from analysis import jobs, refresh
+from analysis.refresh import RefreshScheduler
+
+INTERVAL = 0.05
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Scheduler ids in the order their refreshes were submitted"""
+    calls = []
+    monkeypatch.setattr(refresh, 'submit_refresh', lambda queue, scraper, analyzer: calls.append(queue))
+    return calls
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(INTERVAL / 5)
+
+
+@pytest.mark.skipif(jobs.fcntl is None, reason='no file locks on this platform')
+def test_only_one_scheduler_submits_refreshes(tmp_path, submitted):
+    # Separate lock file handles behave like separate worker processes
+    lock_path = str(tmp_path / 'scheduler.lock')
+    first = RefreshScheduler('first', None, None, interval=INTERVAL, lock_path=lock_path).start()
+    second = RefreshScheduler('second', None, None, interval=INTERVAL, lock_path=lock_path).start()
+    try:
+        assert first.owner and not second.owner
+        wait_for(lambda: len(submitted) >= 3)
+        assert set(submitted) == {'first'}
+
+        # The owner goes away; another scheduler takes over on its next tick
+        first.stop()
+        wait_for(lambda: 'second' in submitted)
+        assert second.owner
+        assert first.stats()['runs'] >= 3
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_start_is_idempotent(tmp_path, submitted):
+    scheduler = RefreshScheduler('only', None, None, interval=3600, lock_path=str(tmp_path / 'scheduler.lock'))
+    try:
+        thread = scheduler.start()._thread
+        assert scheduler.start()._thread is thread
+        assert scheduler.stats()['owner']
+    finally:
+        scheduler.stop()
+    assert not scheduler.owner
+
+
+def test_disabled_scheduler_never_starts(tmp_path):
+    scheduler = RefreshScheduler(None, None, None, interval=0, lock_path=str(tmp_path / 'scheduler.lock'))
+    scheduler.start()
+    assert scheduler._thread is None
+    assert not (tmp_path / 'scheduler.lock').exists()
+
+
+def test_first_request_starts_the_scheduler(workdir, monkeypatch):
+    import app as app_module
+    scheduler = RefreshScheduler(app_module.job_queue, None, None, interval=3600,
+                                 lock_path=str(workdir / 'data' / 'scheduler.lock'))
+    monkeypatch.setattr(app_module, 'scheduler', scheduler)
+    try:
+        response = app_module.app.test_client().get('/api/refresh-status')
+        assert response.get_json()['schedule']['owner'] is True
+        assert scheduler._thread is not None
+    finally:
+        scheduler.stop()
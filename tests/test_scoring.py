@@ -0,0 +1,79 @@
+# tests/test_scoring.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import scoring
+from analysis.analyzer import BusinessAnalyzer
+from analysis.signals import get_default_extractor
+
+SIGNALS = ['price_drop', 'urgency_signal', 'declining_revenue', 'management_issues', 'prime_location']
+
+
+def frame(rows, seed=0):
+    """Random listings covering every signal combination, plus edge cases"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'price': rng.integers(0, 1_500_000, rows).astype(np.float64),
+        'revenue': rng.integers(0, 2_000_000, rows).astype(np.float64),
+    })
+    for signal in SIGNALS:
+        df[signal] = rng.integers(0, 2, rows)
+    df.loc[::97, 'price'] = 500000
+    df.loc[::89, 'revenue'] = 0
+    df.loc[::83, 'price'] = np.nan
+    return df
+
+
+def rowwise(df):
+    """The original per-row implementation (DataFrame.apply)"""
+    ratio = df.apply(lambda row: row['price'] / max(row['revenue'], 1), axis=1)
+    raw = (
+        (1 - np.clip(ratio / 2, 0, 1)) * 30 +
+        df['price_drop'] * 15 +
+        df['urgency_signal'] * 10 +
+        df['declining_revenue'] * 15 +
+        df['management_issues'] * 20 +
+        df['prime_location'] * 10
+    )
+    difficulty = df.apply(BusinessAnalyzer()._calculate_difficulty, axis=1)
+    return ratio.to_numpy(), raw.to_numpy(), difficulty.to_numpy()
+
+
+def vectorized(df):
+    extractor = get_default_extractor()
+    ratio = scoring.price_to_revenue_ratio(df['price'].values, df['revenue'].values)
+    raw = scoring.raw_scores(ratio, {signal: df[signal].values for signal in extractor.signals},
+                             extractor.weights)
+    difficulty = scoring.difficulty(df['price'].values, df['declining_revenue'].values,
+                                    df['management_issues'].values, df['price_drop'].values,
+                                    df['prime_location'].values)
+    return ratio, raw, difficulty
+
+
+def test_vectorized_scoring_matches_rowwise():
+    expected_ratio, expected_raw, expected_difficulty = rowwise(frame(5000))
+    ratio, raw, difficulty = vectorized(frame(5000))
+    np.testing.assert_array_equal(ratio, expected_ratio)
+    np.testing.assert_array_equal(raw, expected_raw)
+    np.testing.assert_array_equal(difficulty, expected_difficulty)
+
+
+@pytest.mark.parametrize('price, revenue', [
+    (100000, 0),         # zero revenue divides by 1
+    (np.nan, 200000),    # missing price
+    (500000, 400000),    # exactly on the difficulty threshold
+    (500001, 400000),
+    (0, 0),
+])
+@pytest.mark.parametrize('flags', [(0, 0, 0, 0, 0), (1, 1, 1, 1, 1), (1, 0, 1, 0, 1), (0, 1, 0, 1, 0)])
+def test_edge_cases_match_rowwise(price, revenue, flags):
+    df = pd.DataFrame([{'price': float(price), 'revenue': float(revenue), **dict(zip(SIGNALS, flags))}])
+    for expected, actual in zip(rowwise(df), vectorized(df)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_difficulty_halves_round_to_even():
+    # 3 - 0.5 = 2.5 -> 2 and 3 + 1 - 0.5 = 3.5 -> 4, as round() does
+    assert scoring.difficulty([0], [0], [0], [1], [0]).tolist() == [2]
+    assert scoring.difficulty([0], [1], [0], [1], [0]).tolist() == [4]
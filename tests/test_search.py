@@ -0,0 +1,139 @@
+# tests/test_search.py
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from analysis import search
+from analysis.analyzer import BusinessAnalyzer
+from analysis.search import SearchIndex
+from analysis.storage import CsvStorage, SqliteStorage, apply_schema
+from benchmarks.synthetic import generate_listings
+
+
+def documents(df):
+    return [search.tokenize(f"{title} {description}")
+            for title, description in zip(df['title'].fillna(''), df['description'].fillna(''))]
+
+
+def brute_force(df, terms):
+    """{row: BM25 relevance} of the rows containing every term, scored from scratch"""
+    docs = documents(df)
+    avg_length = sum(map(len, docs)) / len(docs)
+    frequency = Counter(term for doc in docs for term in set(doc))
+    relevance = {}
+    for row, doc in enumerate(docs):
+        counts = Counter(doc)
+        if not all(counts[term] for term in terms):
+            continue
+        norm = search.K1 * (1 - search.B + search.B * len(doc) / avg_length)
+        relevance[row] = sum(
+            math.log(1 + (len(docs) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+            * counts[term] * (search.K1 + 1) / (counts[term] + norm)
+            for term in terms
+        )
+    return relevance
+
+
+def assert_matches(index, df, terms):
+    expected = brute_force(df, terms)
+    docs, relevance = index.match(terms)
+    assert docs.tolist() == sorted(expected)
+    np.testing.assert_allclose(relevance, [expected[doc] for doc in sorted(expected)])
+
+
+QUERIES = [['laundromat'], ['owner', 'retiring'], ['declining', 'revenue', 'restaurant'], ['zeppelin']]
+
+
+@pytest.mark.parametrize('terms', QUERIES)
+def test_matches_and_relevance_agree_with_brute_force(terms):
+    df = generate_listings(800)
+    assert_matches(SearchIndex.from_frame(df), df, terms)
+
+
+def test_every_word_must_match_whatever_its_case():
+    df = pd.DataFrame({
+        'title': ['Coin Laundromat', 'Laundromat & Dry-Cleaner', 'Bakery'],
+        'description': ['Owner retiring.', 'OWNER is staying on', None],
+    })
+    index = SearchIndex.from_frame(df)
+    assert index.match(search.parse_query('laundromat'))[0].tolist() == [0, 1]
+    assert index.match(search.parse_query('Owner, RETIRING!'))[0].tolist() == [0]
+    assert index.match(search.parse_query('dry cleaner'))[0].tolist() == [1]
+    assert index.match(['pizza'])[0].tolist() == []
+
+
+def test_update_matches_a_rebuilt_index():
+    base = generate_listings(600)
+    update = base.drop(index=[3, 50, 51]).reset_index(drop=True)
+    update.loc[[10, 200], 'description'] += ' Zeppelin hangar included, owner retiring.'
+    update.loc[11, 'title'] = 'Zeppelin Tours'
+    update = pd.concat([update, generate_listings(20, seed=4, start=1000)], ignore_index=True)
+
+    updated = SearchIndex.from_frame(base).update(update)
+    for terms in QUERIES:
+        assert_matches(updated, update, terms)
+    assert updated.match(['zeppelin'])[0].tolist() == [10, 11, 200]
+
+
+def test_search_filters_ranks_and_pages():
+    df = generate_listings(800)
+    scores = np.random.default_rng(0).uniform(0, 100, len(df))
+    difficulties = np.random.default_rng(1).integers(1, 6, len(df))
+    index = SearchIndex.from_frame(df)
+    expected = brute_force(df, ['owner'])
+    kept = [row for row in expected if scores[row] >= 30 and difficulties[row] <= 4]
+    kept.sort(key=lambda row: (-expected[row], -scores[row], row))
+
+    positions, relevance, total = index.search(['owner'], scores, difficulties, 30, 4)
+    assert total == len(kept)
+    assert positions.tolist() == kept
+    pages = [index.search(['owner'], scores, difficulties, 30, 4, offset=offset, limit=7)[0]
+             for offset in range(0, total, 7)]
+    assert np.concatenate(pages).tolist() == kept
+
+
+@pytest.fixture(params=[CsvStorage, SqliteStorage])
+def client(request, use_storage):
+    use_storage(request.param())
+    app_module.api_cache.clear()
+    yield app_module.app.test_client()
+    app_module.api_cache.clear()
+
+
+def search_all(client, query):
+    results, cursor = [], None
+    while True:
+        url = f'/api/search?{query}&limit=15&fields=listing_id,title,description,turnaround_score'
+        data = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+        assert data['success']
+        results += data['results']
+        cursor = data['next_cursor']
+        if cursor is None:
+            return results, data['count']
+
+
+def test_search_endpoint_filters_and_follows_refreshes(client):
+    base = generate_listings(500)
+    df = apply_schema(BusinessAnalyzer().analyze_turnaround_potential(base))
+
+    results, count = search_all(client, 'q=owner+retiring&min_score=20&max_difficulty=4')
+    expected = {df['listing_id'].iloc[row] for row in brute_force(df, ['owner', 'retiring'])
+                if df['turnaround_score'].iloc[row] >= 20 and df['turnaround_difficulty'].iloc[row] <= 4}
+    assert count == len(results) == len(expected) > 0
+    assert {row['listing_id'] for row in results} == expected
+    relevance = [row['relevance'] for row in results]
+    assert relevance == sorted(relevance, reverse=True)
+
+    assert search_all(client, 'q=zeppelin')[1] == 0
+    update = base.copy()
+    update.loc[[7, 300], 'description'] += ' Zeppelin hangar included.'
+    result, _ = BusinessAnalyzer().analyze_incremental(update)
+    results, count = search_all(client, 'q=zeppelin')
+    assert count == 2
+    assert {row['listing_id'] for row in results} == set(result['listing_id'].iloc[[7, 300]])
+
+    assert client.get('/api/search?q=+!?').status_code == 400
@@ -0,0 +1,94 @@
+# tests/test_signals.py
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import signals
+from analysis.signals import SignalExtractor, load_rules
+
+RULES = load_rules()
+
+
+@pytest.fixture(params=['anchor scan', 'Aho-Corasick'])
+def backend(request, monkeypatch):
+    if request.param == 'Aho-Corasick':
+        pytest.importorskip('ahocorasick')
+    else:
+        monkeypatch.setattr(signals, 'ahocorasick', None)
+    return request.param
+
+
+def per_signal(descriptions, rules):
+    """One case-insensitive str.contains per signal: the reference behaviour"""
+    series = pd.Series(descriptions, dtype=object)
+    return {
+        signal: series.str.contains('|'.join(re.escape(k) for k in rule['keywords']), case=False)
+        .fillna(False).astype(int).to_numpy()
+        for signal, rule in rules.items()
+    }
+
+
+def random_descriptions(rows, keywords, seed=0):
+    rng = np.random.default_rng(seed)
+    filler = "established business loyal customers great opportunity red popularity draw".split()
+    descriptions = []
+    for _ in range(rows):
+        words = list(rng.choice(filler, rng.integers(5, 30)))
+        for _ in range(rng.integers(0, 4)):
+            keyword = str(rng.choice(keywords))
+            words.insert(rng.integers(0, len(words) + 1), keyword.upper() if rng.random() < 0.2 else keyword)
+        descriptions.append(' '.join(words))
+    return descriptions
+
+
+def assert_matches_reference(extractor, descriptions):
+    expected = per_signal(descriptions, extractor.rules)
+    actual = extractor.extract(descriptions)
+    for signal in extractor.signals:
+        np.testing.assert_array_equal(actual[signal], expected[signal], err_msg=signal)
+
+
+def test_default_rules_match_per_signal_scan(backend):
+    keywords = [k for rule in RULES.values() for k in rule['keywords']] + ['unpopular', 'Reduced Revenue']
+    assert_matches_reference(SignalExtractor(RULES), random_descriptions(2000, keywords))
+
+
+def test_overlapping_and_embedded_keywords(backend):
+    rules = {
+        'a': {'keywords': ['reduced'], 'weight': 1},
+        'b': {'keywords': ['reduced revenue'], 'weight': 1},
+        'c': {'keywords': ['revenue decline', 'cline'], 'weight': 1},
+        'd': {'keywords': ['ab'], 'weight': 1},
+    }
+    descriptions = ['reduced revenue decline', 'unreduced', 'REVENUE DECLINE', 'abab', 'a\nb', '', None,
+                    float('nan'), 'Ünïcode reduced ☃ ab']
+    assert_matches_reference(SignalExtractor(rules), descriptions)
+
+
+def test_many_keywords(backend):
+    rng = np.random.default_rng(1)
+    letters = list('abcdefghij')
+    rules = {f"s{i}": {'keywords': [], 'weight': 1} for i in range(5)}
+    keywords = []
+    for i in range(500):
+        keyword = ''.join(rng.choice(letters, rng.integers(2, 6)))
+        keywords.append(keyword)
+        rules[f"s{i % 5}"]['keywords'].append(keyword)
+    assert_matches_reference(SignalExtractor(rules), random_descriptions(500, keywords, seed=2))
+
+
+def test_batches_do_not_change_results(backend, monkeypatch):
+    keywords = [k for rule in RULES.values() for k in rule['keywords']]
+    descriptions = random_descriptions(300, keywords, seed=3)
+    expected = SignalExtractor(RULES).extract(descriptions)
+    monkeypatch.setattr(signals, 'BATCH_SIZE', 7)
+    actual = SignalExtractor(RULES).extract(descriptions)
+    for signal in expected:
+        np.testing.assert_array_equal(actual[signal], expected[signal])
+
+
+def test_keywords_must_not_contain_newlines():
+    with pytest.raises(ValueError):
+        SignalExtractor({'a': {'keywords': ['two\nlines']}})
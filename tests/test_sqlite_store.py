@@ -0,0 +1,127 @@
+# tests/test_sqlite_store.py
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from analysis import charts
+from analysis.analyzer import BusinessAnalyzer
+from analysis.storage import SqliteStorage, apply_schema
+from benchmarks.synthetic import generate_listings
+
+
+@pytest.fixture
+def analyzed(use_storage):
+    """(ListingStore, analyzed frame) for a freshly analyzed SQLite dataset"""
+    storage = SqliteStorage()
+    path = use_storage(storage)
+    df = apply_schema(BusinessAnalyzer().analyze_turnaround_potential(generate_listings(600)))
+    app_module.api_cache.clear()
+    yield storage.store(path), df
+    app_module.api_cache.clear()
+
+
+def matches(df, min_score, max_difficulty):
+    mask = (df['turnaround_score'] >= min_score) & (df['turnaround_difficulty'] <= max_difficulty)
+    return df[mask].sort_values('turnaround_score', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def test_store_reads_back_the_analyzed_frame(analyzed):
+    store, df = analyzed
+    assert store.columns() == list(df.columns)
+    pd.testing.assert_frame_equal(store.read(), df)
+    pd.testing.assert_frame_equal(store.read(['title', 'price']), df[['title', 'price']])
+    with pytest.raises(KeyError):
+        store.read(['title', 'no_such_column'])
+
+
+@pytest.mark.parametrize('min_score, max_difficulty', [(0, 5), (40, 3), (60, 5), (100, 5), (0, 1)])
+def test_query_matches_pandas_filtering(analyzed, min_score, max_difficulty):
+    store, df = analyzed
+    expected = matches(df, min_score, max_difficulty)
+    columns = ['listing_id', 'turnaround_score', 'turnaround_difficulty']
+
+    page, total = store.query(min_score, max_difficulty, columns=columns, offset=10, limit=25)
+    assert total == store.count(min_score, max_difficulty) == len(expected)
+    pd.testing.assert_frame_equal(page, expected[columns].iloc[10:35].reset_index(drop=True))
+
+    chunks = list(store.iter_query(min_score, max_difficulty, columns=['listing_id'], offset=5, chunksize=40))
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    streamed = pd.concat(chunks)['listing_id'].tolist() if chunks else []
+    assert streamed == expected['listing_id'].iloc[5:].tolist()
+
+
+def test_lookups_by_listing_id_and_position(analyzed):
+    store, df = analyzed
+    listing = store.get(df['listing_id'].iloc[123])
+    assert listing['title'] == df['title'].iloc[123]
+    assert listing['price'] == df['price'].iloc[123]
+    assert store.get('0000000000000000') is None
+
+    assert store.listing_id_at(45) == df['listing_id'].iloc[45]
+    rows = store.read_positions([300, 2, 77], columns=['title'])
+    assert rows['title'].tolist() == df['title'].iloc[[300, 2, 77]].tolist()
+
+
+def test_aggregations_match_the_frame(analyzed):
+    store, df = analyzed
+    assert store.score_histogram(charts.SCORE_BINS) == \
+        np.histogram(df['turnaround_score'], bins=charts.SCORE_BINS)[0].tolist()
+
+    cells = store.grid_cells(12)
+    if cells is None:
+        pytest.skip('SQLite was built without math functions')
+    expected = charts.grid_cells(df, 12)
+    assert cells['count'].tolist() == expected['count'].tolist()
+    np.testing.assert_allclose(cells['score'], expected['score'])
+    np.testing.assert_allclose(cells['log_price'], expected['log_price'])
+
+
+def test_readers_see_whole_versions_while_a_writer_replaces_the_data(analyzed):
+    store, df = analyzed
+    smaller = df.iloc[:200].copy()
+    seen, errors = [], []
+    stop = threading.Event()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                seen.append(len(store.read(['listing_id'])))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for _ in range(5):
+        store.replace_all(smaller)
+        store.replace_all(df)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert set(seen) <= {200, 600}
+
+
+def test_endpoints_query_the_database(analyzed, monkeypatch):
+    store, df = analyzed
+
+    def no_frame(*args, **kwargs):
+        raise AssertionError("the dataset was loaded into a DataFrame")
+    monkeypatch.setattr(app_module.dataset_cache, 'get', no_frame)
+    client = app_module.app.test_client()
+
+    data = client.get('/api/opportunities?min_score=40&max_difficulty=3&limit=30'
+                      '&fields=listing_id,turnaround_score').get_json()
+    expected = matches(df, 40, 3)
+    assert data['count'] == len(expected)
+    assert [row['listing_id'] for row in data['opportunities']] == expected['listing_id'].iloc[:30].tolist()
+
+    listing = df.iloc[321]
+    response = client.get(f"/business/{listing['listing_id']}")
+    assert response.status_code == 200
+    assert listing['title'] in response.get_data(as_text=True)
+    assert 'Business not found' in client.get('/business/ffffffffffffffff').get_data(as_text=True)